@@ -0,0 +1,71 @@
+"""
+Hot paths before and after moving old reservations to the archive.
+
+    python -m benchmarks.bench_archive [--reservations 500000] [--rooms 500] [--older-than 180]
+
+Seeds the dataset with ``rooms_api.seeding`` (several years of history per
+room), times conflict checks, reservation lists and the free room search, runs
+``archive_reservations`` and times them again, together with the history list
+(``?archived=1``) that reads both tables. The database is a temporary file, as
+in production.
+"""
+import argparse
+import datetime
+import io
+import os
+import tempfile
+import time
+
+from benchmarks.common import measure, report, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--reservations', type=int, default=500_000)
+    parser.add_argument('--rooms', type=int, default=500)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--older-than', type=int, default=180)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+    directory = tempfile.TemporaryDirectory()
+    setup_django(test_db_name=os.path.join(directory.name, 'bench.sqlite3'))
+    from django.conf import settings
+    from django.core.management import call_command
+    from django.db.models import Count
+    from rest_framework.test import APIClient
+    from rooms_api import seeding
+    from rooms_api.availability import check_conflicts
+    from rooms_api.models import Reservation, ReservationArchive, Room
+
+    settings.ROOMS_API_CACHE = None
+    seeding.seed(seeding.Dataset(users=args.users, rooms=args.rooms, reservations=args.reservations))
+    room = Room.objects.annotate(total=Count('reservation')).order_by('-total').select_related('room_manager').first()
+    client = APIClient()
+    client.force_authenticate(room.room_manager)
+    today = datetime.date.today()
+    terms = [(today + datetime.timedelta(days=7 * week), today + datetime.timedelta(days=7 * week + 2))
+             for week in range(20)]
+    period = {'date_from': today.isoformat(), 'date_to': (today + datetime.timedelta(days=7)).isoformat()}
+    url = f'/api/rooms/{room.pk}/reservations/'
+
+    def run(label):
+        print(f'{label}: {Reservation.objects.count():,} live, {ReservationArchive.objects.count():,} archived, '
+              f'{Reservation.objects.filter(room=room).count():,} live in the busiest room')
+        report(f'{label}: check_conflicts x1', measure(lambda: check_conflicts(room, terms[:1]), args.repeat))
+        report(f'{label}: check_conflicts x20', measure(lambda: check_conflicts(room, terms), args.repeat))
+        report(f'{label}: list page with count', measure(lambda: client.get(url, {'count': 1}), args.repeat))
+        report(f'{label}: free rooms next week',
+               measure(lambda: client.get('/api/rooms/available/', period), args.repeat // 10 or 1))
+
+    run('before')
+    start = time.perf_counter()
+    call_command('archive_reservations', '--older-than', str(args.older_than), stdout=io.StringIO())
+    print(f'archive_reservations --older-than {args.older_than}: {time.perf_counter() - start:.1f}s')
+    run('after')
+    report('after: history list page with count',
+           measure(lambda: client.get(url, {'count': 1, 'archived': 1}), args.repeat))
+    directory.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""
+Load test of the read endpoints under WSGI and ASGI.
+
+    python -m benchmarks.bench_asgi [--clients 100] [--seconds 10]
+
+Three servers run in turn against the same seeded SQLite file:
+
+    wsgi         Django's threaded WSGI server (a thread per connection), DRF viewsets
+    asgi-sync    uvicorn, one worker, ``rooms_app.asgi.application``, DRF viewsets
+    asgi-async   the same uvicorn worker, the async views under ``/api/async/``
+
+Every client keeps one connection open and requests room lists, reservation
+lists, reservation details and availability in turn. Needs uvicorn.
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.common import BASE_DIR, setup_django
+
+ROOMS = 200
+RESERVATIONS_PER_ROOM = 20
+WSGI_SERVER = """
+import django
+django.setup()
+from django.core.servers.basehttp import run
+from rooms_app.wsgi import application
+run('127.0.0.1', {port}, application, threading=True)
+"""
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def seed(db_name):
+    setup_django(test_db_name=db_name)
+    import datetime
+    from django.contrib.auth.models import User
+    from django.db import connection
+    from django.test import Client
+    from rooms_api.models import Reservation, Room
+
+    user = User.objects.create_user(username='bench', password='bench')
+    rooms = Room.objects.bulk_create([Room(name=f'Room {i}', room_manager=user) for i in range(ROOMS)])
+    day = datetime.date(2030, 1, 1)
+    reservations = Reservation.objects.bulk_create([
+        Reservation(room=room, owner=user, date_from=day + datetime.timedelta(days=i),
+                    date_to=day + datetime.timedelta(days=i), room_password='benchmark0')
+        for room in rooms for i in range(RESERVATIONS_PER_ROOM)
+    ])
+    client = Client()
+    client.force_login(user)
+    connection.close()
+    return client.cookies['sessionid'].value, [(r.room_id, r.pk) for r in reservations]
+
+
+def paths(prefix, reservations):
+    random.seed(16)
+    while True:
+        room_id, pk = random.choice(reservations)
+        yield f'{prefix}/rooms/?page_size=20'
+        yield f'{prefix}/rooms/{room_id}/reservations/'
+        yield f'{prefix}/rooms/{room_id}/reservations/{pk}/'
+        yield f'{prefix}/rooms/{room_id}/availability/?from=2030-01-01&to=2030-03-31'
+
+
+async def fetch(reader, writer, path, cookie):
+    writer.write(f'GET {path} HTTP/1.1\r\nHost: localhost\r\nCookie: sessionid={cookie}\r\n\r\n'.encode())
+    await writer.drain()
+    head = await reader.readuntil(b'\r\n\r\n')
+    status = int(head.split(b' ', 2)[1])
+    headers = dict(line.split(b': ', 1) for line in head.split(b'\r\n')[1:] if b': ' in line)
+    headers = {key.lower(): value for key, value in headers.items()}
+    await reader.readexactly(int(headers[b'content-length']))
+    return status, headers.get(b'connection', b'').lower() == b'close'
+
+
+async def client_loop(port, cookie, requests, deadline, latencies, errors):
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        if writer is None:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        start = time.perf_counter()
+        try:
+            status, close = await fetch(reader, writer, next(requests), cookie)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            writer, errors[0] = None, errors[0] + 1
+            continue
+        latencies.append((time.perf_counter() - start) * 1000)
+        errors[0] += status != 200
+        if close:
+            writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def load(port, cookie, prefix, reservations, clients, seconds):
+    latencies, errors = [], [0]
+    requests = paths(prefix, reservations)
+    deadline = time.perf_counter() + seconds
+    await asyncio.gather(*(client_loop(port, cookie, requests, deadline, latencies, errors) for _ in range(clients)))
+    latencies.sort()
+    return {
+        'req/s': len(latencies) / seconds,
+        'p50': statistics.median(latencies),
+        'p99': latencies[int(len(latencies) * 0.99) - 1],
+        'errors': errors[0],
+    }
+
+
+def wait_for(port, process, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError('server exited')
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError('server did not start')
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--clients', type=int, default=100)
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+    with tempfile.TemporaryDirectory() as directory:
+        db_name = Path(directory) / 'bench.sqlite3'
+        cookie, reservations = seed(db_name)
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': 'rooms_app.settings.bench',
+               'ROOMS_DB_PROFILE': 'sqlite-prod', 'ROOMS_DB_NAME': str(db_name)}
+        servers = [
+            ('wsgi', '/api', lambda port: [sys.executable, '-c', WSGI_SERVER.format(port=port)]),
+            ('asgi-sync', '/api', lambda port: [sys.executable, '-m', 'uvicorn', 'rooms_app.asgi:application',
+                                                '--port', str(port), '--log-level', 'warning', '--no-access-log']),
+            ('asgi-async', '/api/async', lambda port: [sys.executable, '-m', 'uvicorn', 'rooms_app.asgi:application',
+                                                       '--port', str(port), '--log-level', 'warning',
+                                                       '--no-access-log']),
+        ]
+        for label, prefix, command in servers:
+            port = free_port()
+            process = subprocess.Popen(command(port), cwd=BASE_DIR, env=env,
+                                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                wait_for(port, process)
+                stats = asyncio.run(load(port, cookie, prefix, reservations, args.clients, args.seconds))
+            finally:
+                process.terminate()
+                process.wait()
+            print(f"{label:<12} {stats['req/s']:8.1f} req/s  p50={stats['p50']:8.1f}ms  "
+                  f"p99={stats['p99']:8.1f}ms  errors={stats['errors']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+"""
+Availability over a year for hundreds of rooms, read from occupancy bitsets.
+
+    python -m benchmarks.bench_availability
+"""
+import datetime
+import random
+
+from benchmarks.common import measure, report, setup_django
+
+ROOMS = 500
+RESERVATIONS_PER_ROOM = 150
+
+
+def main():
+    setup_django()
+    from django.contrib.auth.models import User
+    from rooms_api import occupancy
+    from rooms_api.models import Reservation, Room
+
+    random.seed(5)
+    owner = User.objects.create_user(username='bench', password='bench')
+    rooms = Room.objects.bulk_create([Room(name=f'Room {i}', room_manager=owner) for i in range(ROOMS)])
+    start = datetime.date(2024, 1, 1)
+    for room in rooms:
+        reservations = []
+        for index in range(RESERVATIONS_PER_ROOM):
+            date_from = start + datetime.timedelta(days=index * 3)
+            date_to = date_from + datetime.timedelta(days=random.randint(0, 1))
+            reservations.append(Reservation(room=room, owner=owner, date_from=date_from, date_to=date_to,
+                                            reservation_status=1, room_password='benchmark0'))
+        Reservation.objects.bulk_create(reservations)
+        occupancy.rebuild(room.pk)
+
+    room_ids = [room.pk for room in rooms]
+    year_from, year_to = datetime.date(2024, 3, 1), datetime.date(2025, 2, 28)
+    report('availability, 1 room x 1 year', measure(lambda: occupancy.availability(room_ids[:1], year_from, year_to)))
+    report(f'availability, {ROOMS} rooms x 1 year',
+           measure(lambda: occupancy.availability(room_ids, year_from, year_to), repeat=50))
+    report(f'availability, {ROOMS} rooms x 1 year, no ranges',
+           measure(lambda: occupancy.availability(room_ids, year_from, year_to, ranges=False), repeat=50))
+    report('Reservation.get_dates, 1 room x 1 year',
+           measure(lambda: [day for item in Reservation.objects.filter(room_id=room_ids[0])
+                            for day in item.get_dates()]))
+
+
+if __name__ == '__main__':
+    main()
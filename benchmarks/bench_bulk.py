@@ -0,0 +1,58 @@
+"""
+Bulk confirm against one POST to ``confirm`` per reservation.
+
+    python -m benchmarks.bench_bulk
+"""
+import datetime
+import time
+
+from benchmarks.common import setup_django
+
+BATCH = 50
+ROUNDS = 10
+
+
+def pending(room, owner, count, start):
+    from rooms_api.models import Reservation
+    return Reservation.objects.bulk_create([
+        Reservation(room=room, owner=owner, room_password='benchmark0',
+                    date_from=start + datetime.timedelta(days=2 * i), date_to=start + datetime.timedelta(days=2 * i))
+        for i in range(count)
+    ])
+
+
+def main():
+    setup_django()
+    from django.contrib.auth.models import User
+    from rest_framework.test import APIClient
+    from rooms_api.models import Room
+
+    manager = User.objects.create_user(username='bench', password='bench')
+    room = Room.objects.create(name='Benchmark', room_manager=manager)
+    client = APIClient()
+    client.force_authenticate(manager)
+    start = datetime.date(2030, 1, 1)
+
+    elapsed = {'single': 0.0, 'bulk': 0.0}
+    for round_ in range(ROUNDS):
+        batch = pending(room, manager, BATCH, start + datetime.timedelta(days=400 * round_))
+        begin = time.perf_counter()
+        for item in batch:
+            client.post(f'/api/rooms/{room.pk}/reservations/{item.pk}/confirm/', {'reservation_status': 1})
+        elapsed['single'] += time.perf_counter() - begin
+
+        batch = pending(room, manager, BATCH, start + datetime.timedelta(days=400 * round_ + 200))
+        begin = time.perf_counter()
+        response = client.post(f'/api/rooms/{room.pk}/reservations/bulk-confirm/',
+                               {'ids': [item.pk for item in batch]}, format='json')
+        elapsed['bulk'] += time.perf_counter() - begin
+        assert all(result.get('status') == 'confirmed' for result in response.data['results'])
+
+    total = BATCH * ROUNDS
+    for label, seconds in elapsed.items():
+        print(f'confirm, {label:<8} {total / seconds:10.1f} reservations/s')
+    print(f"speed-up: {elapsed['single'] / elapsed['bulk']:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""
+iCalendar feeds of a room and an owner with many confirmed reservations.
+
+    python -m benchmarks.bench_calendar [--events 50000] [--polls 1000] [--change-every 100]
+
+Times building the feed (cache miss), serving it from the cache and answering
+a conditional GET with 304. Then simulates calendar clients polling the room
+feed while the room changes every ``--change-every`` polls, half of them sending
+the ETag of their last copy, and reports the cache hit ratio and the latency.
+"""
+import argparse
+import datetime
+import random
+import time
+
+from benchmarks.common import measure, report, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--events', type=int, default=50_000)
+    parser.add_argument('--polls', type=int, default=1000)
+    parser.add_argument('--change-every', type=int, default=100)
+    args = parser.parse_args()
+    setup_django()
+    from django.contrib.auth.models import User
+    from django.core.cache import cache as django_cache
+    from rest_framework.test import APIClient
+    from rooms_api import cache, ical
+    from rooms_api.models import Reservation, Room
+
+    random.seed(23)
+    user = User.objects.create_user(username='bench', password='bench')
+    room = Room.objects.create(name='Bench room', room_manager=user)
+    day = datetime.date(2000, 1, 1)
+    Reservation.objects.bulk_create([
+        Reservation(room=room, owner=user, date_from=day + datetime.timedelta(days=index),
+                    date_to=day + datetime.timedelta(days=index), reservation_status=1,
+                    training=random.choice(['Onboarding', 'First aid', 'Python course, advanced']),
+                    room_password='benchmark0')
+        for index in range(args.events)
+    ], batch_size=5000)
+    waiting = Reservation.objects.create(room=room, owner=user, date_from=day - datetime.timedelta(days=1),
+                                         date_to=day - datetime.timedelta(days=1))
+    client = APIClient()
+    client.force_authenticate(user)
+    room_url = f'/api/rooms/{room.pk}/calendar.ics'
+    owner_url = f'/api/owners/{user.pk}/calendar.ics'
+
+    size = len(ical.room_feed(room.pk))
+    print(f'{args.events:,} events, {size / 2 ** 20:.1f} MB feed')
+    for label, url in (('room', room_url), ('owner', owner_url)):
+        report(f'{label} feed: build (cache cleared)', measure(lambda: client.get(url), repeat=10,
+                                                                 setup=lambda: django_cache.clear() or ()))
+        report(f'{label} feed: cached', measure(lambda: client.get(url), repeat=50))
+        etag = client.get(url)['ETag']
+        report(f'{label} feed: 304', measure(lambda: client.get(url, HTTP_IF_NONE_MATCH=etag), repeat=200))
+
+    django_cache.clear()
+    cache.stats.reset()
+    etag, statuses, timings = None, {}, []
+    for poll in range(args.polls):
+        if poll and poll % args.change_every == 0:
+            waiting.training = f'Change {poll}'
+            waiting.save()
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag and poll % 2 else {}
+        start = time.perf_counter()
+        response = client.get(room_url, **headers)
+        timings.append((time.perf_counter() - start) * 1000)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+        etag = response['ETag']
+    snapshot = cache.stats.snapshot()
+    print(f'{args.polls} polls, change every {args.change_every}: statuses {statuses}, '
+          f'feed cache hits {snapshot["hits"]} misses {snapshot["misses"]} '
+          f'(hit ratio {snapshot["hit_ratio"]:.1%}), mean {sum(timings) / len(timings):.2f}ms '
+          f'total {sum(timings) / 1000:.1f}s')
+
+
+if __name__ == '__main__':
+    main()
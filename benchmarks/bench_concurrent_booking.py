@@ -0,0 +1,80 @@
+"""
+Concurrent POSTs to ``/api/rooms/<pk>/reservations/`` and ``confirm``.
+
+    python -m benchmarks.bench_concurrent_booking
+
+Reports requests per second for bookings spread over many rooms and for
+bookings contending for one room, and verifies that no confirmed
+reservations overlap afterwards.
+"""
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from benchmarks.common import setup_django
+
+THREADS = 16
+REQUESTS = 400
+ROOMS = 20
+
+
+def fire(user, requests):
+    from django.db import connection
+    from rest_framework.test import APIClient
+
+    def post(item):
+        url, data = item
+        client = APIClient()
+        client.force_authenticate(user)
+        try:
+            return client.post(url, data, format='json').status_code
+        finally:
+            connection.close()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=THREADS) as pool:
+        codes = list(pool.map(post, requests))
+    return codes, time.perf_counter() - start
+
+
+def count_overlaps():
+    from django.db import connection
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT COUNT(*) FROM rooms_api_reservation a JOIN rooms_api_reservation b '
+            'ON a.room_id = b.room_id AND a.id < b.id '
+            'AND a.date_from <= b.date_to AND b.date_from <= a.date_to '
+            'WHERE a.reservation_status = 1 AND b.reservation_status = 1')
+        return cursor.fetchone()[0]
+
+
+def main():
+    with tempfile.TemporaryDirectory() as directory:
+        setup_django(test_db_name=Path(directory) / 'bench.sqlite3')
+        from django.contrib.auth.models import User
+        from rooms_api.models import Reservation, Room
+
+        user = User.objects.create_user(username='bench', password='bench')
+        rooms = [Room.objects.create(name=f'Room {i}', room_manager=user) for i in range(ROOMS)]
+        data = {'training': 'Bench', 'date_from': '2099-01-10', 'date_to': '2099-01-12'}
+
+        for label, targets in (('one room', rooms[:1]), (f'{ROOMS} rooms', rooms)):
+            codes, elapsed = fire(user, [
+                (f'/api/rooms/{targets[i % len(targets)].pk}/reservations/', data) for i in range(REQUESTS)
+            ])
+            print(f'create, {label:<10} {REQUESTS / elapsed:8.1f} req/s  '
+                  f'created={codes.count(201)} other={len(codes) - codes.count(201)}')
+
+        pending = Reservation.objects.order_by('pk').values_list('pk', 'room_id')
+        codes, elapsed = fire(user, [
+            (f'/api/rooms/{room_id}/reservations/{pk}/confirm/', {'reservation_status': 1})
+            for pk, room_id in pending
+        ])
+        print(f'confirm, contended     {len(codes) / elapsed:8.1f} req/s  '
+              f'confirmed={codes.count(200)} rejected={codes.count(400)}')
+        print(f'overlapping confirmed reservations: {count_overlaps()}')
+
+
+if __name__ == '__main__':
+    main()
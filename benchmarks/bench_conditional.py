@@ -0,0 +1,49 @@
+"""
+Polling cost with and without conditional GET.
+
+    python -m benchmarks.bench_conditional
+
+Every poll either downloads the full body or sends ``If-None-Match`` and gets
+a 304; reports latency and bytes transferred per poll.
+"""
+import datetime
+
+from benchmarks.common import measure, report, setup_django
+
+RESERVATIONS = 500
+
+
+def main():
+    setup_django()
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from rest_framework.test import APIClient
+    from rooms_api.models import Reservation, Room
+
+    settings.ROOMS_API_CACHE = None
+    user = User.objects.create_user(username='bench', password='bench')
+    room = Room.objects.create(name='Benchmark', room_manager=user)
+    day = datetime.date(2030, 1, 1)
+    Reservation.objects.bulk_create([
+        Reservation(room=room, owner=user, date_from=day + datetime.timedelta(days=i),
+                    date_to=day + datetime.timedelta(days=i), room_password='benchmark0')
+        for i in range(RESERVATIONS)
+    ])
+    client = APIClient()
+    client.force_authenticate(user)
+
+    for label, url in (('room list', '/api/rooms/'),
+                       ('reservation page', f'/api/rooms/{room.pk}/reservations/'),
+                       ('reservation stream', f'/api/rooms/{room.pk}/reservations/?stream=1')):
+        full = client.get(url)
+        body = b''.join(full.streaming_content) if full.streaming else full.content
+        etag = full['ETag']
+        assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+        report(f'{label}, full body ({len(body)} B)',
+               measure(lambda: b''.join(client.get(url).streaming_content) if full.streaming
+                       else client.get(url)))
+        report(f'{label}, 304 (0 B)', measure(lambda: client.get(url, HTTP_IF_NONE_MATCH=etag)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+Conflict-check latency as the reservation history of a room grows.
+
+    python -m benchmarks.bench_conflicts
+
+Latency should stay flat thanks to the ``reservation_conflict_idx`` index.
+"""
+import datetime
+
+from benchmarks.common import measure, report, setup_django
+
+SIZES = [1_000, 10_000, 100_000]
+BATCH = 5_000
+
+
+def populate(room, owner, start, count):
+    from rooms_api.models import Reservation
+    day = datetime.date(2000, 1, 1)
+    batch = []
+    for offset in range(start, start + count):
+        date_from = day + datetime.timedelta(days=offset * 2)
+        batch.append(Reservation(room=room, owner=owner, date_from=date_from, date_to=date_from,
+                                 reservation_status=offset % 4, room_password='benchmark0'))
+        if len(batch) == BATCH:
+            Reservation.objects.bulk_create(batch)
+            batch = []
+    Reservation.objects.bulk_create(batch)
+
+
+def main():
+    setup_django()
+    from django.contrib.auth.models import User
+    from rooms_api.availability import check_conflicts, has_conflict
+    from rooms_api.models import Room
+
+    owner = User.objects.create_user(username='bench', password='bench')
+    room = Room.objects.create(name='Benchmark', room_manager=owner)
+    probe_from = datetime.date(1999, 12, 1)
+    probe_to = datetime.date(1999, 12, 10)
+    week = [(probe_from + datetime.timedelta(days=7 * i), probe_to + datetime.timedelta(days=7 * i))
+            for i in range(10)]
+    populated = 0
+    for size in SIZES:
+        populate(room, owner, populated, size - populated)
+        populated = size
+        report(f'has_conflict ({size} rows)',
+               measure(lambda: has_conflict(room, probe_from, probe_to)))
+        report(f'check_conflicts x10 ({size} rows)',
+               measure(lambda: check_conflicts(room, week)))
+
+
+if __name__ == '__main__':
+    main()
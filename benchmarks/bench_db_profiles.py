@@ -0,0 +1,80 @@
+"""
+Write throughput of the database profiles under concurrent load.
+
+    python -m benchmarks.bench_db_profiles [--profiles sqlite sqlite-prod postgres]
+
+Each profile runs in its own process (settings are read once per process)
+against a throwaway database. The postgres profile uses the ROOMS_DB_*
+variables of the environment and is skipped unless ROOMS_DB_HOST is set.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from benchmarks.common import BASE_DIR, setup_django
+
+THREADS = 8
+WRITES_PER_THREAD = 100
+ROOMS = 8
+
+
+def worker(user, room, offset):
+    from django.db import connection
+    from rest_framework.test import APIClient
+
+    client = APIClient()
+    client.force_authenticate(user)
+    failures = 0
+    try:
+        for index in range(WRITES_PER_THREAD):
+            day = f'2099-{1 + (offset + index) % 12:02}-{1 + index % 28:02}'
+            response = client.post(f'/api/rooms/{room.pk}/reservations/',
+                                   {'training': 'Load', 'date_from': day, 'date_to': day}, format='json')
+            failures += response.status_code != 201
+    finally:
+        connection.close()
+    return failures
+
+
+def run_profile():
+    with tempfile.TemporaryDirectory() as directory:
+        setup_django(test_db_name=Path(directory) / 'bench.sqlite3')
+        from django.contrib.auth.models import User
+        from django.db import connection
+        from rooms_api.models import Room
+
+        user = User.objects.create_user(username='bench', password='bench')
+        rooms = [Room.objects.create(name=f'Room {i}', room_manager=user) for i in range(ROOMS)]
+        connection.close()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=THREADS) as pool:
+            failures = sum(pool.map(worker, [user] * THREADS, [rooms[i % ROOMS] for i in range(THREADS)],
+                                    range(THREADS)))
+        elapsed = time.perf_counter() - start
+        writes = THREADS * WRITES_PER_THREAD
+        print(f"{os.environ.get('ROOMS_DB_PROFILE', 'sqlite'):<12} {writes / elapsed:8.1f} writes/s  "
+              f"failed={failures}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--profiles', nargs='+', default=['sqlite', 'sqlite-prod', 'postgres'])
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return run_profile()
+    for profile in args.profiles:
+        if profile == 'postgres' and not os.environ.get('ROOMS_DB_HOST'):
+            print('postgres     skipped, set ROOMS_DB_HOST and friends to include it')
+            continue
+        subprocess.run([sys.executable, '-m', 'benchmarks.bench_db_profiles', '--child'], cwd=BASE_DIR,
+                       env={**os.environ, 'ROOMS_DB_PROFILE': profile}, check=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Free-room search over a large catalogue.
+
+    python -m benchmarks.bench_free_rooms [--rooms 10000] [--reservations 1000000]
+
+Target: p95 below 250 ms for the full 10k rooms x 1M reservations dataset.
+"""
+import argparse
+import datetime
+import random
+
+from benchmarks.common import measure, report, setup_django
+
+BATCH = 20_000
+TARGET_P95_MS = 250
+
+
+def populate(rooms, reservations):
+    from django.contrib.auth.models import User
+    from rooms_api.models import Reservation, Room
+
+    random.seed(6)
+    owner = User.objects.create_user(username='bench', password='bench')
+    Room.objects.bulk_create([Room(name=f'Room {i}', room_manager=owner) for i in range(rooms)], batch_size=BATCH)
+    room_ids = list(Room.objects.values_list('pk', flat=True))
+    start = datetime.date(2020, 1, 1)
+    batch = []
+    for index in range(reservations):
+        date_from = start + datetime.timedelta(days=random.randrange(5 * 365))
+        date_to = date_from + datetime.timedelta(days=random.randrange(3))
+        batch.append(Reservation(room_id=room_ids[index % rooms], owner=owner, date_from=date_from,
+                                 date_to=date_to, reservation_status=random.choice((0, 1, 1, 1, 2, 3)),
+                                 room_password='benchmark0'))
+        if len(batch) == BATCH:
+            Reservation.objects.bulk_create(batch)
+            batch = []
+    Reservation.objects.bulk_create(batch)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rooms', type=int, default=10_000)
+    parser.add_argument('--reservations', type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.contrib.auth.models import User
+    from rest_framework.test import APIClient
+    from rooms_api.availability import available_rooms
+    from rooms_api.models import Room
+
+    populate(args.rooms, args.reservations)
+    client = APIClient()
+    client.force_authenticate(User.objects.get(username='bench'))
+    term = {'date_from': '2022-06-01', 'date_to': '2022-06-03'}
+    rooms = Room.objects.all()
+    date_from, date_to = datetime.date(2022, 6, 1), datetime.date(2022, 6, 3)
+
+    label = f'{args.rooms} rooms x {args.reservations} reservations'
+    report(f'anti-join ids, {label}',
+           measure(lambda: list(available_rooms(rooms, date_from, date_to).values_list('pk', flat=True)), repeat=20))
+    stats = measure(lambda: client.get('/api/rooms/available/', term), repeat=20)
+    report(f'GET /api/rooms/available/, {label}', stats)
+    print(f"target p95 < {TARGET_P95_MS} ms: {'met' if stats['p95'] < TARGET_P95_MS else 'missed'}")
+
+
+if __name__ == '__main__':
+    main()
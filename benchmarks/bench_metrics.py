@@ -0,0 +1,85 @@
+"""
+Overhead of the request metrics middleware.
+
+    python -m benchmarks.bench_metrics [--repeat 2000]
+
+Times the same mix of reads and status changes without the middleware and with
+it at several sample rates (share of requests traced through the database
+wrapper and the serializers). Those end-to-end differences are within the
+noise of a few milliseconds long request, so the last lines time the
+middleware alone around a one-query view.
+"""
+import argparse
+import datetime
+import statistics
+
+from benchmarks.common import measure, report, setup_django
+
+ROUNDS = 10
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+    setup_django()
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from django.http import HttpResponse
+    from django.test.utils import override_settings
+    from rest_framework.test import APIClient
+    from rooms_api.models import Reservation, Room
+
+    user = User.objects.create_user(username='bench', password='bench')
+    room = Room.objects.create(name='Room', room_manager=user)
+    day = datetime.date(2030, 1, 1)
+    reservations = Reservation.objects.bulk_create([
+        Reservation(room=room, owner=user, date_from=day + datetime.timedelta(days=i),
+                    date_to=day + datetime.timedelta(days=i), room_password='benchmark0')
+        for i in range(50)
+    ])
+    urls = [f'/api/rooms/{room.pk}/reservations/?page_size=50', f'/api/rooms/{room.pk}/reservations/{reservations[0].pk}/',
+            '/api/rooms/']
+    without = [name for name in settings.MIDDLEWARE if name != 'rooms_api.metrics.metrics_middleware']
+    variants = [('no metrics middleware', without, 0)] + [
+        (f'metrics, sample rate {rate}', settings.MIDDLEWARE, rate) for rate in (0, 0.1, 1)]
+    clients = {}
+    for label, middleware, rate in variants:
+        with override_settings(MIDDLEWARE=middleware, ROOMS_API_CACHE=None):
+            clients[label] = APIClient()
+            clients[label].force_authenticate(user)
+            clients[label].get(urls[0])
+
+    # Rounds alternate between the variants, so drift of the machine hits them all alike.
+    results = {label: [] for label, middleware, rate in variants}
+    for _ in range(ROUNDS):
+        for label, middleware, rate in variants:
+            with override_settings(ROOMS_METRICS_SAMPLE_RATE=rate, ROOMS_API_CACHE=None):
+                client, requests = clients[label], iter(range(10 ** 9))
+                results[label].append(measure(lambda: client.get(urls[next(requests) % len(urls)]),
+                                              repeat=args.repeat // ROUNDS))
+    baseline = statistics.median(stats['mean'] for stats in results[variants[0][0]])
+    for label, rounds in results.items():
+        stats = {key: statistics.median(run[key] for run in rounds) for key in rounds[0]}
+        report(label, stats)
+        print(f"{'':<48} overhead {100 * (stats['mean'] / baseline - 1):+.1f}% of the mean")
+
+    # The middleware alone around a view running one query, without the rest of the stack.
+    from django.db import connection
+    from django.test import RequestFactory
+    from rooms_api.metrics import metrics_middleware
+
+    def view(request):
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        return HttpResponse()
+
+    request = RequestFactory().get('/')
+    report('one-query view, bare', measure(lambda: view(request), repeat=args.repeat))
+    for rate in (0, 1):
+        with override_settings(ROOMS_METRICS_SAMPLE_RATE=rate):
+            wrapped = metrics_middleware(view)
+            report(f'one-query view, middleware at rate {rate}', measure(lambda: wrapped(request), repeat=args.repeat))
+
+if __name__ == '__main__':
+    main()
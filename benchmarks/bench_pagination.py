@@ -0,0 +1,58 @@
+"""
+Room list latency by page depth: page number pagination (COUNT + OFFSET) vs
+cursor pagination, with and without the count.
+
+    python -m benchmarks.bench_pagination [--page-size 10]
+
+Pages up to 10,000 deep, so ``10,000 * page size`` rooms are created. The read
+cache is off.
+"""
+import argparse
+import json
+from base64 import b64encode
+
+from benchmarks.common import measure, report, setup_django
+
+DEPTHS = [1, 100, 1000, 10000]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--page-size', type=int, default=10)
+    args = parser.parse_args()
+    setup_django()
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from rest_framework.pagination import PageNumberPagination
+    from rest_framework.test import APIClient
+    from rooms_api.models import Room
+    from rooms_api.pagination import RoomPagination
+    from rooms_api.views import RoomViewSet
+
+    class PageNumber(PageNumberPagination):
+        page_size = args.page_size
+
+    settings.ROOMS_API_CACHE = None
+    user = User.objects.create_user(username='bench', password='bench')
+    Room.objects.bulk_create([Room(name=f'Room {i}', room_manager=user)
+                              for i in range(max(DEPTHS) * args.page_size)], batch_size=5000)
+    ids = list(Room.objects.order_by('id').values_list('id', flat=True))
+    client = APIClient()
+    client.force_authenticate(user)
+
+    for depth in DEPTHS:
+        RoomViewSet.pagination_class = PageNumber
+        report(f'page number, page {depth}', measure(lambda: client.get('/api/rooms/', {'page': depth}), repeat=50))
+        RoomViewSet.pagination_class = RoomPagination
+        params = {'page_size': args.page_size}
+        if depth > 1:
+            position = ids[(depth - 1) * args.page_size - 1]
+            params['cursor'] = b64encode(json.dumps({'r': 0, 'p': [str(position)]}).encode()).decode()
+        assert client.get('/api/rooms/', params).data['results'][0]['pk'] == ids[(depth - 1) * args.page_size]
+        report(f'cursor, page {depth}', measure(lambda: client.get('/api/rooms/', params), repeat=50))
+        report(f'cursor without count, page {depth}',
+               measure(lambda: client.get('/api/rooms/', {**params, 'count': 0}), repeat=50))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Top rated rooms: aggregating the reservation history vs the stored statistics.
+
+    python -m benchmarks.bench_ratings [--rooms 1000] [--ratings 50]
+
+Also times ``ratings.reconcile()`` over the whole table.
+"""
+import argparse
+import datetime
+import random
+
+from benchmarks.common import measure, report, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rooms', type=int, default=1000)
+    parser.add_argument('--ratings', type=int, default=50, help='Rated reservations per room.')
+    args = parser.parse_args()
+    setup_django()
+    from django.db.models import Avg
+    from rest_framework.test import APIClient
+    from django.contrib.auth.models import User
+    from rooms_api import ratings
+    from rooms_api.models import Reservation, Room
+
+    random.seed(18)
+    user = User.objects.create_user(username='bench', password='bench')
+    rooms = Room.objects.bulk_create([Room(name=f'Room {i}', room_manager=user) for i in range(args.rooms)])
+    day = datetime.date(2020, 1, 1)
+    Reservation.objects.bulk_create([
+        Reservation(room=room, owner=user, date_from=day + datetime.timedelta(days=i),
+                    date_to=day + datetime.timedelta(days=i), reservation_status=1,
+                    rating=float(random.randint(1, 5)), room_password='benchmark0')
+        for room in rooms for i in range(args.ratings)
+    ])
+    report('reconcile() after bulk_create', measure(ratings.reconcile, repeat=1))
+
+    variants = {
+        'top 20: Avg over reservations': lambda: list(
+            Room.objects.annotate(average=Avg('reservation__rating')).order_by('-average', '-id')
+            .values('id', 'name', 'average')[:20]),
+        'top 20: stored rating_average': lambda: list(
+            Room.objects.order_by('-rating_average', '-id').values('id', 'name', 'rating_average')[:20]),
+        'reconcile() without drift': ratings.reconcile,
+    }
+    for label, func in variants.items():
+        report(f'{label} ({args.rooms}x{args.ratings})', measure(func, repeat=20))
+
+    client = APIClient()
+    client.force_authenticate(user)
+    report('GET /api/rooms/?ordering=-rating_average',
+           measure(lambda: client.get('/api/rooms/', {'ordering': '-rating_average', 'count': 0}), repeat=50))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Read-heavy traffic with and without the room/reservation read cache.
+
+    python -m benchmarks.bench_read_cache
+
+Mixes 100 reads (room list, room detail, reservation detail) per write.
+"""
+import datetime
+import random
+import time
+
+from benchmarks.common import setup_django
+
+ROOMS = 50
+REQUESTS = 10000
+WRITE_EVERY = 100
+
+
+def run(client, rooms, reservations):
+    random.seed(8)
+    start = time.perf_counter()
+    for index in range(REQUESTS):
+        room = random.choice(rooms)
+        if index % WRITE_EVERY == 0:
+            room.save()
+        choice = index % 3
+        if choice == 0:
+            client.get('/api/rooms/', {'page_size': random.randint(1, 5)})
+        elif choice == 1:
+            client.get(f'/api/rooms/{room.pk}/')
+        else:
+            reservation = random.choice(reservations)
+            client.get(f'/api/rooms/{reservation.room_id}/reservations/{reservation.pk}/')
+    return REQUESTS / (time.perf_counter() - start)
+
+
+def main():
+    setup_django()
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from rest_framework.test import APIClient
+    from rooms_api import cache
+    from rooms_api.models import Reservation, Room
+
+    user = User.objects.create_user(username='bench', password='bench')
+    rooms = Room.objects.bulk_create([Room(name=f'Room {i}', room_manager=user) for i in range(ROOMS)])
+    day = datetime.date(2030, 1, 1)
+    reservations = Reservation.objects.bulk_create([
+        Reservation(room=rooms[i % ROOMS], owner=user, date_from=day, date_to=day, room_password='benchmark0')
+        for i in range(ROOMS * 2)
+    ])
+    client = APIClient()
+    client.force_authenticate(user)
+
+    settings.ROOMS_API_CACHE = None
+    uncached = run(client, rooms, reservations)
+    settings.ROOMS_API_CACHE = 'default'
+    cache.stats.reset()
+    cached = run(client, rooms, reservations)
+    print(f'no cache    {uncached:8.1f} req/s')
+    print(f'read cache  {cached:8.1f} req/s  {cache.stats.snapshot()}')
+    print(f'speed-up: {cached / uncached:.1f}x')
+
+
+if __name__ == '__main__':
+    main()
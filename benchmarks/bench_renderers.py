@@ -0,0 +1,55 @@
+"""
+Serialized reservation rows per second: DRF serializer and renderer vs the
+``.values()`` list path and the orjson renderer.
+
+    python -m benchmarks.bench_renderers [--rows 5000]
+
+Rows are loaded once, so only serialization and encoding are measured.
+"""
+import argparse
+import datetime
+
+from benchmarks.common import measure, report, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=5000)
+    args = parser.parse_args()
+    setup_django()
+    from django.contrib.auth.models import User
+    from rest_framework.renderers import JSONRenderer
+    from rooms_api.models import Reservation, Room
+    from rooms_api.renderers import FastJSONRenderer
+    from rooms_api.serializers import ReservationSerializer
+
+    user = User.objects.create_user(username='bench', password='bench')
+    room = Room.objects.create(name='Room', room_manager=user)
+    day = datetime.date(2030, 1, 1)
+    Reservation.objects.bulk_create([
+        Reservation(room=room, owner=user, date_from=day + datetime.timedelta(days=i),
+                    date_to=day + datetime.timedelta(days=i), comment='Comment', room_password='benchmark0')
+        for i in range(args.rows)
+    ])
+    rows = list(Reservation.objects.select_related('room__room_manager', 'owner').order_by('id'))
+    values = list(Reservation.objects.order_by('id').values(*ReservationSerializer.value_fields))
+
+    def drf():
+        return JSONRenderer().render(ReservationSerializer(rows, many=True).data)
+
+    def from_values():
+        return JSONRenderer().render([ReservationSerializer.from_values(row) for row in values])
+
+    def from_values_fast():
+        return FastJSONRenderer().render([ReservationSerializer.from_values(row) for row in values])
+
+    assert drf() == from_values() == from_values_fast()
+    for label, func in (('DRF fields + JSONRenderer', drf), ('from_values + JSONRenderer', from_values),
+                        ('from_values + FastJSONRenderer', from_values_fast)):
+        stats = measure(func, repeat=20)
+        report(f'{label} ({args.rows} rows)', stats)
+        print(f"{'':<48} {args.rows / stats['p50'] * 1000:12,.0f} rows/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Room search over a large catalogue: ``LIKE '%q%'`` (DRF SearchFilter) vs the
+FTS5 trigram index.
+
+    python -m benchmarks.bench_room_search [--rooms 100000]
+
+Both run the full ``GET /api/rooms/?search=`` request with the read cache off.
+"""
+import argparse
+import itertools
+import random
+
+from benchmarks.common import measure, report, setup_django
+
+ADJECTIVES = ['Blue', 'Green', 'Quiet', 'Sunny', 'Large', 'Small', 'North', 'South', 'Upper', 'Lower']
+NOUNS = ['Conference', 'Meeting', 'Training', 'Workshop', 'Studio', 'Lab', 'Lounge', 'Office', 'Hall', 'Library']
+QUERIES = ['Con', 'Confe', 'Conference', 'quiet lib', 'Worksop', 'Studio 4711', 'Libary 99']
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rooms', type=int, default=100000)
+    args = parser.parse_args()
+    setup_django()
+    from django.conf import settings
+    from django.contrib.auth.models import User
+    from rest_framework.filters import SearchFilter
+    from rest_framework.test import APIClient
+    from rooms_api import search
+    from rooms_api.filters import RoomSearchFilter
+    from rooms_api.models import Room
+    from rooms_api.views import RoomViewSet
+
+    settings.ROOMS_API_CACHE = None
+    random.seed(14)
+    user = User.objects.create_user(username='bench', password='bench')
+    names = itertools.product(ADJECTIVES, NOUNS)
+    Room.objects.bulk_create([
+        Room(name=f'{adjective} {noun} {index}', room_manager=user)
+        for index, (adjective, noun) in zip(range(args.rooms), itertools.cycle(list(names)))
+    ], batch_size=5000)
+    search.rebuild()
+    client = APIClient()
+    client.force_authenticate(user)
+
+    for query in QUERIES:
+        for label, backend in (('LIKE', SearchFilter), ('FTS5', RoomSearchFilter)):
+            RoomViewSet.filter_backends = [backend]
+            response = client.get('/api/rooms/', {'search': query})
+            stats = measure(lambda: client.get('/api/rooms/', {'search': query}), repeat=20)
+            report(f'{label} {query!r} ({response.data["count"]} hits)', stats)
+
+
+if __name__ == '__main__':
+    main()
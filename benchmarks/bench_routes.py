@@ -0,0 +1,304 @@
+"""
+Latency and throughput of every RoomViewSet and ReservationViewSet route.
+
+    python -m benchmarks.bench_routes [--rooms 500] [--reservations 200000] [--repeat 200]
+                                      [--json results.json] [--only reservations-list]
+
+The dataset comes from ``rooms_api.seeding`` (the ``manage.py seed_bench``
+generator) in a throwaway database. Requests go through the in-process test
+client with the bench settings and the read cache off, so each read runs its
+queries. Reads spread over many rooms and reservations. Each write acts on rows
+made for it beforehand, and making them is not timed.
+
+``--json`` writes the results with the commit and dataset; compare two runs with
+``python -m benchmarks.compare base.json head.json``. The script fails if a
+route of the viewsets has no scenario.
+"""
+import argparse
+import datetime
+import itertools
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+
+from benchmarks.common import BASE_DIR, measure, report, setup_django
+
+BATCH = 20
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=BASE_DIR, capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=BASE_DIR,
+                               capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return commit + ('-dirty' if dirty else '')
+
+
+def viewset_routes():
+    """``(route name, method)`` of every RoomViewSet and ReservationViewSet URL."""
+    from rooms_api.urls import router, rooms_router
+    routes = set()
+    for pattern in (*router.urls, *rooms_router.urls):
+        for method in getattr(pattern.callback, 'actions', {}):
+            routes.add((pattern.name, method.upper()))
+    return routes
+
+
+class Scenarios:
+    """One ``prepare() -> (client, method, path, data)`` per route; prepare is not timed."""
+
+    def __init__(self, random_state):
+        from django.contrib.auth.models import User
+        from django.db.models import Max, Min
+        from rest_framework.test import APIClient
+        from rooms_api.models import Reservation, Room
+
+        self.random = random_state
+        self.client = APIClient()
+        self.rooms = list(Room.objects.values_list('id', 'room_manager_id'))
+        self.reservations = list(Reservation.objects.values_list('id', 'room_id', 'owner_id')
+                                 .order_by('?')[:5000])
+        self.users = {user.pk: user for user in User.objects.filter(username__startswith='bench')}
+        # Writes happen in one room, on the days right before and after its seeded reservations.
+        self.room_id, manager_id = self.rooms[0]
+        self.manager = self.users[manager_id]
+        self.owner = self.users[next(pk for pk in self.users if pk != manager_id)]
+        bounds = Reservation.objects.filter(room_id=self.room_id) \
+            .aggregate(first=Min('date_from'), last=Max('date_to'))
+        self.future_days = (bounds['last'] + datetime.timedelta(days=day) for day in itertools.count(1))
+        self.past_days = (bounds['first'] - datetime.timedelta(days=day) for day in itertools.count(1))
+        self.names = (f'Bench room {index}' for index in itertools.count())
+
+    def as_user(self, user):
+        self.client.force_authenticate(user)
+        return self.client
+
+    def reads(self):
+        room_id, manager_id = self.random.choice(self.rooms)
+        return self.as_user(self.users[manager_id]), room_id
+
+    def reservation(self, status=0, past=False, owner=None):
+        from rooms_api.models import Reservation
+        day = next(self.past_days if past else self.future_days)
+        return Reservation.objects.create(room_id=self.room_id, owner=owner or self.owner, date_from=day,
+                                          date_to=day, reservation_status=status)
+
+    def new_reservation_data(self):
+        day = next(self.future_days).isoformat()
+        return {'date_from': day, 'date_to': day, 'training': 'Benchmark', 'comment': 'Created by bench_routes'}
+
+    def new_series_data(self):
+        # A daily series over the next BATCH free days.
+        days = [next(self.future_days) for _ in range(BATCH)]
+        return {'date_from': days[0].isoformat(), 'date_to': days[0].isoformat(), 'until': days[-1].isoformat(),
+                'weekdays': ['MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU'], 'training': 'Benchmark'}
+
+    def series(self):
+        from rooms_api import recurrence
+        from rooms_api.models import Recurrence
+        data = self.new_series_data()
+        item = Recurrence(room_id=self.room_id, owner=self.owner, training=data['training'],
+                          date_from=datetime.date.fromisoformat(data['date_from']),
+                          date_to=datetime.date.fromisoformat(data['date_to']),
+                          until=datetime.date.fromisoformat(data['until']),
+                          weekdays=recurrence.weekday_mask(data['weekdays']))
+        recurrence.create_series(item)
+        return item
+
+    def all(self):
+        from rooms_api.models import Room
+        today = datetime.date.today()
+        period = {'from': today.isoformat(), 'to': (today + datetime.timedelta(days=90)).isoformat()}
+
+        def room_list():
+            client, room_id = self.reads()
+            return client, 'get', '/api/rooms/', {'page_size': 20}
+
+        def room_detail():
+            client, room_id = self.reads()
+            return client, 'get', f'/api/rooms/{room_id}/', None
+
+        def room_create():
+            return self.as_user(self.manager), 'post', '/api/rooms/', \
+                {'name': next(self.names), 'room_manager': self.manager.pk}
+
+        def room_update(method):
+            def prepare():
+                room = Room.objects.create(name=next(self.names), room_manager=self.manager)
+                return self.as_user(self.manager), method, f'/api/rooms/{room.pk}/', \
+                    {'name': next(self.names), 'room_manager': self.manager.pk}
+            return prepare
+
+        def room_destroy():
+            room = Room.objects.create(name=next(self.names), room_manager=self.manager)
+            return self.as_user(self.manager), 'delete', f'/api/rooms/{room.pk}/', None
+
+        def available():
+            client, room_id = self.reads()
+            return client, 'get', '/api/rooms/available/', {'date_from': period['from'], 'date_to': period['to']}
+
+        def availability():
+            client, room_id = self.reads()
+            return client, 'get', f'/api/rooms/{room_id}/availability/', period
+
+        def availability_list():
+            client, room_id = self.reads()
+            return client, 'get', '/api/rooms/availability/', {**period, 'ranges': 0}
+
+        def reservation_list():
+            client, room_id = self.reads()
+            return client, 'get', f'/api/rooms/{room_id}/reservations/', {'page_size': 20}
+
+        def reservation_detail():
+            pk, room_id, owner_id = self.random.choice(self.reservations)
+            return self.as_user(self.users[owner_id]), 'get', f'/api/rooms/{room_id}/reservations/{pk}/', None
+
+        def reservation_create():
+            return self.as_user(self.owner), 'post', f'/api/rooms/{self.room_id}/reservations/', \
+                self.new_reservation_data()
+
+        def reservation_update(method):
+            def prepare():
+                item = self.reservation()
+                return self.as_user(self.owner), method, f'/api/rooms/{self.room_id}/reservations/{item.pk}/', \
+                    self.new_reservation_data()
+            return prepare
+
+        def reservation_destroy():
+            pk, room_id, owner_id = self.random.choice(self.reservations)
+            return self.as_user(self.users[owner_id]), 'delete', f'/api/rooms/{room_id}/reservations/{pk}/', None
+
+        def bulk_create():
+            return self.as_user(self.owner), 'post', f'/api/rooms/{self.room_id}/reservations/bulk-create/', \
+                {'reservations': [self.new_reservation_data() for _ in range(BATCH)]}
+
+        def bulk_status(action, user):
+            def prepare():
+                ids = [self.reservation().pk for _ in range(BATCH)]
+                return self.as_user(user), 'post', f'/api/rooms/{self.room_id}/reservations/bulk-{action}/', \
+                    {'ids': ids}
+            return prepare
+
+        def status_change(action, data, user, status=0, past=False):
+            def prepare():
+                item = self.reservation(status=status, past=past)
+                return self.as_user(user), 'post', \
+                    f'/api/rooms/{self.room_id}/reservations/{item.pk}/{action}/', data
+            return prepare
+
+        def series_list():
+            return self.as_user(self.owner), 'get', f'/api/rooms/{self.room_id}/series/', {'page_size': 20}
+
+        def series_create():
+            return self.as_user(self.owner), 'post', f'/api/rooms/{self.room_id}/series/', self.new_series_data()
+
+        def series_detail():
+            item = self.series()
+            return self.as_user(self.owner), 'get', f'/api/rooms/{self.room_id}/series/{item.pk}/', None
+
+        def series_status(action, user):
+            def prepare():
+                item = self.series()
+                return self.as_user(user), 'post', f'/api/rooms/{self.room_id}/series/{item.pk}/{action}/', {}
+            return prepare
+
+        return {
+            ('rooms-list', 'GET'): room_list,
+            ('rooms-list', 'POST'): room_create,
+            ('rooms-detail', 'GET'): room_detail,
+            ('rooms-detail', 'PUT'): room_update('put'),
+            ('rooms-detail', 'PATCH'): room_update('patch'),
+            ('rooms-detail', 'DELETE'): room_destroy,
+            ('rooms-available', 'GET'): available,
+            ('rooms-availability', 'GET'): availability,
+            ('rooms-availability-list', 'GET'): availability_list,
+            ('reservations-list', 'GET'): reservation_list,
+            ('reservations-list', 'POST'): reservation_create,
+            ('reservations-detail', 'GET'): reservation_detail,
+            ('reservations-detail', 'PUT'): reservation_update('put'),
+            ('reservations-detail', 'PATCH'): reservation_update('patch'),
+            ('reservations-detail', 'DELETE'): reservation_destroy,
+            ('reservations-bulk-create', 'POST'): bulk_create,
+            ('reservations-bulk-confirm', 'POST'): bulk_status('confirm', self.manager),
+            ('reservations-bulk-cancel', 'POST'): bulk_status('cancel', self.owner),
+            ('reservations-confirm', 'POST'): status_change('confirm', {'reservation_status': 1}, self.manager),
+            ('reservations-cancel', 'POST'): status_change('cancel', {'reservation_status': 2}, self.owner),
+            ('reservations-finish', 'POST'): status_change('finish', {'rating': 4.0}, self.owner, status=1,
+                                                           past=True),
+            ('series-list', 'GET'): series_list,
+            ('series-list', 'POST'): series_create,
+            ('series-detail', 'GET'): series_detail,
+            ('series-confirm', 'POST'): series_status('confirm', self.manager),
+            ('series-cancel', 'POST'): series_status('cancel', self.owner),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rooms', type=int, default=500)
+    parser.add_argument('--reservations', type=int, default=200_000)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=21)
+    parser.add_argument('--json', help='Write the results to this file.')
+    parser.add_argument('--only', action='append', help='Route name to run, may be repeated.')
+    args = parser.parse_args()
+    setup_django()
+    import django
+    from django.conf import settings
+    from rooms_api import seeding
+
+    settings.ROOMS_API_CACHE = None
+    start = time.perf_counter()
+    dataset = seeding.Dataset(users=args.users, rooms=args.rooms, reservations=args.reservations, seed=args.seed)
+    seeding.seed(dataset)
+    print(f'seeded {args.reservations:,} reservations in {time.perf_counter() - start:.1f}s', file=sys.stderr)
+
+    scenarios = Scenarios(random.Random(args.seed)).all()
+    missing = viewset_routes() - set(scenarios)
+    if missing:
+        sys.exit(f'No scenario for: {", ".join(f"{method} {name}" for name, method in sorted(missing))}')
+
+    results = {}
+    for (name, method), prepare in scenarios.items():
+        if args.only and name not in args.only:
+            continue
+        statuses = set()
+
+        def call(client, verb, path, data):
+            if verb == 'get':
+                response = client.get(path, data)
+            else:
+                response = getattr(client, verb)(path, data, format='json')
+            statuses.add(response.status_code)
+
+        measure(call, repeat=max(args.repeat // 10, 1), setup=prepare)
+        stats = measure(call, repeat=args.repeat, setup=prepare)
+        label = f'{method} {name}'
+        report(label, stats)
+        results[label] = {**{key: round(value, 4) for key, value in stats.items()},
+                          'throughput': round(1000 / stats['mean'], 1), 'statuses': sorted(statuses)}
+
+    if args.json:
+        with open(args.json, 'w') as output:
+            json.dump({
+                'commit': git_commit(),
+                'created': datetime.datetime.now(datetime.timezone.utc).isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'dataset': {'users': args.users, 'rooms': args.rooms, 'reservations': args.reservations,
+                            'seed': args.seed},
+                'repeat': args.repeat,
+                'unit': 'ms',
+                'results': results,
+            }, output, indent=2)
+
+
+if __name__ == '__main__':
+    main()
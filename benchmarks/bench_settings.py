@@ -0,0 +1,85 @@
+"""
+Startup time and per-request overhead of the settings profiles.
+
+    python -m benchmarks.bench_settings [--profiles dev prod bench] [--starts 10]
+
+``dev`` is what the single ``rooms_app/settings.py`` used to be (DEBUG on,
+debug_toolbar and the browsable API), so it is the baseline. Each profile runs
+in its own process: startup is ``django.setup()`` plus loading the URLconf, and
+requests are authenticated room reads through the full middleware stack, with
+DEBUG as the profile sets it.
+"""
+import argparse
+import importlib
+import os
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+from benchmarks.common import BASE_DIR, measure, report, setup_django
+
+STARTUP = """
+import time
+start = time.perf_counter()
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+print((time.perf_counter() - start) * 1000)
+"""
+
+
+def environment(profile):
+    return {**os.environ, 'DJANGO_SETTINGS_MODULE': f'rooms_app.settings.{profile}',
+            'DJANGO_SECRET_KEY': os.environ.get('DJANGO_SECRET_KEY', 'bench-' + 'x' * 50),
+            'ROOMS_DB_PROFILE': os.environ.get('ROOMS_DB_PROFILE', 'sqlite')}
+
+
+def startup(profile, starts):
+    timings = []
+    for _ in range(starts):
+        output = subprocess.run([sys.executable, '-c', STARTUP], cwd=BASE_DIR, env=environment(profile),
+                                check=True, capture_output=True, text=True).stdout
+        timings.append(float(output))
+    timings.sort()
+    return {'min': timings[0], 'median': timings[len(timings) // 2]}
+
+
+def run_profile(profile):
+    settings_module = f'rooms_app.settings.{profile}'
+    with tempfile.TemporaryDirectory() as directory:
+        setup_django(settings_module, test_db_name=Path(directory) / 'bench.sqlite3')
+        from django.conf import settings
+        from django.contrib.auth.models import User
+        from rest_framework.test import APIClient
+        from rooms_api.models import Room
+
+        settings.DEBUG = importlib.import_module(settings_module).DEBUG
+        settings.ALLOWED_HOSTS = ['*']
+        user = User.objects.create_user(username='bench', password='bench')
+        room = Room.objects.create(name='Room', room_manager=user)
+        client = APIClient()
+        client.force_authenticate(user)
+        url = f'/api/rooms/{room.pk}/'
+        assert client.get(url).status_code == 200
+        report(f'{profile}: GET {url}', measure(lambda: client.get(url), repeat=1000))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--profiles', nargs='+', default=['dev', 'prod', 'bench'])
+    parser.add_argument('--starts', type=int, default=10)
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        return run_profile(args.child)
+    for profile in args.profiles:
+        report(f'{profile}: startup', startup(profile, args.starts))
+    for profile in args.profiles:
+        subprocess.run([sys.executable, '-m', 'benchmarks.bench_settings', '--child', profile], cwd=BASE_DIR,
+                       env=environment(profile), check=True)
+
+
+if __name__ == '__main__':
+    main()
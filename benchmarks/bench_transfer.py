@@ -0,0 +1,73 @@
+"""
+Round trip of the reservation table through ``export_reservations`` and ``import_reservations``.
+
+    python -m benchmarks.bench_transfer [--reservations 1000000] [--format csv] [--chunk-size 2000]
+
+Seeds the dataset with ``rooms_api.seeding``, exports it to a temporary file,
+empties the reservation table and imports the file back. Prints the time and
+rows per second of each direction, and the peak resident memory after seeding
+and after the round trip: with constant-memory pipelines the second stays
+close to the first. The database is a temporary file, so its pages do not
+count as memory of the process.
+"""
+import argparse
+import io
+import os
+import resource
+import sys
+import tempfile
+import time
+
+from benchmarks.common import setup_django
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--reservations', type=int, default=1_000_000)
+    parser.add_argument('--rooms', type=int, default=2000)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--format', choices=('csv', 'jsonl'), default='csv')
+    parser.add_argument('--chunk-size', type=int, default=2000)
+    args = parser.parse_args()
+    directory = tempfile.TemporaryDirectory()
+    setup_django(test_db_name=os.path.join(directory.name, 'bench.sqlite3'))
+    from django.conf import settings
+    from django.core.management import call_command
+    from django.db import connection
+    from rooms_api import ratings, seeding
+    from rooms_api.models import Reservation, RoomOccupancy
+
+    settings.ROOMS_API_CACHE = None
+    seeding.seed(seeding.Dataset(users=args.users, rooms=args.rooms, reservations=args.reservations))
+    print(f'seeded {args.reservations:,} reservations, peak RSS {peak_rss_mb():.0f} MB', file=sys.stderr)
+
+    with directory:
+        path = os.path.join(directory.name, f'reservations.{args.format}')
+        start = time.perf_counter()
+        call_command('export_reservations', path, '--chunk-size', str(args.chunk_size), stdout=io.StringIO())
+        elapsed = time.perf_counter() - start
+        print(f'export  {elapsed:7.1f}s {args.reservations / elapsed:10,.0f} rows/s '
+              f'{os.path.getsize(path) / 2 ** 20:8.1f} MB file')
+
+        with connection.cursor() as cursor:
+            for model in (Reservation, RoomOccupancy):
+                cursor.execute(f'DELETE FROM {connection.ops.quote_name(model._meta.db_table)}')
+        ratings.reconcile()
+
+        start = time.perf_counter()
+        call_command('import_reservations', path, '--chunk-size', str(args.chunk_size), stdout=io.StringIO())
+        elapsed = time.perf_counter() - start
+        print(f'import  {elapsed:7.1f}s {args.reservations / elapsed:10,.0f} rows/s')
+        imported = Reservation.objects.count()
+        print(f'{imported:,} rows imported, peak RSS {peak_rss_mb():.0f} MB')
+        if imported != args.reservations:
+            sys.exit('Round trip lost rows')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""
+10k-row reads: model instances and DRF fields vs the ``.values()`` fast path.
+
+    python -m benchmarks.bench_values [--rows 10000]
+
+Each variant includes the query. The last line is a full streamed response of
+all the room's reservations, which uses the ``.values()`` path.
+"""
+import argparse
+import datetime
+
+from benchmarks.common import measure, report, setup_django
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=10000)
+    args = parser.parse_args()
+    setup_django()
+    from django.contrib.auth.models import User
+    from rest_framework.test import APIClient
+    from rooms_api.models import Reservation, Room
+    from rooms_api.renderers import dumps
+    from rooms_api.serializers import ReservationSerializer, RoomSerializer
+
+    user = User.objects.create_user(username='bench', password='bench')
+    rooms = Room.objects.bulk_create([Room(name=f'Room {i}', room_manager=user) for i in range(args.rows)])
+    room = rooms[0]
+    day = datetime.date(2030, 1, 1)
+    Reservation.objects.bulk_create([
+        Reservation(room=room, owner=user, date_from=day + datetime.timedelta(days=i),
+                    date_to=day + datetime.timedelta(days=i), comment='Comment', room_password='benchmark0')
+        for i in range(args.rows)
+    ])
+    reservations = Reservation.objects.filter(room=room).order_by('date_from', 'id')
+
+    reservation_serializer = ReservationSerializer()
+    variants = {
+        'rooms: model instances + fields': lambda: RoomSerializer(Room.objects.order_by('id'), many=True).data,
+        'rooms: values()': lambda: [
+            RoomSerializer.from_values(row) for row in Room.objects.order_by('id').values(*RoomSerializer.value_fields)],
+        'reservations: model instances + fields': lambda: [
+            reservation_serializer.to_representation(item)
+            for item in reservations.select_related('room__room_manager', 'owner')],
+        'reservations: values()': lambda: [
+            ReservationSerializer.from_values(row) for row in reservations.values(*ReservationSerializer.value_fields)],
+    }
+    assert dumps(variants['reservations: values()']()) == dumps(variants['reservations: model instances + fields']())
+    for label, func in variants.items():
+        stats = measure(func, repeat=10)
+        report(f'{label} ({args.rows})', stats)
+        print(f"{'':<48} {args.rows / stats['p50'] * 1000:12,.0f} rows/s")
+
+    client = APIClient()
+    client.force_authenticate(user)
+    url = f'/api/rooms/{room.pk}/reservations/'
+    report(f'GET {url}?stream=1 ({args.rows})',
+           measure(lambda: b''.join(client.get(url, {'stream': 1}).streaming_content), repeat=10))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Every script runs against a throwaway test database, so it is safe to run them
+next to a development ``db.sqlite3``:
+
+    python -m benchmarks.bench_conflicts
+"""
+import logging
+import os
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django(settings_module='rooms_app.settings.bench', test_db_name=None):
+    """
+    Configure Django and create an empty test database.
+
+    The database lives in memory unless ``test_db_name`` is given; concurrent
+    benchmarks need a file so that every thread gets its own connection.
+    """
+    sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+    from django.conf import settings
+    from django.db import connection
+    # Like the Django test runner: no debug_toolbar or query log in measurements.
+    settings.DEBUG = False
+    logging.getLogger('django.request').setLevel(logging.ERROR)
+    if test_db_name is not None:
+        settings.DATABASES['default'].setdefault('TEST', {})['NAME'] = str(test_db_name)
+    from django.test.utils import setup_test_environment
+    setup_test_environment()
+    connection.creation.create_test_db(verbosity=0)
+
+
+def measure(func, repeat=200, setup=None):
+    """
+    Call ``func`` ``repeat`` times and return latency statistics in milliseconds.
+
+    With ``setup``, each call is ``func(*setup())`` and only ``func`` is timed.
+    """
+    timings = []
+    for _ in range(repeat):
+        args = setup() if setup is not None else ()
+        start = time.perf_counter()
+        func(*args)
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        'p50': statistics.median(timings),
+        'p95': timings[int(len(timings) * 0.95) - 1],
+        'p99': timings[int(len(timings) * 0.99) - 1],
+        'mean': statistics.fmean(timings),
+    }
+
+
+def report(label, stats):
+    print(f"{label:<48} " + ' '.join(f"{key}={value:8.3f}ms" for key, value in stats.items()))
@@ -0,0 +1,55 @@
+"""
+Compare two ``bench_routes --json`` result files.
+
+    python -m benchmarks.compare base.json head.json [--metric p50] [--threshold 10]
+
+Prints the change of every route and exits with status 1 when one got slower
+than ``--threshold`` percent on ``--metric``, so it can gate CI.
+"""
+import argparse
+import json
+import sys
+
+METRICS = ('p50', 'p95', 'p99', 'mean')
+
+
+def load(path):
+    with open(path) as source:
+        return json.load(source)
+
+
+def change(base, head):
+    return 100 * (head / base - 1) if base else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('base')
+    parser.add_argument('head')
+    parser.add_argument('--metric', choices=METRICS, default='p50')
+    parser.add_argument('--threshold', type=float, default=10, help='Slowdown in percent that fails.')
+    args = parser.parse_args()
+    base, head = load(args.base), load(args.head)
+    if base['dataset'] != head['dataset']:
+        print(f"warning: datasets differ: {base['dataset']} vs {head['dataset']}", file=sys.stderr)
+    print(f"{base['commit']} -> {head['commit']}")
+    print(f"{'route':<36} " + ' '.join(f'{metric:>16}' for metric in METRICS))
+    regressions = []
+    for label, after in head['results'].items():
+        before = base['results'].get(label)
+        if before is None:
+            print(f'{label:<36} new')
+            continue
+        cells = [f'{after[metric]:8.3f} {change(before[metric], after[metric]):+6.1f}%' for metric in METRICS]
+        slower = change(before[args.metric], after[args.metric]) > args.threshold
+        print(f'{label:<36} ' + ' '.join(cells) + ('  SLOWER' if slower else ''))
+        if slower:
+            regressions.append(label)
+    for label in base['results'].keys() - head['results'].keys():
+        print(f'{label:<36} removed')
+    if regressions:
+        sys.exit(f'{len(regressions)} routes slower than {args.threshold}% on {args.metric}: {", ".join(regressions)}')
+
+
+if __name__ == '__main__':
+    main()
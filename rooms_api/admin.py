@@ -1,7 +1,10 @@
 from django.contrib import admin
 
 # Register your models here.
-from .models import Room, Reservation
+from .models import Job, Recurrence, Room, Reservation, ReservationArchive
 
 admin.site.register(Room)
-admin.site.register(Reservation)
\ No newline at end of file
+admin.site.register(Reservation)
+admin.site.register(Recurrence)
+admin.site.register(ReservationArchive)
+admin.site.register(Job)
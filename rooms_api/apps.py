@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class RoomsApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'rooms_api'
+
+    def ready(self):
+        from rooms_api import handlers, signals  # noqa: F401
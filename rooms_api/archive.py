@@ -0,0 +1,120 @@
+"""
+Archive of reservations that ended long ago.
+
+New terms must start today or later, and a training can be rated only until
+``ROOMS_API_ARCHIVE_AFTER_DAYS`` days after it ended (``can_rate``). So a
+reservation that ended before then can never conflict or change again. Left in
+the live table it still costs every conflict check, list and bulk action that
+scans it. ``archive`` moves reservations that ended before a cutoff to
+ReservationArchive. The live table then holds about the last
+``ROOMS_API_ARCHIVE_AFTER_DAYS`` days plus the booked future, however old the
+deployment is. An archive run with a shorter ``--older-than`` still leaves
+unrated confirmed reservations live while they can be rated.
+
+Rows move ``batch_size`` at a time. Each batch is one transaction: an
+``INSERT ... SELECT`` into the archive, then a ``DELETE`` of exactly the rows
+copied, so a row is never in both tables or in neither. The delete skips the
+Reservation signals. Archived confirmed days stay set in the occupancy bitsets
+(``occupancy.rebuild`` reads both tables), and room rating statistics keep the
+archived ratings (so does ``ratings.reconcile``).
+
+Hot paths read only live rows. History reads union the archive:
+- the reservation list and the CSV/JSONL export with ``?archived=1``
+  (``export_reservations --archived``);
+- a reservation detail;
+- calendar feeds;
+- windows of a series.
+"""
+import datetime
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import DateTimeField, Q, Value
+from django.utils import timezone
+
+from rooms_api import cache
+from rooms_api.availability import CONFIRMED
+from rooms_api.conditional import touch_reservations
+from rooms_api.models import Reservation, ReservationArchive
+
+DEFAULT_AFTER_DAYS = 180
+BATCH_SIZE = 2000
+
+
+def cutoff(older_than=None, today=None):
+    """The first day whose reservations stay live: ``older_than`` days (the setting by default) before today."""
+    if older_than is None:
+        older_than = getattr(settings, 'ROOMS_API_ARCHIVE_AFTER_DAYS', DEFAULT_AFTER_DAYS)
+    return (today or datetime.date.today()) - datetime.timedelta(days=older_than)
+
+
+def can_rate(date_to, today=None):
+    """Whether a training that ended on ``date_to`` can still be rated."""
+    return date_to >= cutoff(today=today)
+
+
+def archivable(before):
+    """Live reservations that ended before ``before``, except unrated confirmed ones that can still be rated."""
+    rateable = Q(reservation_status=CONFIRMED, rating__isnull=True, date_to__gte=cutoff())
+    return Reservation.objects.filter(date_to__lt=before).exclude(rateable)
+
+
+def archived():
+    return ReservationArchive.objects.select_related('room__room_manager', 'owner')
+
+
+def wants_archive(request):
+    return request.query_params.get('archived') in ('1', 'true')
+
+
+def with_archive(live, history, *fields):
+    """One queryset of the ``fields`` of the ``live`` rows and the ``history`` rows, to be ordered by the caller."""
+    return live.order_by().values_list(*fields).union(history.order_by().values_list(*fields), all=True)
+
+
+def move_sql(first, last, before, now):
+    """SQL and parameters copying the archivable rows with ids ``first..last``, then deleting the copies."""
+    fields = [field.attname for field in Reservation._meta.concrete_fields]
+    select, params = archivable(before).filter(id__range=(first, last)) \
+        .annotate(archived=Value(now, output_field=DateTimeField())) \
+        .values_list(*fields, 'archived').order_by().query.sql_with_params()
+    quote = connection.ops.quote_name
+    live, history = quote(Reservation._meta.db_table), quote(ReservationArchive._meta.db_table)
+    columns = ', '.join(quote(ReservationArchive._meta.get_field(name).column) for name in (*fields, 'archived_at'))
+    pk = quote(Reservation._meta.pk.column)
+    copy = (f'INSERT INTO {history} ({columns}) {select}', params)
+    delete = (f'DELETE FROM {live} WHERE {pk} BETWEEN %s AND %s '
+              f'AND {pk} IN (SELECT {pk} FROM {history} WHERE {pk} BETWEEN %s AND %s)', [first, last, first, last])
+    return copy, delete
+
+
+def archive_batch(before, after_id=0, batch_size=BATCH_SIZE):
+    """
+    Move the next ``batch_size`` archivable reservations with an id above ``after_id``.
+
+    Returns the number moved and the last id of the batch, or ``(0, None)`` when nothing is left.
+    """
+    rows = list(archivable(before).filter(id__gt=after_id).order_by('id').values_list('id', 'room_id')[:batch_size])
+    if not rows:
+        return 0, None
+    first, last = rows[0][0], rows[-1][0]
+    copy, delete = move_sql(first, last, before, timezone.now())
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(*copy)
+        moved = cursor.rowcount
+        cursor.execute(*delete)
+        for room_id in sorted({room_id for _, room_id in rows}):
+            cache.invalidate_room(room_id)
+            touch_reservations(room_id)
+    return moved, last
+
+
+def archive(before, batch_size=BATCH_SIZE, progress=None):
+    """Move every reservation that ended before ``before`` to the archive; returns how many moved."""
+    total, after_id = 0, 0
+    while True:
+        moved, after_id = archive_batch(before, after_id, batch_size)
+        if after_id is None:
+            return total
+        total += moved
+        if progress:
+            progress(total)
@@ -0,0 +1,122 @@
+"""
+Async versions of the hot read endpoints, for ASGI deployments.
+
+Mounted under ``/api/async/`` with the paths, query parameters and JSON of the
+viewsets: room list, detail and availability, reservation list and detail
+(both with archived reservations, see rooms_api/archive.py).
+They read with the async ORM, so under an ASGI server a slow client does not
+hold a worker thread. DRF does not run async views, so these are plain Django
+views: they authenticate with the session only and skip the read cache and
+conditional request handling of the viewsets.
+"""
+from functools import wraps
+from types import SimpleNamespace
+from asgiref.sync import sync_to_async
+from django.http import Http404, HttpResponse, HttpResponseNotAllowed
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotAuthenticated, ValidationError
+from rest_framework.request import Request
+
+from rooms_api import archive, occupancy
+from rooms_api.filters import RoomOrderingFilter, RoomSearchFilter
+from rooms_api.models import Reservation, Room, RoomOccupancy
+from rooms_api.pagination import ReservationPagination, RoomPagination
+from rooms_api.renderers import dumps
+from rooms_api.serializers import AvailabilityQuerySerializer, ReservationSerializer, \
+    ReservationWithPasswordSerializer, RoomSerializer
+from rooms_api.views import RoomViewSet
+
+
+def json_response(data, status=status.HTTP_200_OK):
+    return HttpResponse(dumps(data), status=status, content_type='application/json')
+
+
+@sync_to_async
+def authenticated_user(request):
+    user = request.user
+    return user if user.is_authenticated else None
+
+
+def async_read_view(view):
+    """GET only, authenticated, with DRF-style JSON error responses."""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'GET':
+            return HttpResponseNotAllowed(['GET'])
+        try:
+            user = await authenticated_user(request)
+            if user is None:
+                raise NotAuthenticated
+            return await view(Request(request), user, *args, **kwargs)
+        except Http404:
+            return json_response({'detail': 'Not found.'}, status.HTTP_404_NOT_FOUND)
+        except APIException as exc:
+            data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+            return json_response(data, status.HTTP_403_FORBIDDEN if isinstance(exc, NotAuthenticated)
+                                 else exc.status_code)
+    return wrapper
+
+
+@async_read_view
+async def room_list(request, user):
+    view = SimpleNamespace(ranked=False, ordering_fields=RoomViewSet.ordering_fields)
+    queryset = Room.objects.order_by('id')
+    if request.query_params.get('search'):
+        # Ranking runs a query of its own, so the filter goes through a thread.
+        queryset = await sync_to_async(RoomSearchFilter().filter_queryset)(request, queryset, view)
+    queryset = RoomOrderingFilter().filter_queryset(request, queryset, view)
+    paginator = RoomPagination()
+    rows = await paginator.apaginate_queryset(queryset.values(*RoomSerializer.value_fields), request, view)
+    return json_response(paginator.get_paginated_response([RoomSerializer.from_values(row) for row in rows]).data)
+
+
+@async_read_view
+async def room_detail(request, user, pk):
+    row = await Room.objects.filter(pk=pk).values(*RoomSerializer.value_fields).afirst()
+    if row is None:
+        raise Http404
+    return json_response(RoomSerializer.from_values(row))
+
+
+@async_read_view
+async def room_availability(request, user, pk):
+    query = AvailabilityQuerySerializer(data={'date_from': request.query_params.get('from'),
+                                              'date_to': request.query_params.get('to')})
+    if not query.is_valid():
+        raise ValidationError(query.errors)
+    date_from, date_to = query.validated_data['date_from'], query.validated_data['date_to']
+    # The room and its bitset in one query (each async ORM call is a hop to the sync thread).
+    row = await Room.objects.filter(pk=pk).values('occupancy__origin', 'occupancy__bitmap').afirst()
+    if row is None:
+        raise Http404
+    bitset = RoomOccupancy(room_id=pk, origin=row['occupancy__origin'], bitmap=row['occupancy__bitmap'] or b'')
+    data = occupancy.describe(occupancy.window(bitset, date_from, date_to), date_from)
+    return json_response({'room': pk, 'from': date_from, 'to': date_to, **data})
+
+
+@async_read_view
+async def reservation_list(request, user, room_pk):
+    paginator = ReservationPagination()
+    queryset = Reservation.objects.filter(room__pk=room_pk).values(*ReservationSerializer.value_fields)
+    if archive.wants_archive(request):
+        history = archive.archived().filter(room__pk=room_pk).values(*ReservationSerializer.value_fields)
+        rows = await paginator.apaginate_querysets([queryset, history], request)
+    else:
+        rows = await paginator.apaginate_queryset(queryset, request)
+    if not rows and not await Room.objects.filter(pk=room_pk).aexists():
+        raise Http404
+    return json_response(paginator.get_paginated_response(
+        [ReservationSerializer.from_values(row) for row in rows]).data)
+
+
+@async_read_view
+async def reservation_detail(request, user, room_pk, pk):
+    item = await Reservation.objects.select_related('room__room_manager', 'owner') \
+        .filter(pk=pk, room__pk=room_pk).afirst()
+    if item is None:
+        item = await archive.archived().filter(pk=pk, room__pk=room_pk).afirst()
+    if item is None:
+        raise Http404
+    if item.owner_id == user.pk and item.reservation_status == 1:
+        return json_response(ReservationWithPasswordSerializer(item).data)
+    return json_response(ReservationSerializer(item).data)
@@ -0,0 +1,88 @@
+import datetime
+from bisect import bisect_right
+from django.db.models import Exists, OuterRef, Q
+
+from rooms_api.models import Reservation, Room
+
+CONFIRMED = 1
+BLOCKING_STATUSES = [CONFIRMED, ]
+EXISTS_LIMIT = 4
+
+
+def overlap_q(date_from, date_to, prefix=''):
+    """
+    Half-open overlap predicate for reservations.
+
+    Reservation dates are inclusive, so a stay is treated as [date_from, date_to + 1 day).
+    Two ranges [a, b) and [c, d) overlap when a < d and c < b.
+    """
+    end = date_to + datetime.timedelta(days=1)
+    return Q(**{f'{prefix}date_from__lt': end}) & Q(**{f'{prefix}date_to__gte': date_from})
+
+
+def blocking_reservations(room, exclude=None):
+    """Return reservations of the room which can conflict with a new term."""
+    queryset = Reservation.objects.filter(room=room, reservation_status__in=BLOCKING_STATUSES)
+    if exclude is not None:
+        queryset = queryset.exclude(pk__in=exclude)
+    return queryset
+
+
+def check_conflicts(room, ranges, exclude=None):
+    """
+    Check date ranges against confirmed reservations of the room.
+
+    ``ranges`` is an iterable of ``(date_from, date_to)`` pairs, ``exclude`` an optional
+    iterable of reservation pks to ignore (e.g. the reservation being updated).
+    Returns a list of booleans, one per range. A few ranges are evaluated as EXISTS
+    subqueries in a single statement backed by the ``reservation_conflict_idx`` index;
+    larger batches read the confirmed terms of the covered period once instead.
+    """
+    ranges = list(ranges)
+    if not ranges:
+        return []
+    room_pk = getattr(room, 'pk', room)
+    if exclude is not None:
+        exclude = [getattr(item, 'pk', item) for item in exclude]
+    if len(ranges) > EXISTS_LIMIT:
+        return scan_conflicts(room_pk, ranges, exclude)
+    candidates = blocking_reservations(OuterRef('pk'), exclude=exclude)
+    annotations = {
+        f'conflict_{index}': Exists(candidates.filter(overlap_q(date_from, date_to)))
+        for index, (date_from, date_to) in enumerate(ranges)
+    }
+    row = Room.objects.filter(pk=room_pk).annotate(**annotations).values_list(*annotations).first()
+    if row is None:
+        return [False] * len(ranges)
+    return list(row)
+
+
+def scan_conflicts(room_pk, ranges, exclude=None):
+    """Check many ranges with one range scan and a sweep over the confirmed terms."""
+    period_from = min(date_from for date_from, _ in ranges)
+    period_to = max(date_to for _, date_to in ranges)
+    terms = blocking_reservations(room_pk, exclude=exclude).filter(overlap_q(period_from, period_to)) \
+        .order_by('date_from').values_list('date_from', 'date_to')
+    starts = []
+    latest_ends = []
+    for date_from, date_to in terms:
+        starts.append(date_from)
+        latest_ends.append(max(date_to, latest_ends[-1]) if latest_ends else date_to)
+    conflicts = []
+    for date_from, date_to in ranges:
+        # Terms starting on or before date_to overlap when any of them ends on or after date_from.
+        index = bisect_right(starts, date_to)
+        conflicts.append(index > 0 and latest_ends[index - 1] >= date_from)
+    return conflicts
+
+
+def has_conflict(room, date_from, date_to, exclude=None):
+    """Return True when the room is already reserved in the given term."""
+    return check_conflicts(room, [(date_from, date_to)], exclude=exclude)[0]
+
+
+def available_rooms(rooms, date_from, date_to):
+    """Filter a Room queryset down to rooms without a confirmed reservation in the term (anti-join)."""
+    taken = Reservation.objects.filter(overlap_q(date_from, date_to), room=OuterRef('pk'),
+                                       reservation_status__in=BLOCKING_STATUSES)
+    return rooms.filter(~Exists(taken))
@@ -0,0 +1,45 @@
+import time
+from django.db import OperationalError, connection, transaction
+from django.db.models import F
+
+from rooms_api.models import Room
+
+LOCK_ATTEMPTS = 6
+LOCK_BACKOFF = 0.02
+
+
+def lock_room(room_id):
+    """
+    Serialize bookings of one room until the surrounding transaction ends.
+
+    Backends with row locks take ``SELECT ... FOR UPDATE`` on the room, so
+    bookings of unrelated rooms run in parallel. SQLite has no row locks; a no-op
+    UPDATE grabs its write lock at the start of the transaction instead of at the
+    first INSERT, which closes the check-then-write window.
+    """
+    if connection.features.has_select_for_update:
+        list(Room.objects.select_for_update().filter(pk=room_id).values_list('pk'))
+    else:
+        Room.objects.filter(pk=room_id).update(name=F('name'))
+
+
+def is_lock_error(exc):
+    return 'is locked' in str(exc)
+
+
+def run_locked(room_id, func, attempts=LOCK_ATTEMPTS, backoff=LOCK_BACKOFF):
+    """
+    Run ``func`` in a transaction holding the room lock and return its result.
+
+    SQLite "database is locked" errors are retried with exponential backoff,
+    at most ``attempts`` times.
+    """
+    for attempt in range(attempts):
+        try:
+            with transaction.atomic():
+                lock_room(room_id)
+                return func()
+        except OperationalError as exc:
+            if not is_lock_error(exc) or attempt == attempts - 1:
+                raise
+            time.sleep(backoff * 2 ** attempt)
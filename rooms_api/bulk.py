@@ -0,0 +1,142 @@
+from bisect import bisect_left
+from django.db import transaction
+from django.utils import timezone
+
+from rooms_api import cache, occupancy
+from rooms_api.availability import CONFIRMED, check_conflicts
+from rooms_api.booking import run_locked
+from rooms_api.conditional import touch_reservations
+from rooms_api.handlers import publish_status_change
+from rooms_api.models import Reservation
+
+MAX_BATCH = 500
+CANCELLED = 2
+RESERVED_MESSAGE = 'Room is reserved at this term'
+NO_PERMISSION = 'You do not have permission to perform this action.'
+
+
+class TermSet:
+    """Non-overlapping inclusive date ranges kept sorted by start, for in-batch conflicts."""
+
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+
+    def claim(self, date_from, date_to):
+        """Add the range and return True, or return False if it overlaps a claimed one."""
+        index = bisect_left(self.starts, date_from)
+        if index > 0 and self.ends[index - 1] >= date_from:
+            return False
+        if index < len(self.starts) and self.starts[index] <= date_to:
+            return False
+        self.starts.insert(index, date_from)
+        self.ends.insert(index, date_to)
+        return True
+
+
+def create_reservations(room, owner, serializers):
+    """
+    Validate the serializers and create the valid, free terms with one bulk INSERT.
+
+    Returns one result dict per serializer, in input order.
+    """
+    results = [None] * len(serializers)
+    valid = []
+    for index, serializer in enumerate(serializers):
+        if serializer.is_valid():
+            valid.append(index)
+        else:
+            results[index] = {'index': index, 'errors': serializer.errors}
+
+    def book():
+        terms = [(serializers[index].validated_data['date_from'], serializers[index].validated_data['date_to'])
+                 for index in valid]
+        conflicts = check_conflicts(room, terms)
+        new = []
+        for index, conflict in zip(valid, conflicts):
+            if conflict:
+                results[index] = {'index': index, 'errors': {'non_field_errors': [RESERVED_MESSAGE]}}
+            else:
+                new.append((index, Reservation(room=room, owner=owner, **serializers[index].validated_data)))
+        Reservation.objects.bulk_create([reservation for _, reservation in new])
+        cache.invalidate_room(room.pk)
+        touch_reservations(room.pk)
+        for index, reservation in new:
+            results[index] = {'index': index, 'pk': reservation.pk, 'status': 'created'}
+
+    if valid:
+        run_locked(room.pk, book)
+    return results
+
+
+def load_batch(room, ids):
+    """Fetch the reservations of the room named by ``ids`` in one query, plus a result slot per id."""
+    found = Reservation.objects.filter(room=room, pk__in=ids).in_bulk()
+    results = {pk: {'pk': pk, 'errors': ['Not found.']} for pk in ids if pk not in found}
+    return found, results
+
+
+def confirm_reservations(room, user, ids):
+    """
+    Confirm many reservations of one room, rejecting conflicts with the calendar and inside the batch.
+
+    The caller checks that ``user`` manages the room.
+    """
+    ids = list(dict.fromkeys(ids))
+
+    def book():
+        found, results = load_batch(room, ids)
+        batch = [found[pk] for pk in ids if pk in found]
+        accepted = TermSet()
+        for item in batch:
+            if item.reservation_status == CONFIRMED:
+                accepted.claim(item.date_from, item.date_to)
+                results[item.pk] = {'pk': item.pk, 'status': 'confirmed'}
+        pending = [item for item in batch if item.reservation_status != CONFIRMED]
+        conflicts = check_conflicts(room, [(item.date_from, item.date_to) for item in pending], exclude=list(found))
+        confirmed = []
+        for item, conflict in zip(pending, conflicts):
+            if conflict or not accepted.claim(item.date_from, item.date_to):
+                results[item.pk] = {'pk': item.pk, 'errors': [RESERVED_MESSAGE]}
+            else:
+                item.reservation_status = CONFIRMED
+                confirmed.append(item)
+                results[item.pk] = {'pk': item.pk, 'status': 'confirmed'}
+        now = timezone.now()
+        Reservation.objects.filter(pk__in=[item.pk for item in confirmed]) \
+            .update(reservation_status=CONFIRMED, updated_at=now)
+        for item in confirmed:
+            item.updated_at = now
+        publish_status_change(confirmed, 'confirm', user)
+        occupancy.mark_many(room.pk, [(item.date_from, item.date_to) for item in confirmed], booked=True)
+        cache.invalidate_room(room.pk)
+        touch_reservations(room.pk)
+        return [results[pk] for pk in ids]
+
+    return run_locked(room.pk, book)
+
+
+def cancel_reservations(room, user, ids):
+    """Cancel many reservations of one room owned by ``user``."""
+    ids = list(dict.fromkeys(ids))
+    with transaction.atomic():
+        found, results = load_batch(room, ids)
+        cancelled, changed = [], []
+        now = timezone.now()
+        for pk, item in found.items():
+            if item.owner_id != user.pk:
+                results[pk] = {'pk': pk, 'errors': [NO_PERMISSION]}
+                continue
+            if item.reservation_status == CONFIRMED:
+                cancelled.append((item.date_from, item.date_to))
+            item.reservation_status = CANCELLED
+            item.updated_at = now
+            changed.append(item)
+            results[pk] = {'pk': pk, 'status': 'cancelled'}
+        Reservation.objects.filter(pk__in=[item.pk for item in changed]) \
+            .update(reservation_status=CANCELLED, updated_at=now)
+        publish_status_change(changed, 'cancel', user)
+        occupancy.mark_many(room.pk, cancelled, booked=False)
+        cache.invalidate_room(room.pk)
+        touch_reservations(room.pk)
+    return [results[pk] for pk in ids]
@@ -0,0 +1,129 @@
+"""
+Read-through cache for room and reservation reads.
+
+Entries are keyed by the version token of every scope they depend on
+(``rooms`` for the room catalogue, ``room:<pk>`` for one room and its
+reservations). Writes replace the token, so stale entries are never read again
+and simply expire.
+
+Settings:
+    ROOMS_API_CACHE           cache alias to use, ``None`` disables caching
+    ROOMS_API_CACHE_TIMEOUT   lifetime of entries in seconds
+"""
+import hashlib
+import threading
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+KEY_PREFIX = 'rooms_api'
+CATALOGUE = 'rooms'
+DEFAULT_TIMEOUT = 300
+
+
+class CacheStats:
+    """Thread-safe hit and miss counters."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.hits = 0
+            self.misses = 0
+
+    def record(self, hit):
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def snapshot(self):
+        with self.lock:
+            total = self.hits + self.misses
+            return {'hits': self.hits, 'misses': self.misses,
+                    'hit_ratio': self.hits / total if total else 0.0}
+
+
+stats = CacheStats()
+
+
+def get_cache():
+    alias = getattr(settings, 'ROOMS_API_CACHE', 'default')
+    return None if alias is None else caches[alias]
+
+
+def room_scope(room_pk):
+    try:
+        room_pk = int(room_pk)
+    except (TypeError, ValueError):
+        pass
+    return f'room:{room_pk}'
+
+
+def version_key(scope):
+    return f'{KEY_PREFIX}:version:{scope}'
+
+
+def new_token():
+    return time.time_ns()
+
+
+def versions(cache, scopes):
+    """Current version tokens of the scopes, creating missing ones."""
+    keys = [version_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    for key in keys:
+        if key not in found:
+            cache.add(key, new_token(), None)
+            found[key] = cache.get(key)
+    return [found[key] for key in keys]
+
+
+def cached(parts, scopes, compute):
+    """Return the cached value for ``parts`` under the current scope versions, computing it on a miss."""
+    cache = get_cache()
+    if cache is None:
+        return compute()
+    signature = ':'.join([*map(str, parts), *map(str, versions(cache, scopes))])
+    key = f'{KEY_PREFIX}:{hashlib.sha1(signature.encode()).hexdigest()}'
+    value = cache.get(key)
+    stats.record(hit=value is not None)
+    if value is None:
+        value = compute()
+        cache.set(key, value, getattr(settings, 'ROOMS_API_CACHE_TIMEOUT', DEFAULT_TIMEOUT))
+    return value
+
+
+def invalidate(*scopes):
+    """
+    Replace the version tokens of the scopes.
+
+    Done once right away and once more after commit, so a read racing the
+    transaction can not cache pre-commit data under the final version.
+    """
+    cache = get_cache()
+    if cache is None:
+        return
+
+    def bump():
+        cache.set_many({version_key(scope): new_token() for scope in scopes}, None)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def invalidate_room(room_pk, catalogue=False):
+    """Drop cached reads of one room and its reservations, and optionally of the room lists."""
+    scopes = [room_scope(room_pk)]
+    if catalogue:
+        scopes.append(CATALOGUE)
+    invalidate(*scopes)
+
+
+def request_parts(request):
+    """Key parts identifying a read by URL, including host and query string."""
+    return ['GET', request.get_host(), request.get_full_path()]
@@ -0,0 +1,141 @@
+"""
+ETag / Last-Modified support for the room and reservation viewsets.
+
+Validators come from ``updated_at`` columns, the per-room reservation version
+and the room catalogue version, fetched with small indexed queries, so an unchanged poll is answered with
+304 before any serializer runs.
+"""
+import hashlib
+from calendar import timegm
+from functools import wraps
+from django.db.models import Count, F, Max, Q
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from rooms_api.models import Catalogue, Reservation, ReservationArchive, Room
+
+
+def make_etag(*parts):
+    return quote_etag(hashlib.md5(':'.join(map(str, parts)).encode()).hexdigest())
+
+
+def conditional(state):
+    """
+    Decorate a viewset read method with conditional GET handling.
+
+    ``state(view, request, *args, **kwargs)`` returns ``(etag, last_modified)``,
+    or ``(None, None)`` to let the method run unconditionally (e.g. to produce a 404).
+    """
+    def decorator(method):
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            etag, last_modified = state(view, request, *args, **kwargs)
+            if etag is None:
+                return method(view, request, *args, **kwargs)
+            timestamp = timegm(last_modified.utctimetuple()) if last_modified else None
+            response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if response is None:
+                response = method(view, request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                response.headers.setdefault('ETag', etag)
+                if timestamp is not None:
+                    response.headers.setdefault('Last-Modified', http_date(timestamp))
+            return response
+        return wrapper
+    return decorator
+
+
+def latest(*moments):
+    moments = [moment for moment in moments if moment is not None]
+    return max(moments) if moments else None
+
+
+def room_list_state(view, request, *args, **kwargs):
+    queryset = view.filter_queryset(view.get_queryset())
+    # A changed room moves MAX(updated_at) (``room_updated_at_idx``), a created or deleted
+    # one the catalogue version, so the validators never count the rooms.
+    last = queryset.aggregate(last=Max('updated_at'))['last']
+    return make_etag('rooms', catalogue_version(), last, request.get_full_path()), last
+
+
+def room_state(view, request, pk=None, **kwargs):
+    try:
+        row = Room.objects.filter(pk=pk).values_list('updated_at').first()
+    except (TypeError, ValueError):
+        return None, None
+    if row is None:
+        return None, None
+    return make_etag('room', pk, row[0], request.get_full_path()), row[0]
+
+
+def reservation_list_state(view, request, room_pk=None, **kwargs):
+    try:
+        room_pk = int(room_pk)
+    except (TypeError, ValueError):
+        return None, None
+    row = Room.objects.filter(pk=room_pk) \
+        .values_list('reservations_version', 'reservations_updated_at', 'updated_at').first()
+    if row is None:
+        return None, None
+    version, reservations_updated_at, updated_at = row
+    return make_etag('reservations', room_pk, version, updated_at, request.get_full_path()), \
+        latest(reservations_updated_at, updated_at)
+
+
+def reservation_state(view, request, pk=None, room_pk=None, **kwargs):
+    try:
+        row = Reservation.objects.filter(pk=pk, room__pk=room_pk) \
+            .values_list('updated_at', 'room__updated_at').first()
+    except (TypeError, ValueError):
+        return None, None
+    if row is None:
+        # Archived reservations never change after ``archived_at``.
+        row = ReservationArchive.objects.filter(pk=pk, room__pk=room_pk) \
+            .values_list('archived_at', 'room__updated_at').first()
+    if row is None:
+        return None, None
+    # The owner of a confirmed reservation gets a different body (with room_password).
+    return make_etag('reservation', pk, *row, request.user.pk), latest(*row)
+
+
+def catalogue_version():
+    return Catalogue.objects.filter(pk=1).values_list('version', flat=True).first() or 0
+
+
+def touch_catalogue():
+    """Bump the catalogue version after a room was created or deleted."""
+    if not Catalogue.objects.filter(pk=1).update(version=F('version') + 1):
+        Catalogue.objects.get_or_create(pk=1, defaults={'version': 1})
+
+
+def touch_reservations(room_id):
+    """Bump the reservation version of a room after its reservations changed."""
+    Room.objects.filter(pk=room_id).update(reservations_version=F('reservations_version') + 1,
+                                           reservations_updated_at=timezone.now())
+
+
+def room_calendar_state(view, request, pk=None, **kwargs):
+    return reservation_list_state(view, request, room_pk=pk)
+
+
+def owner_reservations_version(owner_pk):
+    """
+    Count and latest change of the user's reservations and of their rooms.
+
+    Both queries read only the ``reservation_owner_feed_idx`` and ``archive_owner_idx``
+    indexes and room primary keys. Archived reservations never change, and archiving
+    one changes the count.
+    """
+    reservations = Reservation.objects.filter(owner_id=owner_pk)
+    row = reservations.aggregate(count=Count('id'), last=Max('updated_at'))
+    archived = ReservationArchive.objects.filter(owner_id=owner_pk)
+    rooms_last = Room.objects.filter(Q(pk__in=reservations.values('room_id')) | Q(pk__in=archived.values('room_id'))) \
+        .aggregate(last=Max('updated_at'))['last']
+    return row['count'], row['last'], rooms_last
+
+
+def owner_calendar_state(view, request, pk=None, **kwargs):
+    # Kept for the view, which caches the feed under the same validators.
+    view.owner_version = count, last, rooms_last = owner_reservations_version(pk)
+    return make_etag('calendar', pk, count, last, rooms_last), latest(last, rooms_last)
@@ -1,9 +1,25 @@
 import pytest
+from django.core.cache import cache
 from django.contrib.auth.models import User
 from rest_framework.test import APIClient
+from rooms_api.cache import stats
 from rooms_api.models import Room, Reservation
 
 
+@pytest.fixture(scope='session')
+def django_db_modify_db_settings(django_db_modify_db_settings_parallel_suffix, tmp_path_factory):
+    """Use a file-backed SQLite test database, so concurrent tests see real locking."""
+    from django.conf import settings
+    test_settings = settings.DATABASES['default'].setdefault('TEST', {})
+    test_settings['NAME'] = str(tmp_path_factory.mktemp('db') / 'test_db.sqlite3')
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+    stats.reset()
+
+
 @pytest.fixture
 def client():
     client = APIClient()
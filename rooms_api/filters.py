@@ -0,0 +1,44 @@
+from rest_framework.filters import OrderingFilter, SearchFilter
+
+from rooms_api.search import search_rooms
+
+
+class RoomSearchFilter(SearchFilter):
+    """
+    ``?search=`` on room names through the search index instead of ``LIKE '%q%'``, best match first.
+
+    Sets ``view.ranked`` so that pagination keeps the ranking. The conditional
+    state and the list filter the same queryset, so the search (with its probe
+    and fuzzy queries) is kept on the view and runs once per request.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        view.ranked = True
+        query = ' '.join(terms)
+        searched = getattr(view, 'searched', None)
+        if searched is None or searched[0] != query:
+            searched = view.searched = query, search_rooms(queryset, query)
+        return searched[1]
+
+
+class RoomOrderingFilter(OrderingFilter):
+    """
+    ``?ordering=-rating_average`` etc. on the view's ``ordering_fields``, ties broken by id.
+
+    Sets ``view.keyset_ordering`` so that pagination seeks on the same fields, and
+    overrides the search ranking when both are given.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        if not request.query_params.get(self.ordering_param):
+            return queryset
+        ordering = self.get_ordering(request, queryset, view)
+        if not ordering:
+            return queryset
+        # The tie breaker follows the last field, so one index serves the whole ordering.
+        ordering = [*ordering, '-id' if ordering[-1].startswith('-') else 'id']
+        view.keyset_ordering = ordering
+        return queryset.order_by(*ordering)
@@ -0,0 +1,44 @@
+"""
+Subscribers of reservation events, run by ``manage.py runworker``.
+
+Room passwords are still generated in the request, since the owner gets theirs
+in the response. Calendar feeds need no subscriber: a status change invalidates
+them and the next poll rebuilds them (rooms_api/ical.py).
+"""
+import logging
+from django.core.mail import send_mail
+
+from rooms_api.jobs import publish_many, subscriber
+from rooms_api.models import Reservation
+
+STATUS_CHANGED = 'reservation.status_changed'
+
+audit_logger = logging.getLogger('rooms_api.audit')
+
+
+def publish_status_change(reservations, action, user):
+    """Queue the STATUS_CHANGED jobs of ``reservations`` once the transaction commits."""
+    publish_many(STATUS_CHANGED, [
+        ({'reservation': item.pk, 'action': action, 'status': item.reservation_status, 'user': user.pk},
+         f'reservation:{item.pk}:{action}:{item.updated_at.isoformat()}')
+        for item in reservations
+    ])
+
+
+@subscriber(STATUS_CHANGED)
+def audit_status_change(reservation, action, status, user):
+    audit_logger.info('reservation=%s action=%s status=%s user=%s', reservation, action, status, user)
+
+
+@subscriber(STATUS_CHANGED)
+def notify_owner(reservation, action, status, user):
+    item = Reservation.objects.select_related('room', 'owner').filter(pk=reservation).first()
+    if item is None or not item.owner.email:
+        return
+    send_mail(
+        f'Reservation of {item.room.name}: {item.get_reservation_status_display()}',
+        f'Your reservation "{item.training}" from {item.date_from} to {item.date_to} '
+        f'is now {item.get_reservation_status_display().lower()}.',
+        None,
+        [item.owner.email],
+    )
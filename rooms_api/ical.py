@@ -0,0 +1,117 @@
+"""
+iCalendar (RFC 5545) feeds of confirmed reservations.
+
+``room_feed`` covers one room and ``owner_feed`` the reservations of one user.
+Calendar clients poll the same feed over and over, so a feed is built once
+from ``.values_list()`` rows and kept in the read cache until it changes: the
+room feed under the room scope, which every write to the room or its
+reservations invalidates, the owner feed under the owner's validators
+(``conditional.owner_reservations_version``). Polls that send the ETag back
+get a 304 without reading the feed at all. Feeds keep the reservations moved
+to the archive (rooms_api/archive.py).
+"""
+import datetime
+from functools import lru_cache
+from django.contrib.auth.models import User
+from django.utils import timezone
+
+from rooms_api import archive, cache
+from rooms_api.availability import CONFIRMED
+from rooms_api.conditional import owner_reservations_version
+from rooms_api.models import Reservation, ReservationArchive, Room
+
+CONTENT_TYPE = 'text/calendar; charset=utf-8'
+PRODID = '-//rooms_app//Room reservations//EN'
+UID_DOMAIN = 'rooms-app'
+LINE_LIMIT = 75
+ONE_DAY = datetime.timedelta(days=1)
+
+
+def escape(text):
+    """Escape a TEXT value: backslashes, separators and newlines."""
+    return text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,') \
+        .replace('\r\n', '\\n').replace('\n', '\\n')
+
+
+def fold(line):
+    """Split ``line`` into lines of at most 75 octets, continued with a leading space."""
+    if line.isascii() and len(line) <= LINE_LIMIT:
+        return line
+    parts, part, size = [], [], 0
+    for char in line:
+        width = len(char.encode())
+        # Continuation lines lose one octet to the leading space.
+        if size + width > LINE_LIMIT - (1 if parts else 0):
+            parts.append(''.join(part))
+            part, size = [], 0
+        part.append(char)
+        size += width
+    parts.append(''.join(part))
+    return '\r\n '.join(parts)
+
+
+def date_value(day):
+    text = day.isoformat()
+    return text[:4] + text[5:7] + text[8:]
+
+
+@lru_cache(maxsize=4096)
+def text_line(name, value):
+    """A folded ``NAME:value`` line; trainings and room names repeat, so lines are memoized."""
+    return fold(f'{name}:{escape(value)}')
+
+
+def calendar(name, rows):
+    """
+    The VCALENDAR text of ``rows`` of ``(pk, training, date_from, date_to, room name)``.
+
+    In a published feed DTSTAMP is when the feed was made, so every event carries the build time.
+    """
+    stamp = timezone.now().strftime('%Y%m%dT%H%M%SZ')
+    parts = ['BEGIN:VCALENDAR', 'VERSION:2.0', f'PRODID:{PRODID}', 'CALSCALE:GREGORIAN', 'METHOD:PUBLISH',
+             text_line('X-WR-CALNAME', name)]
+    for pk, training, date_from, date_to, room_name in rows:
+        # DTEND of an all-day event is exclusive.
+        parts.append(f'BEGIN:VEVENT\r\nUID:reservation-{pk}@{UID_DOMAIN}\r\nDTSTAMP:{stamp}\r\n'
+                     f'DTSTART;VALUE=DATE:{date_value(date_from)}\r\nDTEND;VALUE=DATE:{date_value(date_to + ONE_DAY)}'
+                     f'\r\n{text_line("SUMMARY", training)}\r\n{text_line("LOCATION", room_name)}\r\nEND:VEVENT')
+    parts.append('END:VCALENDAR')
+    return '\r\n'.join(parts) + '\r\n'
+
+
+def confirmed_rows(live, history):
+    """Rows for ``calendar`` of the confirmed reservations of both querysets, live and archived."""
+    return archive.with_archive(live.filter(reservation_status=CONFIRMED), history.filter(reservation_status=CONFIRMED),
+                                'id', 'training', 'date_from', 'date_to', 'room__name') \
+        .order_by('date_from', 'id').iterator(chunk_size=5000)
+
+
+def room_feed(room_pk):
+    """Feed of the confirmed reservations of the room, or None if there is no such room."""
+    def build():
+        name = Room.objects.filter(pk=room_pk).values_list('name', flat=True).first()
+        if name is None:
+            return None
+        return calendar(name, confirmed_rows(Reservation.objects.filter(room_id=room_pk),
+                                             ReservationArchive.objects.filter(room_id=room_pk))).encode()
+
+    return cache.cached(['calendar', 'room', room_pk], [cache.room_scope(room_pk)], build)
+
+
+def owner_feed(owner_pk, version=None):
+    """
+    Feed of the confirmed reservations of the user, or None if there is no such user.
+
+    ``version`` is ``owner_reservations_version(owner_pk)`` when the caller already has it.
+    """
+    def build():
+        username = User.objects.filter(pk=owner_pk).values_list('username', flat=True).first()
+        if username is None:
+            return None
+        return calendar(f'Reservations of {username}',
+                        confirmed_rows(Reservation.objects.filter(owner_id=owner_pk),
+                                       ReservationArchive.objects.filter(owner_id=owner_pk))).encode()
+
+    if version is None:
+        version = owner_reservations_version(owner_pk)
+    return cache.cached(['calendar', 'owner', owner_pk, *version], [], build)
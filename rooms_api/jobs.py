@@ -0,0 +1,200 @@
+"""
+Database-backed background jobs.
+
+Handlers subscribe to an event with ``@subscriber(event)``. ``publish(event,
+payload, key)`` queues one Job per subscriber with a single INSERT once the
+current transaction commits, so a request pays the same whatever the number of
+subscribers. ``manage.py runworker`` runs the queued jobs on a thread pool,
+retrying failures with exponential backoff. Every ``maintenance_interval``
+seconds the worker also queues again the jobs left running by dead workers and
+deletes the done jobs older than ``ROOMS_API_JOB_KEEP_DONE_DAYS``, so the table
+does not grow with every event ever published.
+
+Idempotency keys are unique per subscriber: publishing the same key twice
+queues the work once.
+
+Settings:
+    ROOMS_API_JOB_ATTEMPTS   attempts before a job is marked failed
+    ROOMS_API_JOB_BACKOFF    delay before the first retry in seconds, doubled on each retry
+    ROOMS_API_JOB_KEEP_DONE_DAYS   days done jobs are kept, None keeps them forever
+"""
+import logging
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from rooms_api.models import Job
+
+DEFAULT_ATTEMPTS = 5
+DEFAULT_BACKOFF = 2
+DEFAULT_KEEP_DONE_DAYS = 7
+STALE_AFTER = timedelta(minutes=10)
+MAINTENANCE_INTERVAL = 60
+PURGE_BATCH_SIZE = 1000
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Subscriber:
+    name: str
+    func: object
+    max_attempts: int
+
+
+subscribers = {}
+
+
+def subscriber(event, name=None, max_attempts=None):
+    """Register the decorated ``func(**payload)`` to run for every published ``event``."""
+    def decorator(func):
+        handler = Subscriber(name or f'{func.__module__}.{func.__qualname__}', func,
+                             max_attempts or getattr(settings, 'ROOMS_API_JOB_ATTEMPTS', DEFAULT_ATTEMPTS))
+        handlers = subscribers.setdefault(event, {})
+        handlers[handler.name] = handler
+        return func
+    return decorator
+
+
+def handler_for(job):
+    return subscribers.get(job.event, {}).get(job.handler)
+
+
+def publish(event, payload, key=None):
+    """Queue ``payload`` for every subscriber of ``event`` after the transaction commits."""
+    publish_many(event, [(payload, key)])
+
+
+def publish_many(event, items):
+    """Queue many ``(payload, key)`` pairs with one INSERT after the transaction commits."""
+    handlers = list(subscribers.get(event, {}).values())
+    if not handlers or not items:
+        return
+
+    def insert():
+        now = timezone.now()
+        Job.objects.bulk_create([
+            Job(event=event, handler=handler.name, payload=payload, run_at=now, max_attempts=handler.max_attempts,
+                idempotency_key=None if key is None else f'{key}:{handler.name}')
+            for payload, key in items for handler in handlers
+        ], ignore_conflicts=True)
+
+    transaction.on_commit(insert)
+
+
+def backoff(attempts):
+    return timedelta(seconds=getattr(settings, 'ROOMS_API_JOB_BACKOFF', DEFAULT_BACKOFF) * 2 ** (attempts - 1))
+
+
+def claim(worker, limit):
+    """Mark up to ``limit`` due jobs as running for ``worker`` and return them."""
+    now = timezone.now()
+    due = Job.objects.filter(status=Job.QUEUED, run_at__lte=now).order_by('run_at', 'id')
+    ids = list(due.values_list('id', flat=True)[:limit])
+    # The status condition makes the claim safe against other workers.
+    Job.objects.filter(id__in=ids, status=Job.QUEUED).update(status=Job.RUNNING, locked_by=worker, locked_at=now)
+    return list(Job.objects.filter(id__in=ids, status=Job.RUNNING, locked_by=worker))
+
+
+def requeue_stale(older_than=STALE_AFTER):
+    """Queue again the jobs left running by workers that died."""
+    return Job.objects.filter(status=Job.RUNNING, locked_at__lt=timezone.now() - older_than) \
+        .update(status=Job.QUEUED, locked_by='')
+
+
+def keep_done():
+    """How long done jobs are kept, or None to keep them."""
+    days = getattr(settings, 'ROOMS_API_JOB_KEEP_DONE_DAYS', DEFAULT_KEEP_DONE_DAYS)
+    return None if days is None else timedelta(days=days)
+
+
+def purge_done(older_than, batch_size=PURGE_BATCH_SIZE):
+    """Delete the done jobs last updated more than ``older_than`` ago; returns how many."""
+    done = Job.objects.filter(status=Job.DONE, updated_at__lt=timezone.now() - older_than)
+    total = 0
+    # Short batches, so workers claiming jobs never wait long for the table.
+    while ids := list(done.values_list('id', flat=True)[:batch_size]):
+        total += Job.objects.filter(id__in=ids).delete()[0]
+    return total
+
+
+def execute(job):
+    """Run one claimed job and record the outcome."""
+    handler = handler_for(job)
+    job.attempts += 1
+    try:
+        if handler is None:
+            raise LookupError(f'No subscriber {job.handler!r} for {job.event!r}')
+        handler.func(**job.payload)
+    except Exception as exc:
+        logger.warning('Job %s (%s) failed on attempt %s', job.pk, job.handler, job.attempts, exc_info=True)
+        job.last_error = f'{type(exc).__name__}: {exc}'
+        if job.attempts >= job.max_attempts or handler is None:
+            job.status = Job.FAILED
+        else:
+            job.status = Job.QUEUED
+            job.run_at = timezone.now() + backoff(job.attempts)
+    else:
+        job.status = Job.DONE
+        job.last_error = ''
+    job.locked_by = ''
+    job.save(update_fields=['status', 'attempts', 'run_at', 'last_error', 'locked_by', 'updated_at'])
+    return job
+
+
+class Worker:
+    """Claims due jobs and runs them on a thread pool."""
+
+    def __init__(self, threads=4, batch=None, poll_interval=1.0, maintenance_interval=MAINTENANCE_INTERVAL,
+                 keep_done=None):
+        self.threads = threads
+        self.batch = batch or threads * 4
+        self.poll_interval = poll_interval
+        self.maintenance_interval = maintenance_interval
+        self.keep_done = keep_done
+        self.maintained_at = None
+        self.name = f'{socket.gethostname()}:{uuid.uuid4().hex[:8]}'
+        self.stopping = threading.Event()
+
+    def run_job(self, job):
+        try:
+            return execute(job)
+        finally:
+            close_old_connections()
+
+    def run_once(self, pool):
+        """Run one batch of due jobs; returns how many ran."""
+        jobs = claim(self.name, self.batch)
+        list(pool.map(self.run_job, jobs))
+        return len(jobs)
+
+    def maintain(self):
+        """Requeue stale jobs and purge old done ones, at most once per ``maintenance_interval``."""
+        now = time.monotonic()
+        if self.maintained_at is not None and now - self.maintained_at < self.maintenance_interval:
+            return
+        self.maintained_at = now
+        requeue_stale()
+        if self.keep_done is not None:
+            purge_done(self.keep_done)
+
+    def run(self, burst=False):
+        """Work until ``stop()``, or with ``burst`` until no job is due."""
+        with ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='rooms-worker') as pool:
+            while not self.stopping.is_set():
+                self.maintain()
+                if self.run_once(pool):
+                    continue
+                if burst:
+                    break
+                self.stopping.wait(self.poll_interval)
+
+    def stop(self):
+        self.stopping.set()
@@ -0,0 +1,31 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+
+from rooms_api import archive
+
+
+class Command(BaseCommand):
+    help = 'Move reservations that ended long ago to the archive table (see rooms_api/archive.py).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int,
+                            help='Archive reservations that ended more than this many days ago '
+                                 f'(ROOMS_API_ARCHIVE_AFTER_DAYS, {archive.DEFAULT_AFTER_DAYS} by default).')
+        parser.add_argument('--batch-size', type=int, default=archive.BATCH_SIZE,
+                            help='Rows moved per transaction.')
+        parser.add_argument('--dry-run', action='store_true', help='Count the reservations without moving them.')
+
+    def handle(self, *args, older_than, batch_size, dry_run, **options):
+        if older_than is not None and older_than < 1:
+            raise CommandError('--older-than must be at least 1 day: recent reservations can still be rated.')
+        if batch_size < 1:
+            raise CommandError('--batch-size must be positive.')
+        before = archive.cutoff(older_than)
+        if dry_run:
+            self.stdout.write(f'{archive.archivable(before).count()} reservations ended before {before} '
+                              f'would be archived')
+            return
+        progress = (lambda total: self.stderr.write(f'{total} archived')) if options['verbosity'] > 1 else None
+        start = time.perf_counter()
+        moved = archive.archive(before, batch_size, progress)
+        self.stdout.write(f'Archived {moved} reservations ended before {before} in {time.perf_counter() - start:.1f}s')
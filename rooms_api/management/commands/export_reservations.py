@@ -0,0 +1,37 @@
+import time
+from django.core.management.base import BaseCommand
+
+from rooms_api import transfer
+from rooms_api.models import Reservation, ReservationArchive
+
+
+class Command(BaseCommand):
+    help = 'Write reservations as CSV or JSON Lines (see rooms_api/transfer.py).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', nargs='?', default='-', help='File to write, - for standard output.')
+        parser.add_argument('--format', choices=transfer.FORMATS,
+                            help='File format, guessed from the file extension by default.')
+        parser.add_argument('--room', type=int, action='append', help='Id of a room to export, may be repeated.')
+        parser.add_argument('--chunk-size', type=int, default=transfer.CHUNK_SIZE, help='Rows read per query.')
+        parser.add_argument('--archived', action='store_true',
+                            help='Also export the reservations moved to the archive (see rooms_api/archive.py).')
+
+    def handle(self, *args, output, room, chunk_size, archived, **options):
+        file_format = options['format'] or transfer.guess_format(output)
+        queryset = Reservation.objects.all()
+        history = ReservationArchive.objects.all() if archived else None
+        if room:
+            queryset = queryset.filter(room_id__in=room)
+            if history is not None:
+                history = history.filter(room_id__in=room)
+        chunks = transfer.export(file_format, queryset, chunk_size, history)
+        if output == '-':
+            for chunk in chunks:
+                self.stdout.write(chunk.decode(), ending='')
+            return
+        start = time.perf_counter()
+        with open(output, 'wb') as file:
+            for chunk in chunks:
+                file.write(chunk)
+        self.stdout.write(f'Wrote {output} in {time.perf_counter() - start:.1f}s')
@@ -0,0 +1,31 @@
+import sys
+import time
+from django.core.management.base import BaseCommand
+
+from rooms_api import transfer
+
+
+class Command(BaseCommand):
+    help = 'Create reservations from a CSV or JSON Lines file (see rooms_api/transfer.py).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('input', help='File to read, - for standard input.')
+        parser.add_argument('--format', choices=transfer.FORMATS,
+                            help='File format, guessed from the file extension by default.')
+        parser.add_argument('--chunk-size', type=int, default=transfer.CHUNK_SIZE,
+                            help='Rows validated and inserted per transaction.')
+
+    def handle(self, *args, input, chunk_size, **options):
+        file_format = options['format'] or transfer.guess_format(input)
+        start = time.perf_counter()
+        if input == '-':
+            result = transfer.import_rows(transfer.decode(file_format, sys.stdin), chunk_size)
+        else:
+            with open(input, newline='', encoding='utf-8') as file:
+                result = transfer.import_rows(transfer.decode(file_format, file), chunk_size)
+        for error in result['errors']:
+            self.stderr.write(f"line {error['line']}: {error['errors']}")
+        if result['failed'] > len(result['errors']):
+            self.stderr.write(f"... and {result['failed'] - len(result['errors']):,} more")
+        self.stdout.write(f"Imported {result['created']:,} reservations, {result['failed']:,} rows failed, "
+                          f"in {time.perf_counter() - start:.1f}s")
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from rooms_api import ratings
+
+
+class Command(BaseCommand):
+    help = 'Recompute the rating statistics of rooms from their reservations and fix the ones that drifted.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report the drifted rooms without saving.')
+        parser.add_argument('--batch-size', type=int, default=2000, help='Rooms read per query.')
+
+    def handle(self, *args, dry_run, batch_size, **options):
+        drifted = ratings.reconcile(dry_run=dry_run, batch_size=batch_size)
+        verb = 'would be fixed' if dry_run else 'fixed'
+        self.stdout.write(f'{len(drifted)} rooms {verb}' + (f': {", ".join(map(str, drifted))}' if drifted else ''))
@@ -0,0 +1,33 @@
+import signal
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+
+from rooms_api.jobs import MAINTENANCE_INTERVAL, Worker, keep_done
+
+
+class Command(BaseCommand):
+    help = 'Run queued background jobs (see rooms_api/jobs.py).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4, help='Jobs run at the same time.')
+        parser.add_argument('--batch', type=int, default=None, help='Jobs claimed at once, 4 per thread by default.')
+        parser.add_argument('--poll', type=float, default=1.0, help='Seconds to wait when no job is due.')
+        parser.add_argument('--burst', action='store_true', help='Exit once no job is due.')
+        parser.add_argument('--keep-done-days', type=int, default=None,
+                            help='Delete done jobs older than this many days '
+                                 '(ROOMS_API_JOB_KEEP_DONE_DAYS by default).')
+        parser.add_argument('--maintenance-interval', type=float, default=MAINTENANCE_INTERVAL,
+                            help='Seconds between requeueing stale jobs and purging done ones.')
+
+    def handle(self, *args, threads, batch, poll, burst, keep_done_days, maintenance_interval, **options):
+        if keep_done_days is not None and keep_done_days < 0:
+            raise CommandError('--keep-done-days cannot be negative.')
+        retention = keep_done() if keep_done_days is None else timedelta(days=keep_done_days)
+        worker = Worker(threads=threads, batch=batch, poll_interval=poll, maintenance_interval=maintenance_interval,
+                        keep_done=retention)
+        signal.signal(signal.SIGTERM, lambda *_: worker.stop())
+        self.stdout.write(f'Worker {worker.name} running with {threads} threads')
+        try:
+            worker.run(burst=burst)
+        except KeyboardInterrupt:
+            worker.stop()
@@ -0,0 +1,37 @@
+import time
+from django.core.management.base import BaseCommand
+
+from rooms_api import seeding
+
+
+class Command(BaseCommand):
+    help = 'Fill the database with a synthetic dataset for benchmarks (see rooms_api/seeding.py).'
+
+    def add_arguments(self, parser):
+        defaults = seeding.Dataset()
+        parser.add_argument('--users', type=int, default=defaults.users)
+        parser.add_argument('--rooms', type=int, default=defaults.rooms)
+        parser.add_argument('--reservations', type=int, default=defaults.reservations)
+        parser.add_argument('--seed', type=int, default=defaults.seed,
+                            help='Random seed, the same seed gives the same data.')
+        parser.add_argument('--batch-size', type=int, default=defaults.batch_size)
+        parser.add_argument('--clear', action='store_true',
+                            help='Delete all rooms and reservations and the seeded users first.')
+
+    def handle(self, *args, users, rooms, reservations, seed, batch_size, clear, **options):
+        start = time.perf_counter()
+        if clear:
+            seeding.clear()
+        dataset = seeding.Dataset(users=users, rooms=rooms, reservations=reservations, seed=seed,
+                                  batch_size=batch_size)
+        step = max(reservations // 10, batch_size)
+        next_report = [step]
+
+        def progress(created):
+            if created >= next_report[0] and options['verbosity'] > 1:
+                self.stdout.write(f'{created:,} reservations')
+                next_report[0] += step
+
+        created = seeding.seed(dataset, progress)
+        self.stdout.write(f"Created {created['users']:,} users, {created['rooms']:,} rooms and "
+                          f"{created['reservations']:,} reservations in {time.perf_counter() - start:.1f}s")
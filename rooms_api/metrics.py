@@ -0,0 +1,232 @@
+"""
+Request metrics in the Prometheus text format, served at ``/metrics``.
+
+``metrics_middleware`` records per route name (``reservations-list``,
+``reservations-confirm``, ...):
+
+    rooms_http_requests_total                 requests by method and status
+    rooms_http_request_duration_seconds       latency histogram of every request
+    rooms_db_queries                          queries per request (sampled)
+    rooms_db_duration_seconds                 time spent in the database (sampled)
+    rooms_serializer_duration_seconds         time spent serializing (sampled)
+
+Only a share of the requests, ``ROOMS_METRICS_SAMPLE_RATE``, is traced through
+``connection.execute_wrapper``; views mark their serialization with
+``serializing()``. Sampling keeps the overhead in
+the low single percents (see benchmarks/bench_metrics.py). Async views are not
+traced: their queries run on another thread. Metrics are kept per process.
+
+``/metrics`` answers 404 unless the client address is allowed or the request
+carries ``Authorization: Bearer <ROOMS_METRICS_TOKEN>``. Behind a reverse proxy
+on the same host every request comes from the loopback address, so there the
+address list must stay empty and scrapers use the token; the production
+settings allow no address unless one is configured.
+
+Settings:
+    ROOMS_METRICS_SAMPLE_RATE   share of requests traced, 0 to 1
+    ROOMS_METRICS_ALLOWED_IPS   client addresses allowed to read ``/metrics``
+    ROOMS_METRICS_TOKEN         bearer token allowed to read ``/metrics``, None for none
+"""
+import asyncio
+import hmac
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.db import connections
+from django.http import Http404, HttpResponse
+from django.utils.decorators import sync_and_async_middleware
+
+DEFAULT_SAMPLE_RATE = 0.1
+DEFAULT_ALLOWED_IPS = ('127.0.0.1', '::1')
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+SECONDS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+QUERIES = (1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def label_value(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    return '{' + ','.join(f'{name}="{label_value(value)}"' for name, value in pairs) + '}' if pairs else ''
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, help, labels):
+        self.name, self.help, self.labels = name, help, labels
+        self.values = {}
+
+    def inc(self, labels, amount=1):
+        self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in sorted(self.values.items()):
+            yield f'{self.name}{format_labels(self.labels, labels)} {value}'
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels, buckets):
+        self.name, self.help, self.labels, self.buckets = name, help, labels, buckets
+        self.values = {}
+
+    def observe(self, labels, value):
+        counts = self.values.get(labels)
+        if counts is None:
+            # One count per bucket, then +Inf, then the sum.
+            counts = self.values[labels] = [0] * (len(self.buckets) + 2)
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def samples(self):
+        for labels, counts in sorted(self.values.items()):
+            total = 0
+            for bound, count in zip((*self.buckets, '+Inf'), counts):
+                total += count
+                yield f'{self.name}_bucket{format_labels(self.labels, labels, [("le", bound)])} {total}'
+            yield f'{self.name}_sum{format_labels(self.labels, labels)} {counts[-1]}'
+            yield f'{self.name}_count{format_labels(self.labels, labels)} {total}'
+
+
+class Registry:
+    """The metrics of this process; updates and exposition hold one lock."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = Counter('rooms_http_requests_total', 'Requests by route, method and status.',
+                                    ('route', 'method', 'status'))
+            self.latency = Histogram('rooms_http_request_duration_seconds', 'Request latency by route.',
+                                     ('route', 'method'), SECONDS)
+            self.queries = Histogram('rooms_db_queries', 'Database queries per sampled request.',
+                                     ('route',), QUERIES)
+            self.db_time = Histogram('rooms_db_duration_seconds', 'Database time per sampled request.',
+                                     ('route',), SECONDS)
+            self.serializer_time = Histogram('rooms_serializer_duration_seconds',
+                                             'Serializer time per sampled request.', ('route',), SECONDS)
+            self.metrics = [self.requests, self.latency, self.queries, self.db_time, self.serializer_time]
+
+    def record(self, route, method, status, duration, sample=None):
+        with self.lock:
+            self.requests.inc((route, method, status))
+            self.latency.observe((route, method), duration)
+            if sample is not None:
+                self.queries.observe((route,), sample.queries)
+                self.db_time.observe((route,), sample.db_time)
+                self.serializer_time.observe((route,), sample.serializer_time)
+
+    def expose(self):
+        lines = []
+        with self.lock:
+            for metric in self.metrics:
+                lines.append(f'# HELP {metric.name} {metric.help}')
+                lines.append(f'# TYPE {metric.name} {metric.kind}')
+                lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+class Sample:
+    """Database and serializer time of one traced request."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializing = False
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+
+
+current = ContextVar('rooms_metrics_sample', default=None)
+
+
+@contextmanager
+def serializing():
+    """Count the block as serializer time of the traced request, if any."""
+    sample = current.get()
+    if sample is None or sample.serializing:
+        yield
+        return
+    sample.serializing = True
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        sample.serializer_time += time.perf_counter() - start
+        sample.serializing = False
+
+
+def route_of(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.url_name or match.view_name
+
+
+def sample_rate():
+    return getattr(settings, 'ROOMS_METRICS_SAMPLE_RATE', DEFAULT_SAMPLE_RATE)
+
+
+@sync_and_async_middleware
+def metrics_middleware(get_response):
+    """Record latency of every request and trace a sample of them, see the module docstring."""
+    if asyncio.iscoroutinefunction(get_response):
+        async def middleware(request):
+            start = time.perf_counter()
+            response = await get_response(request)
+            registry.record(route_of(request), request.method, response.status_code, time.perf_counter() - start)
+            return response
+        return middleware
+
+    def middleware(request):
+        sample = Sample() if random.random() < sample_rate() else None
+        start = time.perf_counter()
+        if sample is None:
+            response = get_response(request)
+        else:
+            token = current.set(sample)
+            try:
+                with ExitStack() as stack:
+                    for connection in connections.all():
+                        stack.enter_context(connection.execute_wrapper(sample))
+                    response = get_response(request)
+            finally:
+                current.reset(token)
+        registry.record(route_of(request), request.method, response.status_code, time.perf_counter() - start,
+                        sample)
+        return response
+    return middleware
+
+
+def may_read(request):
+    if request.META.get('REMOTE_ADDR') in getattr(settings, 'ROOMS_METRICS_ALLOWED_IPS', DEFAULT_ALLOWED_IPS):
+        return True
+    token = getattr(settings, 'ROOMS_METRICS_TOKEN', None)
+    return bool(token) and hmac.compare_digest(request.META.get('HTTP_AUTHORIZATION', '').encode(),
+                                               f'Bearer {token}'.encode())
+
+
+def metrics_view(request):
+    if not may_read(request):
+        raise Http404
+    return HttpResponse(registry.expose(), content_type=CONTENT_TYPE)
@@ -0,0 +1,44 @@
+# Generated by Django 4.1.2 on 2022-10-06 19:21
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import rooms_api.models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Room',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('room_manager', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='manager_of_rooms', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['name'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Reservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_from', models.DateField()),
+                ('date_to', models.DateField()),
+                ('training', models.CharField(default='Test', max_length=156)),
+                ('rating', models.FloatField(blank=True, choices=[(1.0, '1'), (2.0, '2'), (3.0, '3'), (4.0, '4'), (5.0, '5')], null=True)),
+                ('comment', models.TextField(blank=True, null=True)),
+                ('room_password', models.CharField(default=rooms_api.models.generate_password, editable=False, max_length=10)),
+                ('reservation_status', models.IntegerField(choices=[(0, 'Waiting to be confirmed'), (1, 'Confirmed'), (2, 'Cancelled'), (3, 'Rejected')], default=0)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_reservations', to=settings.AUTH_USER_MODEL)),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='rooms_api.room')),
+            ],
+        ),
+    ]
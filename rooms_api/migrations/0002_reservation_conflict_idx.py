@@ -0,0 +1,17 @@
+# Generated by Django 4.1.2 on 2026-10-17 07:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms_api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['room', 'reservation_status', 'date_from', 'date_to'], name='reservation_conflict_idx'),
+        ),
+    ]
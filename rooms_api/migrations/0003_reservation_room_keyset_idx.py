@@ -0,0 +1,17 @@
+# Generated by Django 4.1.2 on 2026-10-17 08:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms_api', '0002_reservation_conflict_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['room', 'date_from', 'id'], name='reservation_room_keyset_idx'),
+        ),
+    ]
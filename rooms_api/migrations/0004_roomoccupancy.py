@@ -0,0 +1,50 @@
+# Generated by Django 4.1.2 on 2026-10-17 07:48
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+# Copies of rooms_api.occupancy helpers as they were when this migration was written.
+def range_mask(origin, date_from, date_to):
+    length = (date_to - date_from).days + 1
+    return ((1 << length) - 1) << (date_from - origin).days
+
+
+def to_bytes(bits):
+    return bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+
+
+def build_occupancy(apps, schema_editor):
+    Reservation = apps.get_model('rooms_api', 'Reservation')
+    RoomOccupancy = apps.get_model('rooms_api', 'RoomOccupancy')
+    terms = {}
+    for room_id, date_from, date_to in Reservation.objects.filter(reservation_status=1) \
+            .values_list('room_id', 'date_from', 'date_to').iterator():
+        terms.setdefault(room_id, []).append((date_from, date_to))
+    occupancies = []
+    for room_id, room_terms in terms.items():
+        origin = min(date_from for date_from, _ in room_terms)
+        bits = 0
+        for date_from, date_to in room_terms:
+            bits |= range_mask(origin, date_from, date_to)
+        occupancies.append(RoomOccupancy(room_id=room_id, origin=origin, bitmap=to_bytes(bits)))
+    RoomOccupancy.objects.bulk_create(occupancies)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms_api', '0003_reservation_room_keyset_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RoomOccupancy',
+            fields=[
+                ('room', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='occupancy', serialize=False, to='rooms_api.room')),
+                ('origin', models.DateField(blank=True, null=True)),
+                ('bitmap', models.BinaryField(default=b'')),
+            ],
+        ),
+        migrations.RunPython(build_occupancy, migrations.RunPython.noop),
+    ]
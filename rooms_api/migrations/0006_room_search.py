@@ -0,0 +1,46 @@
+import unicodedata
+from django.db import migrations
+
+# The schema and name folding of rooms_api/search.py as they were when this migration was written.
+SEARCH_TABLE = 'rooms_api_room_search'
+TRIGRAM_INDEX = 'room_name_trgm_idx'
+
+
+def fold(text):
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+
+def create_search_index(apps, schema_editor):
+    Room = apps.get_model('rooms_api', 'Room')
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {SEARCH_TABLE} USING fts5(name, tokenize='trigram')")
+            cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+            cursor.executemany(f'INSERT INTO {SEARCH_TABLE}(rowid, name) VALUES (%s, %s)',
+                               [(room_id, fold(name)) for room_id, name in
+                                Room.objects.using(connection.alias).values_list('id', 'name')])
+        elif connection.vendor == 'postgresql':
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            cursor.execute(f'CREATE INDEX IF NOT EXISTS {TRIGRAM_INDEX} ON rooms_api_room USING gin (name gin_trgm_ops)')
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+        elif connection.vendor == 'postgresql':
+            cursor.execute(f'DROP INDEX IF EXISTS {TRIGRAM_INDEX}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms_api', '0005_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
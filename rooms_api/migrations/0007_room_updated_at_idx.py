@@ -0,0 +1,17 @@
+# Generated by Django 4.1.2 on 2026-10-17 08:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms_api', '0006_room_search'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['updated_at'], name='room_updated_at_idx'),
+        ),
+    ]
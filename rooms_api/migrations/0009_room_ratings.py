@@ -0,0 +1,79 @@
+# Generated by Django 4.1.2 on 2026-10-17 08:41
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def compute_ratings(apps, schema_editor):
+    """Fill the new statistics from the rated reservations of every room."""
+    using = schema_editor.connection.alias
+    Room = apps.get_model('rooms_api', 'Room')
+    Reservation = apps.get_model('rooms_api', 'Reservation')
+    rows = Reservation.objects.using(using).filter(rating__isnull=False).order_by().values('room_id').annotate(
+        rating_count=Count('id'),
+        rating_sum=Sum('rating'),
+        **{f'rated_{value}': Count('id', filter=Q(rating=value)) for value in range(1, 6)},
+    )
+    for row in rows:
+        room_id = row.pop('room_id')
+        Room.objects.using(using).filter(pk=room_id).update(
+            rating_average=row['rating_sum'] / row['rating_count'], **row)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms_api', '0008_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='rated_1',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='rated_2',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='rated_3',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='rated_4',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='rated_5',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='rating_average',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='rating_sum',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['rating_average', 'id'], name='room_rating_average_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(fields=['rating_count', 'id'], name='room_rating_count_idx'),
+        ),
+        migrations.RunPython(compute_ratings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.1.2 on 2026-10-17 09:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rooms_api', '0009_room_ratings'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservation',
+            index=models.Index(fields=['owner', 'room', 'updated_at'], name='reservation_owner_feed_idx'),
+        ),
+    ]
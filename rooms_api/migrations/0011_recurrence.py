@@ -0,0 +1,41 @@
+# Generated by Django 4.1.2 on 2026-10-17 09:26
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('rooms_api', '0010_reservation_owner_feed_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Recurrence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('training', models.CharField(default='Test', max_length=156)),
+                ('comment', models.TextField(blank=True, null=True)),
+                ('date_from', models.DateField()),
+                ('date_to', models.DateField()),
+                ('weekdays', models.PositiveSmallIntegerField()),
+                ('interval', models.PositiveSmallIntegerField(default=1)),
+                ('until', models.DateField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservation_series', to=settings.AUTH_USER_MODEL)),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='series', to='rooms_api.room')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='reservation',
+            name='recurrence',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='occurrences', to='rooms_api.recurrence'),
+        ),
+        migrations.AddIndex(
+            model_name='recurrence',
+            index=models.Index(fields=['room', 'date_from', 'id'], name='recurrence_room_keyset_idx'),
+        ),
+    ]
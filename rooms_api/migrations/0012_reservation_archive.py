@@ -0,0 +1,42 @@
+# Generated by Django 4.1.2 on 2026-10-17 09:32
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('rooms_api', '0011_recurrence'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReservationArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('date_from', models.DateField()),
+                ('date_to', models.DateField()),
+                ('training', models.CharField(max_length=156)),
+                ('rating', models.FloatField(choices=[(1.0, '1'), (2.0, '2'), (3.0, '3'), (4.0, '4'), (5.0, '5')], null=True)),
+                ('comment', models.TextField(null=True)),
+                ('room_password', models.CharField(max_length=10)),
+                ('reservation_status', models.IntegerField(choices=[(0, 'Waiting to be confirmed'), (1, 'Confirmed'), (2, 'Cancelled'), (3, 'Rejected')])),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField()),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_reservations', to=settings.AUTH_USER_MODEL)),
+                ('recurrence', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='archived_occurrences', to='rooms_api.recurrence')),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_reservations', to='rooms_api.room')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='reservationarchive',
+            index=models.Index(fields=['room', 'date_from', 'id'], name='archive_room_keyset_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reservationarchive',
+            index=models.Index(fields=['owner', 'room'], name='archive_owner_idx'),
+        ),
+    ]
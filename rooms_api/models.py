@@ -1,18 +1,59 @@
+import secrets
 from datetime import timedelta
 from django.db import models
-from django.utils.crypto import get_random_string
+from django.utils.crypto import RANDOM_STRING_CHARS, get_random_string
+
+# Byte to character table for ``generate_passwords``; bytes past the last whole
+# multiple of the alphabet are dropped, so every character is equally likely.
+PASSWORD_TABLE = bytes(ord(RANDOM_STRING_CHARS[byte % len(RANDOM_STRING_CHARS)]) for byte in range(256))
+PASSWORD_REJECTED = bytes(range(256 - 256 % len(RANDOM_STRING_CHARS), 256))
 
 
 class Room(models.Model):
     name = models.CharField(max_length=255, unique=True)
     room_manager = models.ForeignKey(
         'auth.User', related_name="manager_of_rooms", on_delete=models.CASCADE)
+    updated_at = models.DateTimeField(auto_now=True)
+    reservations_version = models.PositiveIntegerField(default=0, editable=False)
+    reservations_updated_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # Ratings of finished reservations, kept up to date by rooms_api/ratings.py.
+    rating_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.FloatField(default=0, editable=False)
+    rating_average = models.FloatField(default=0, editable=False)
+    rated_1 = models.PositiveIntegerField(default=0, editable=False)
+    rated_2 = models.PositiveIntegerField(default=0, editable=False)
+    rated_3 = models.PositiveIntegerField(default=0, editable=False)
+    rated_4 = models.PositiveIntegerField(default=0, editable=False)
+    rated_5 = models.PositiveIntegerField(default=0, editable=False)
 
     class Meta:
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['updated_at'], name='room_updated_at_idx'),
+            models.Index(fields=['rating_average', 'id'], name='room_rating_average_idx'),
+            models.Index(fields=['rating_count', 'id'], name='room_rating_count_idx'),
+        ]
 
     def __str__(self):
-        return f'Room: {self.name} room manager: {self.room_manager}'
+        return self.describe(self.name, self.room_manager)
+
+    @property
+    def rating_histogram(self):
+        return self.histogram(self.__dict__)
+
+    @staticmethod
+    def histogram(row):
+        """Number of ratings per ``Reservation.rating_choice`` bucket of a room or a ``.values()`` row."""
+        return {str(value): row[f'rated_{value}'] for value in range(1, 6)}
+
+    @staticmethod
+    def describe(name, room_manager):
+        return f'Room: {name} room manager: {room_manager}'
+
+
+class Catalogue(models.Model):
+    """One row whose version is bumped when a room is created or deleted, see rooms_api/conditional.py."""
+    version = models.PositiveBigIntegerField(default=0, editable=False)
 
 
 
@@ -20,6 +61,16 @@ def generate_password():
     return get_random_string(10)
 
 
+def generate_passwords(count, length=10):
+    """``count`` passwords like ``generate_password`` from one read of the system random source."""
+    needed = count * length
+    chars = b''
+    while len(chars) < needed:
+        chars += secrets.token_bytes(needed - len(chars) + 64).translate(PASSWORD_TABLE, PASSWORD_REJECTED)
+    chars = chars.decode()
+    return [chars[index:index + length] for index in range(0, needed, length)]
+
+
 class Reservation(models.Model):
     room = models.ForeignKey(
         Room, on_delete=models.CASCADE)
@@ -45,6 +96,25 @@ class Reservation(models.Model):
         (3, 'Rejected'),
     ]
     reservation_status = models.IntegerField(choices=status_choice, null=False, blank=False, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    recurrence = models.ForeignKey('Recurrence', related_name='occurrences', null=True, blank=True, editable=False,
+                                   on_delete=models.CASCADE)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['room', 'reservation_status', 'date_from', 'date_to'],
+                         name='reservation_conflict_idx'),
+            models.Index(fields=['room', 'date_from', 'id'], name='reservation_room_keyset_idx'),
+            models.Index(fields=['owner', 'room', 'updated_at'], name='reservation_owner_feed_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the booked term as loaded, so signals can tell what changed.
+        instance._loaded_term = (instance.__dict__.get('reservation_status'), instance.__dict__.get('room_id'),
+                                 instance.__dict__.get('date_from'), instance.__dict__.get('date_to'))
+        return instance
 
     def get_dates(self):
         date_list = []
@@ -54,3 +124,120 @@ class Reservation(models.Model):
             current_date += timedelta(days=1)
         return date_list
 
+
+
+class ReservationArchive(models.Model):
+    """
+    A reservation moved out of the live table by rooms_api/archive.py.
+
+    Rows keep the id, columns and relations they had as a Reservation and are
+    never changed afterwards; only history reads look at them.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    room = models.ForeignKey(Room, related_name='archived_reservations', on_delete=models.CASCADE)
+    date_from = models.DateField()
+    date_to = models.DateField()
+    training = models.CharField(max_length=156)
+    rating = models.FloatField(choices=Reservation.rating_choice, null=True)
+    comment = models.TextField(null=True)
+    room_password = models.CharField(max_length=10)
+    owner = models.ForeignKey('auth.User', related_name='archived_reservations', on_delete=models.CASCADE)
+    reservation_status = models.IntegerField(choices=Reservation.status_choice)
+    updated_at = models.DateTimeField()
+    recurrence = models.ForeignKey('Recurrence', related_name='archived_occurrences', null=True,
+                                   on_delete=models.CASCADE)
+    archived_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['room', 'date_from', 'id'], name='archive_room_keyset_idx'),
+            models.Index(fields=['owner', 'room'], name='archive_owner_idx'),
+        ]
+
+    def __str__(self):
+        return f'Archived reservation {self.pk} in room {self.room_id}'
+
+
+class Recurrence(models.Model):
+    """
+    A reservation repeated weekly, RRULE style (``FREQ=WEEKLY;INTERVAL;BYDAY;UNTIL``).
+
+    ``date_from`` and ``date_to`` are the first occurrence; every occurrence is a
+    Reservation row pointing here, see rooms_api/recurrence.py.
+    """
+    WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+
+    room = models.ForeignKey(Room, related_name='series', on_delete=models.CASCADE)
+    owner = models.ForeignKey('auth.User', related_name='reservation_series', on_delete=models.CASCADE)
+    training = models.CharField(max_length=156, default='Test')
+    comment = models.TextField(null=True, blank=True)
+    date_from = models.DateField()
+    date_to = models.DateField()
+    # Bit n set for Recurrence.WEEKDAYS[n].
+    weekdays = models.PositiveSmallIntegerField()
+    interval = models.PositiveSmallIntegerField(default=1)
+    until = models.DateField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['room', 'date_from', 'id'], name='recurrence_room_keyset_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.training} in room {self.room_id}: {self.rule}'
+
+    @property
+    def weekday_names(self):
+        return [name for index, name in enumerate(self.WEEKDAYS) if self.weekdays & 1 << index]
+
+    @property
+    def rule(self):
+        return f'FREQ=WEEKLY;INTERVAL={self.interval};BYDAY={",".join(self.weekday_names)};' \
+               f'UNTIL={self.until.isoformat().replace("-", "")}'
+
+
+class RoomOccupancy(models.Model):
+    """
+    Confirmed days of a room as a bitset.
+
+    Bit ``n`` of ``bitmap`` (little-endian) is set when the room is booked on ``origin + n days``.
+    """
+    room = models.OneToOneField(Room, primary_key=True, related_name='occupancy', on_delete=models.CASCADE)
+    origin = models.DateField(null=True, blank=True)
+    bitmap = models.BinaryField(default=b'')
+
+    def __str__(self):
+        return f'Occupancy of room {self.room_id} from {self.origin}'
+
+
+class Job(models.Model):
+    """A queued call of one event subscriber, see rooms_api/jobs.py."""
+    QUEUED, RUNNING, DONE, FAILED = range(4)
+    status_choice = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+    event = models.CharField(max_length=100)
+    handler = models.CharField(max_length=255)
+    payload = models.JSONField(default=dict)
+    idempotency_key = models.CharField(max_length=255, unique=True, null=True, blank=True)
+    status = models.IntegerField(choices=status_choice, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField()
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='job_due_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.event} -> {self.handler} ({self.get_status_display()})'
@@ -0,0 +1,138 @@
+import re
+from datetime import date
+from django.db import transaction
+from django.db.models import Q
+
+from rooms_api.availability import CONFIRMED, overlap_q
+from rooms_api.models import Reservation, ReservationArchive, RoomOccupancy
+
+BOOKED_RUN = re.compile('1+')
+
+
+def to_int(bitmap):
+    return int.from_bytes(bytes(bitmap), 'little')
+
+
+def to_bytes(bits):
+    return bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+
+
+def range_mask(origin, date_from, date_to):
+    """Bits for the inclusive range ``date_from..date_to`` relative to ``origin``."""
+    length = (date_to - date_from).days + 1
+    return ((1 << length) - 1) << (date_from - origin).days
+
+
+def shift_origin(occupancy, bits, date_from):
+    """Move the origin back to ``date_from`` when a range starts before it."""
+    if occupancy.origin is None:
+        occupancy.origin = date_from
+    elif date_from < occupancy.origin:
+        bits <<= (occupancy.origin - date_from).days
+        occupancy.origin = date_from
+    return bits
+
+
+def mark(room_id, date_from, date_to, booked=True):
+    """Set or clear the bits of one range in the room's bitset."""
+    mark_many(room_id, [(date_from, date_to)], booked=booked)
+
+
+def mark_many(room_id, ranges, booked=True):
+    """Set or clear the bits of several ranges with one read and one write of the bitset."""
+    ranges = list(ranges)
+    if not ranges:
+        return
+    with transaction.atomic(savepoint=False):
+        occupancy = RoomOccupancy.objects.select_for_update().filter(room_id=room_id).first()
+        created = occupancy is None
+        if created:
+            occupancy = RoomOccupancy(room_id=room_id)
+        bits = to_int(occupancy.bitmap)
+        for date_from, date_to in ranges:
+            bits = shift_origin(occupancy, bits, date_from)
+            mask = range_mask(occupancy.origin, date_from, date_to)
+            bits = bits | mask if booked else bits & ~mask
+        if not booked:
+            # Confirmed stays written before overlaps were rejected may still cover these days.
+            cleared = Q()
+            for date_from, date_to in ranges:
+                cleared |= overlap_q(date_from, date_to)
+            others = Reservation.objects.filter(cleared, room_id=room_id, reservation_status=CONFIRMED)
+            for other_from, other_to in others.values_list('date_from', 'date_to'):
+                bits = shift_origin(occupancy, bits, other_from)
+                bits |= range_mask(occupancy.origin, other_from, other_to)
+        occupancy.bitmap = to_bytes(bits)
+        occupancy.save(force_insert=created)
+
+
+def rebuild(room_id):
+    """Recompute the room's bitset from its confirmed reservations, live and archived."""
+    terms = list(Reservation.objects.filter(room_id=room_id, reservation_status=CONFIRMED)
+                 .values_list('date_from', 'date_to')
+                 .union(ReservationArchive.objects.filter(room_id=room_id, reservation_status=CONFIRMED)
+                        .values_list('date_from', 'date_to'), all=True))
+    origin = min((date_from for date_from, _ in terms), default=None)
+    bits = 0
+    for date_from, date_to in terms:
+        bits |= range_mask(origin, date_from, date_to)
+    RoomOccupancy.objects.update_or_create(room_id=room_id, defaults={'origin': origin, 'bitmap': to_bytes(bits)})
+
+
+def term_of(reservation):
+    """Return the ``(status, room_id, date_from, date_to)`` tuple of a reservation."""
+    to_date = Reservation._meta.get_field('date_from').to_python
+    return (reservation.reservation_status, reservation.room_id,
+            to_date(reservation.date_from), to_date(reservation.date_to))
+
+
+def sync_reservation(reservation, previous):
+    """
+    Update bitsets after a reservation was saved.
+
+    ``previous`` is the term tuple loaded from the database, or None for new rows.
+    """
+    current = term_of(reservation)
+    if previous == current:
+        return
+    if previous is not None and previous[0] == CONFIRMED:
+        mark(previous[1], previous[2], previous[3], booked=False)
+    if current[0] == CONFIRMED:
+        mark(current[1], current[2], current[3], booked=True)
+
+
+def window(occupancy, date_from, date_to):
+    """Return the booked days between the dates as a ``'0'``/``'1'`` string, one char per day."""
+    length = (date_to - date_from).days + 1
+    if occupancy is None or occupancy.origin is None:
+        return '0' * length
+    offset = (date_from - occupancy.origin).days
+    bits = to_int(occupancy.bitmap)
+    bits = bits >> offset if offset >= 0 else bits << -offset
+    bits &= (1 << length) - 1
+    return format(bits, f'0{length}b')[::-1]
+
+
+def describe(days, date_from, ranges=True):
+    """Summarize a window string with free and booked day counts and, optionally, booked ranges."""
+    data = {
+        'days': days,
+        'booked_days': days.count('1'),
+        'free_days': days.count('0'),
+    }
+    if ranges:
+        base = date_from.toordinal()
+        data['booked'] = [
+            [date.fromordinal(base + run.start()), date.fromordinal(base + run.end() - 1)]
+            for run in BOOKED_RUN.finditer(days)
+        ]
+    return data
+
+
+def availability(room_ids, date_from, date_to, ranges=True):
+    """Availability of several rooms in one query, keyed by room pk."""
+    occupancies = RoomOccupancy.objects.in_bulk(room_ids)
+    return {
+        room_id: describe(window(occupancies.get(room_id), date_from, date_to), date_from, ranges)
+        for room_id in room_ids
+    }
@@ -1,4 +1,212 @@
-from rest_framework.pagination import PageNumberPagination
+import heapq
+import itertools
+import json
+from base64 import b64decode, b64encode
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
-class SmallSetPagination(PageNumberPagination):
-    page_size = 2
\ No newline at end of file
+
+def flip(field):
+    return field[1:] if field.startswith('-') else f'-{field}'
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination on a unique, ordered tuple of fields.
+
+    Pages are fetched with ``WHERE (a, b) > (x, y) ORDER BY a, b LIMIT n``, so the cost
+    of a page does not depend on how deep it is. ``?page_size=`` sets the page size up
+    to ``max_page_size``, ``?count=1`` or ``?count=0`` adds or drops the total count
+    (``include_count`` is the default).
+
+    Results ranked by a filter (the filter sets ``view.ranked``, e.g. room search)
+    keep their order and are paged by an offset carried in the cursor instead. A
+    filter can also replace ``ordering`` with ``view.keyset_ordering``; ``-field``
+    seeks in descending order.
+    """
+    page_size = 20
+    max_page_size = 100
+    page_size_query_param = 'page_size'
+    count_query_param = 'count'
+    include_count = False
+    ordering = ('id',)
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page = self.page_queryset(queryset, request, view)
+        self.count = queryset.count() if self.wants_count(request) else None
+        return self.set_page(list(page))
+
+    def paginate_querysets(self, querysets, request, view=None):
+        """
+        ``paginate_queryset`` over the union of querysets whose rows never share a position.
+
+        Used for live and archived reservations. Each queryset is seeked on its own
+        index and the pages are merged. Works only with keyset pages on an ordering
+        where every field goes the same way.
+        """
+        pages = [list(self.page_queryset(queryset, request, view)) for queryset in querysets]
+        self.count = sum(queryset.count() for queryset in querysets) if self.wants_count(request) else None
+        return self.merge_pages(pages)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """``paginate_queryset`` with the async ORM."""
+        page = self.page_queryset(queryset, request, view)
+        self.count = await queryset.acount() if self.wants_count(request) else None
+        return self.set_page([item async for item in page])
+
+    async def apaginate_querysets(self, querysets, request, view=None):
+        """``paginate_querysets`` with the async ORM."""
+        pages = [[item async for item in self.page_queryset(queryset, request, view)] for queryset in querysets]
+        self.count = sum([await queryset.acount() for queryset in querysets]) if self.wants_count(request) else None
+        return self.merge_pages(pages)
+
+    def merge_pages(self, pages):
+        descending = self.ordering[0].startswith('-') != self.reverse
+        merged = heapq.merge(*pages, key=self.position_of, reverse=descending)
+        return self.set_page(list(itertools.islice(merged, self.size + 1)))
+
+    def page_queryset(self, queryset, request, view=None):
+        """The unevaluated queryset of the requested page, plus one row to tell if there is more."""
+        self.base_url = request.build_absolute_uri()
+        self.model = queryset.model
+        self.size = self.get_page_size(request)
+        self.offset = self.reverse = self.position = None
+        self.ordering = tuple(getattr(view, 'keyset_ordering', None) or self.ordering)
+        if getattr(view, 'ranked', False):
+            self.offset = self.decode_offset(request)
+            return queryset[self.offset:self.offset + self.size + 1]
+        self.cursor = self.decode_cursor(request)
+        self.reverse, self.position = self.cursor if self.cursor else (False, None)
+        if self.position is not None:
+            queryset = queryset.filter(self.seek_q(self.position, self.reverse))
+        ordering = [flip(field) if self.reverse else field for field in self.ordering]
+        return queryset.order_by(*ordering)[:self.size + 1]
+
+    def set_page(self, results):
+        has_more = len(results) > self.size
+        results = results[:self.size]
+        if self.offset is not None:
+            self.has_next, self.has_previous = has_more, self.offset > 0
+        elif self.reverse:
+            results.reverse()
+            self.has_next, self.has_previous = self.position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.position is not None
+        self.page = results
+        return results
+
+    def decode_offset(self, request):
+        payload = self.load_cursor(request) or {'o': 0}
+        try:
+            offset = int(payload['o'])
+            if offset < 0:
+                raise ValueError
+            return offset
+        except (KeyError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return min(size, self.max_page_size) if size > 0 else self.page_size
+
+    def wants_count(self, request):
+        value = request.query_params.get(self.count_query_param)
+        if value is None:
+            return self.include_count
+        return value.lower() in ('1', 'true')
+
+    def seek_q(self, position, reverse):
+        """Build ``(a, b, ...) > (x, y, ...)`` as nested OR/AND lookups."""
+        condition = None
+        for field, value in reversed(list(zip(self.ordering, position))):
+            lookup = 'lt' if field.startswith('-') != reverse else 'gt'
+            field = field.lstrip('-')
+            step = Q(**{f'{field}__{lookup}': value})
+            condition = step if condition is None else step | (Q(**{field: value}) & condition)
+        return condition
+
+    def fields(self):
+        return [field.lstrip('-') for field in self.ordering]
+
+    def position_of(self, item):
+        if isinstance(item, dict):
+            return [item[field] for field in self.fields()]
+        return [getattr(item, field) for field in self.fields()]
+
+    def encode_cursor(self, reverse=False, position=None, offset=None):
+        if offset is not None:
+            payload = json.dumps({'o': offset})
+        else:
+            payload = json.dumps({'r': int(reverse), 'p': [str(value) for value in position]})
+        return replace_query_param(self.base_url, self.cursor_query_param,
+                                   b64encode(payload.encode('ascii')).decode('ascii'))
+
+    def load_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            payload = json.loads(b64decode(encoded.encode('ascii')).decode('ascii'))
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(payload, dict):
+            raise NotFound(self.invalid_cursor_message)
+        return payload
+
+    def decode_cursor(self, request):
+        payload = self.load_cursor(request)
+        if payload is None:
+            return None
+        try:
+            position = [self.model._meta.get_field(field).to_python(value)
+                        for field, value in zip(self.fields(), payload['p'])]
+            if len(position) != len(self.ordering):
+                raise ValueError
+            return bool(payload['r']), position
+        except Exception:
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if self.offset is not None:
+            return self.encode_cursor(offset=self.offset + self.size)
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(False, self.position_of(self.page[-1]))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.offset is not None:
+            offset = max(self.offset - self.size, 0)
+            return self.encode_cursor(offset=offset) if offset else \
+                remove_query_param(self.base_url, self.cursor_query_param)
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(True, self.position_of(self.page[0]))
+
+    def get_paginated_response(self, data):
+        response = {} if self.count is None else {'count': self.count}
+        response.update({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+        return Response(response)
+
+
+class RoomPagination(KeysetPagination):
+    include_count = True
+
+
+class ReservationPagination(KeysetPagination):
+    ordering = ('date_from', 'id')
@@ -23,4 +23,10 @@ class RoomManagerPermission(permissions.BasePermission):
         return obj.room.room_manager == request.user
 
 
+class IsSelfOrAdmin(permissions.BasePermission):
+    """
+    Allow the user named by the ``pk`` of the URL, and staff.
+    """
 
+    def has_permission(self, request, view):
+        return request.user.is_staff or request.user.pk == view.kwargs.get('pk')
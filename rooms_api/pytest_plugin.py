@@ -0,0 +1,36 @@
+"""
+pytest plugin failing the tests whose requests run a query template too often.
+
+Loaded from pytest.ini with ``-p rooms_api.pytest_plugin``. Every request made
+during a test goes through the query inspector middleware (rooms_api/query_inspector.py);
+an N+1 it reports fails the test. ``@pytest.mark.allow_repeated_queries``
+opts a test out, ``--no-query-inspector`` turns the plugin off.
+"""
+import pytest
+
+
+def pytest_addoption(parser):
+    parser.addoption('--no-query-inspector', action='store_true',
+                     help='Do not fail tests on repeated queries in a request.')
+
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'allow_repeated_queries: do not fail the test on repeated queries.')
+
+
+def format_report(reports):
+    return '\n'.join(f"{report.get('view')} ({report.get('route')}): {report['count']} runs, field "
+                     f"{report['field']}\n    {report['template']}" for report in reports)
+
+
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_call(item):
+    if item.config.getoption('no_query_inspector') or item.get_closest_marker('allow_repeated_queries'):
+        yield
+        return
+    from rooms_api.query_inspector import listening
+    reports = []
+    with listening(reports.append):
+        outcome = yield
+    if reports and outcome.excinfo is None:
+        pytest.fail('Repeated queries in a request (N+1):\n' + format_report(reports), pytrace=False)
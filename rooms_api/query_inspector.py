@@ -0,0 +1,164 @@
+"""
+Development and CI checks on the SQL of each request.
+
+``query_inspector_middleware`` groups the queries of a request by statement
+template (literals, placeholders and ``IN`` lists folded). A template run more
+than ``ROOMS_API_QUERY_REPEAT_LIMIT`` times is an N+1: the request is reported
+on the ``rooms_api.queries`` logger with the view, the route and the serializer
+field that was being rendered when the template went over the limit. Queries
+slower than ``ROOMS_API_SLOW_QUERY_MS`` go to the ``rooms_api.slow_queries``
+logger as one JSON object per line. Async requests pass through uninspected:
+their queries run on other threads.
+
+``inspect()`` does the same around any block, and ``listening()`` hands the
+reports to a callback (the pytest plugin in rooms_api/pytest_plugin.py).
+
+Settings:
+    ROOMS_API_QUERY_INSPECTOR       turn the middleware on (development settings)
+    ROOMS_API_QUERY_REPEAT_LIMIT    runs of one template allowed per request
+    ROOMS_API_SLOW_QUERY_MS         slow query threshold in milliseconds
+"""
+import asyncio
+import json
+import logging
+import re
+import sys
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.decorators import sync_and_async_middleware
+from rest_framework.fields import Field
+from rest_framework.serializers import BaseSerializer
+
+DEFAULT_REPEAT_LIMIT = 5
+DEFAULT_SLOW_QUERY_MS = 100
+
+LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|%s|\?")
+IN_LIST = re.compile(r'\bIN \(\?(?:, ?\?)*\)', re.IGNORECASE)
+WHITESPACE = re.compile(r'\s+')
+
+logger = logging.getLogger('rooms_api.queries')
+slow_logger = logging.getLogger('rooms_api.slow_queries')
+listeners = []
+
+
+def template_of(sql):
+    """``sql`` with literals and placeholders replaced by ``?`` and ``IN`` lists folded."""
+    sql = LITERAL.sub('?', sql)
+    sql = IN_LIST.sub('IN (...)', sql)
+    return WHITESPACE.sub(' ', sql).strip()
+
+
+def serializer_field(frame):
+    """Name of the serializer field being rendered in the stack of ``frame``, if any."""
+    while frame is not None:
+        owner = frame.f_locals.get('self')
+        if isinstance(owner, BaseSerializer):
+            field = frame.f_locals.get('field')
+            if isinstance(field, Field):
+                return f'{type(owner).__name__}.{field.field_name}'
+            return f'{type(owner).__name__}.{frame.f_code.co_name}'
+        if isinstance(owner, Field) and owner.parent is not None:
+            return f'{type(owner.parent).__name__}.{owner.field_name}'
+        frame = frame.f_back
+    return None
+
+
+class Inspector:
+    """``execute_wrapper`` counting query templates and timing queries."""
+
+    def __init__(self, repeat_limit=None, slow_query_ms=None):
+        if repeat_limit is None:
+            repeat_limit = getattr(settings, 'ROOMS_API_QUERY_REPEAT_LIMIT', DEFAULT_REPEAT_LIMIT)
+        if slow_query_ms is None:
+            slow_query_ms = getattr(settings, 'ROOMS_API_SLOW_QUERY_MS', DEFAULT_SLOW_QUERY_MS)
+        self.repeat_limit = repeat_limit
+        self.slow_query_ms = slow_query_ms
+        self.counts = Counter()
+        self.fields = {}
+        self.slow = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - start) * 1000
+            template = template_of(sql)
+            self.counts[template] += 1
+            if self.counts[template] == self.repeat_limit + 1:
+                self.fields[template] = serializer_field(sys._getframe(1))
+            if duration >= self.slow_query_ms:
+                self.slow.append({'sql': sql, 'params': [str(param) for param in params or ()],
+                                  'duration_ms': round(duration, 3)})
+
+    def repeated(self):
+        return [{'template': template, 'count': count, 'field': self.fields.get(template)}
+                for template, count in self.counts.most_common() if count > self.repeat_limit]
+
+    def report(self, **where):
+        """Log what was found, tagged with ``where`` (view, route, ...), and return the N+1 reports."""
+        for query in self.slow:
+            slow_logger.warning(json.dumps({**where, **query}))
+        reports = [{**where, **item} for item in self.repeated()]
+        for report in reports:
+            logger.warning('%s runs %s times in %s (field %s): %s', report.get('view'), report['count'],
+                           report.get('route'), report['field'], report['template'], extra={'query_report': report})
+            for listener in listeners:
+                listener(report)
+        return reports
+
+
+@contextmanager
+def inspect(repeat_limit=None, slow_query_ms=None, **where):
+    """Inspect the queries of the block, with the settings unless given; yields the Inspector."""
+    inspector = Inspector(repeat_limit, slow_query_ms)
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(inspector))
+        yield inspector
+    inspector.report(**where)
+
+
+@contextmanager
+def listening(callback):
+    """Call ``callback(report)`` for each N+1 found in the block."""
+    listeners.append(callback)
+    try:
+        yield
+    finally:
+        listeners.remove(callback)
+
+
+def view_of(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return None, None
+    view = match.func
+    name = getattr(view, 'cls', view).__qualname__
+    action = getattr(view, 'actions', {}).get(request.method.lower())
+    return f'{name}.{action}' if action else name, match.url_name or match.view_name
+
+
+@sync_and_async_middleware
+def query_inspector_middleware(get_response):
+    """Inspect the queries of every request, see the module docstring."""
+    if not getattr(settings, 'ROOMS_API_QUERY_INSPECTOR', False):
+        raise MiddlewareNotUsed
+    if asyncio.iscoroutinefunction(get_response):
+        # Out of reach of execute_wrapper; passing them through keeps them off the sync adapter.
+        return get_response
+
+    def middleware(request):
+        inspector = Inspector()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(inspector))
+            response = get_response(request)
+        view, route = view_of(request)
+        inspector.report(view=view, route=route, path=request.path, method=request.method)
+        return response
+    return middleware
@@ -0,0 +1,108 @@
+"""
+Rating statistics of rooms, stored on Room.
+
+Every room keeps how many finished reservations rated it, the sum and the
+average of their ratings and one counter per ``Reservation.rating_choice``
+bucket (``rated_1`` .. ``rated_5``), so room lists can show and sort by them
+without reading the reservation history. ``record`` adds one rating with a
+single UPDATE when a reservation is finished, ``record_many`` a batch of them
+(imports); ``reconcile`` recomputes the statistics from the reservations and
+fixes the rooms that drifted (ratings written by the admin, ``update()`` or
+raw SQL). Ratings of archived reservations still count.
+"""
+import math
+from django.db import connections, transaction
+from django.db.models import Count, F, FloatField, Q, Sum
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from rooms_api import cache
+from rooms_api.models import Reservation, ReservationArchive, Room
+
+BUCKETS = {value: f'rated_{value}' for value in range(1, 6)}
+STAT_FIELDS = ('rating_count', 'rating_sum', 'rating_average', *BUCKETS.values())
+EMPTY = dict.fromkeys(STAT_FIELDS, 0)
+
+
+def record(room_id, rating):
+    """Add one rating to the room's statistics."""
+    record_many(room_id, [rating])
+
+
+def record_many(room_id, values):
+    """Add several ratings to the room's statistics with one UPDATE."""
+    values = list(values)
+    if not values:
+        return
+    count, total = len(values), sum(values)
+    buckets = {}
+    for value in values:
+        bucket = BUCKETS[int(value)]
+        buckets[bucket] = buckets.get(bucket, 0) + 1
+    Room.objects.filter(pk=room_id).update(
+        rating_count=F('rating_count') + count,
+        rating_sum=F('rating_sum') + total,
+        # The right-hand sides read the values from before the update.
+        rating_average=(F('rating_sum') + total) / Cast(F('rating_count') + count, FloatField()),
+        updated_at=timezone.now(),
+        **{bucket: F(bucket) + added for bucket, added in buckets.items()},
+    )
+    cache.invalidate_room(room_id, catalogue=True)
+
+
+def computed(*querysets):
+    """Statistics of every rated room from its reservations in the querysets (live and archived), by room id."""
+    stats = {}
+    for reservations in querysets:
+        rows = reservations.filter(rating__isnull=False).order_by().values('room_id').annotate(
+            rating_count=Count('id'),
+            rating_sum=Sum('rating'),
+            **{field: Count('id', filter=Q(rating=value)) for value, field in BUCKETS.items()},
+        )
+        for row in rows:
+            total = stats.setdefault(row.pop('room_id'), dict.fromkeys(row, 0))
+            for field, value in row.items():
+                total[field] += value
+    for row in stats.values():
+        row['rating_average'] = row['rating_sum'] / row['rating_count']
+    return stats
+
+
+def drifted(room, expected):
+    return any(not math.isclose(getattr(room, field), expected[field]) for field in STAT_FIELDS)
+
+
+def save(rooms, changed):
+    """One parametrized UPDATE per room; ``bulk_update`` spends most of its time building CASE expressions."""
+    meta = rooms.model._meta
+    connection = connections[rooms.db]
+    fields = [meta.get_field(name) for name in (*STAT_FIELDS, 'updated_at')]
+    quote = connection.ops.quote_name
+    sql = f'UPDATE {quote(meta.db_table)} SET ' + ', '.join(f'{quote(field.column)} = %s' for field in fields) + \
+        f' WHERE {quote(meta.pk.column)} = %s'
+    with transaction.atomic(using=rooms.db, savepoint=False), connection.cursor() as cursor:
+        cursor.executemany(sql, [[field.get_db_prep_save(getattr(room, field.attname), connection) for field in fields]
+                                 + [room.pk] for room in changed])
+
+
+def reconcile(dry_run=False, batch_size=2000):
+    """
+    Recompute the statistics of every room and save those that differ.
+
+    Returns the ids of the rooms that drifted.
+    """
+    rooms = Room.objects.all()
+    stats = computed(Reservation.objects.all(), ReservationArchive.objects.all())
+    now = timezone.now()
+    changed = []
+    for room in rooms.only('id', *STAT_FIELDS).order_by('id').iterator(chunk_size=batch_size):
+        expected = stats.get(room.pk, EMPTY)
+        if drifted(room, expected):
+            for field in STAT_FIELDS:
+                setattr(room, field, expected[field])
+            room.updated_at = now
+            changed.append(room)
+    if changed and not dry_run:
+        save(rooms, changed)
+        cache.invalidate(cache.CATALOGUE, *(cache.room_scope(room.pk) for room in changed))
+    return [room.pk for room in changed]
@@ -0,0 +1,143 @@
+"""
+Weekly recurring reservations.
+
+A ``Recurrence`` holds the rule and every occurrence is a Reservation row
+pointing to it, so conflict checks, occupancy bitsets, availability, feeds and
+ratings see occurrences like any other reservation. ``occurrences`` expands
+the rule lazily from any date, so a read of a series expands only the window
+it shows. Creating a series checks all its terms with one ``check_conflicts``
+pass and inserts them with one ``bulk_create``; confirming or cancelling a
+series, or one occurrence of it, is a single call of the batched operations of
+rooms_api/bulk.py.
+"""
+import datetime
+
+from rooms_api import archive, cache
+from rooms_api.availability import CONFIRMED, check_conflicts
+from rooms_api.booking import run_locked
+from rooms_api.bulk import cancel_reservations, confirm_reservations
+from rooms_api.conditional import touch_reservations
+from rooms_api.models import Recurrence, Reservation, generate_passwords
+
+MAX_OCCURRENCES = 500
+WAITING = 0
+
+
+def weekday_mask(names):
+    return sum(1 << Recurrence.WEEKDAYS.index(name) for name in set(names))
+
+
+def weekday_indexes(mask):
+    return [index for index in range(7) if mask & 1 << index]
+
+
+def shortest_gap(mask, interval):
+    """Fewest days between the starts of two consecutive occurrences."""
+    days = weekday_indexes(mask)
+    return min([later - earlier for earlier, later in zip(days, days[1:])] + [7 * interval - days[-1] + days[0]])
+
+
+def occurrences(series, start=None, end=None):
+    """
+    Yield ``(date_from, date_to)`` of the occurrences of ``series`` starting between ``start`` and ``end``.
+
+    Weeks before ``start`` are skipped arithmetically, not walked. ``series``
+    may be unsaved.
+    """
+    start = max(start or series.date_from, series.date_from)
+    end = min(end or series.until, series.until)
+    length = series.date_to - series.date_from
+    days = weekday_indexes(series.weekdays)
+    first_monday = series.date_from - datetime.timedelta(days=series.date_from.weekday())
+    weeks = (start - first_monday).days // 7
+    monday = first_monday + datetime.timedelta(weeks=weeks - weeks % series.interval)
+    step = datetime.timedelta(weeks=series.interval)
+    while monday <= end:
+        for day in days:
+            date_from = monday + datetime.timedelta(days=day)
+            if start <= date_from <= end:
+                yield date_from, date_from + length
+        monday += step
+
+
+def create_series(series, skip_conflicts=False):
+    """
+    Save the unsaved ``series`` and its waiting occurrences while holding the room lock.
+
+    Returns the ``date_from`` of occurrences whose term is taken by a confirmed
+    reservation. With conflicts nothing is saved, unless ``skip_conflicts`` is
+    set and some occurrences are free: then the series is saved without the
+    taken ones.
+    """
+    terms = list(occurrences(series))
+
+    def book():
+        taken = [term[0] for term, conflict in zip(terms, check_conflicts(series.room_id, terms)) if conflict]
+        if taken and (not skip_conflicts or len(taken) == len(terms)):
+            return taken
+        series.save()
+        skipped = set(taken)
+        free = [term for term in terms if term[0] not in skipped]
+        Reservation.objects.bulk_create([
+            Reservation(room_id=series.room_id, owner_id=series.owner_id, recurrence=series, training=series.training,
+                        comment=series.comment, date_from=date_from, date_to=date_to, room_password=password)
+            for (date_from, date_to), password in zip(free, generate_passwords(len(free)))
+        ])
+        cache.invalidate_room(series.room_id)
+        touch_reservations(series.room_id)
+        return taken
+
+    return run_locked(series.room_id, book)
+
+
+def occurrence_ids(series, on=None, statuses=None, upcoming=False):
+    queryset = series.occurrences.all()
+    if on is not None:
+        queryset = queryset.filter(date_from=on)
+    elif statuses is not None:
+        queryset = queryset.filter(reservation_status__in=statuses)
+    if upcoming and on is None:
+        queryset = queryset.filter(date_from__gte=datetime.date.today())
+    return list(queryset.order_by('date_from').values_list('pk', flat=True))
+
+
+def confirm_series(series, user, on=None):
+    """
+    Confirm the waiting occurrences of the series, or its occurrence starting ``on``.
+
+    One ``confirm_reservations`` call: one lock, one conflict pass and one
+    UPDATE. Returns its results per occurrence, or None if nothing starts ``on``.
+    """
+    ids = occurrence_ids(series, on, statuses=[WAITING])
+    if on is not None and not ids:
+        return None
+    return confirm_reservations(series.room, user, ids)
+
+
+def cancel_series(series, user, on=None):
+    """Cancel the upcoming occurrences of the series, or its occurrence starting ``on``, like ``confirm_series``."""
+    ids = occurrence_ids(series, on, statuses=[WAITING, CONFIRMED], upcoming=True)
+    if on is not None and not ids:
+        return None
+    return cancel_reservations(series.room, user, ids)
+
+
+def window(series, start=None, end=None):
+    """
+    The occurrences of the rule starting between ``start`` and ``end``, with their reservation.
+
+    Archived occurrences are included. ``pk`` and ``reservation_status`` are
+    None for terms without one (skipped at creation or moved by an update).
+    """
+    terms = list(occurrences(series, start, end))
+    if not terms:
+        return []
+    span = {'date_from__range': (terms[0][0], terms[-1][0])}
+    rows = {date_from: (pk, status) for date_from, pk, status in archive.with_archive(
+        series.occurrences.filter(**span), series.archived_occurrences.filter(**span),
+        'date_from', 'pk', 'reservation_status')}
+    result = []
+    for date_from, date_to in terms:
+        pk, status = rows.get(date_from, (None, None))
+        result.append({'date_from': date_from, 'date_to': date_to, 'pk': pk, 'reservation_status': status})
+    return result
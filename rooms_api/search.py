@@ -0,0 +1,129 @@
+"""
+Room name search.
+
+On SQLite room names are indexed in an FTS5 table with the trigram tokenizer,
+keyed by room id and kept in sync by the Room signals. Names and queries are
+folded (case and diacritics) before use. A query matches the rooms whose name
+contains every term, so prefixes match while typing. When no name contains the
+terms, rooms sharing enough trigrams with them are returned instead, which
+tolerates typos. Both filter on the index and are ranked by bm25.
+
+On PostgreSQL the same is done with pg_trgm word similarity and a GIN index.
+Terms shorter than three characters have no trigrams and use ``icontains``.
+"""
+import re
+import unicodedata
+from django.db import connections
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+
+SEARCH_TABLE = 'rooms_api_room_search'
+FUZZY_CANDIDATES = 200
+SIMILARITY = 0.5
+TERM = re.compile(r'\w+')
+
+
+def fold(text):
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+
+def terms_of(query):
+    return TERM.findall(fold(query))
+
+
+def trigrams(text):
+    return {text[index:index + 3] for index in range(len(text) - 2)}
+
+
+def similarity(terms, name):
+    """Share of the terms' trigrams found in ``name``, like pg_trgm word similarity."""
+    wanted = set().union(*map(trigrams, terms))
+    return len(wanted & trigrams(name)) / len(wanted) if wanted else 0.0
+
+
+def phrase(text):
+    return '"' + text.replace('"', '""') + '"'
+
+
+def index_room(room_id, name, using='default'):
+    """(Re-)index one room name; ``name=None`` removes the room."""
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [room_id])
+        if name is not None:
+            cursor.execute(f'INSERT INTO {SEARCH_TABLE}(rowid, name) VALUES (%s, %s)', [room_id, fold(name)])
+
+
+def rebuild(rows=None, using='default'):
+    """
+    Re-index all rooms from ``(id, name)`` rows, by default every Room.
+
+    Needed after ``bulk_create``, ``update()`` or raw SQL, which skip the signals.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return
+    if rows is None:
+        from rooms_api.models import Room
+        rows = Room.objects.using(using).values_list('id', 'name').iterator()
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        cursor.executemany(f'INSERT INTO {SEARCH_TABLE}(rowid, name) VALUES (%s, %s)',
+                           ((room_id, fold(name)) for room_id, name in rows))
+
+
+def fuzzy_ids(connection, terms):
+    """Rooms sharing at least ``SIMILARITY`` of the terms' trigrams, among the best bm25 candidates."""
+    grams = sorted(set().union(*map(trigrams, terms)))
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT rowid, name FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s ORDER BY rank LIMIT %s',
+                       [' OR '.join(map(phrase, grams)), FUZZY_CANDIDATES])
+        return [room_id for room_id, name in cursor.fetchall() if similarity(terms, name) >= SIMILARITY]
+
+
+def matching(queryset, match):
+    """
+    The rooms of the queryset matching ``match``, ordered by bm25 rank.
+
+    The rank is looked up by rowid for the matched rooms only.
+    """
+    room_table = queryset.model._meta.db_table
+    matched = RawSQL(f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s', [match])
+    rank = RawSQL(f'SELECT rank FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s AND rowid = {room_table}.id',
+                  [match], output_field=FloatField())
+    return queryset.filter(id__in=matched).annotate(search_rank=rank).order_by('search_rank', 'id')
+
+
+def search_rooms(queryset, query):
+    """Filter and order a Room queryset by ``query``."""
+    terms = terms_of(query)
+    for term in terms:
+        if len(term) < 3:
+            queryset = queryset.filter(name__icontains=term)
+    terms = [term for term in terms if len(term) >= 3]
+    if not terms:
+        return queryset
+    connection = connections[queryset.db]
+    if connection.vendor == 'postgresql':
+        from django.contrib.postgres.search import TrigramWordSimilarity
+        contains = Q()
+        for term in terms:
+            contains &= Q(name__icontains=term)
+        return queryset.annotate(search_rank=TrigramWordSimilarity(' '.join(terms), 'name')) \
+            .filter(contains | Q(search_rank__gte=SIMILARITY)).order_by('-search_rank', 'pk')
+    if connection.vendor != 'sqlite':
+        for term in terms:
+            queryset = queryset.filter(name__icontains=term)
+        return queryset
+    # Probe within the queryset: a match among other rooms must not hide the fuzzy results.
+    exact = matching(queryset, ' AND '.join(map(phrase, terms)))
+    if exact.exists():
+        return exact
+    ids = fuzzy_ids(connection, terms)
+    if not ids:
+        return queryset.none()
+    grams = sorted(set().union(*map(trigrams, terms)))
+    return matching(queryset.filter(pk__in=ids), ' OR '.join(map(phrase, grams)))
@@ -1,8 +1,12 @@
 import datetime
+import itertools
 from rest_framework import serializers
 from rest_framework.validators import UniqueValidator
 
-from rooms_api.models import Room, Reservation
+from rooms_api.availability import has_conflict
+from rooms_api.bulk import MAX_BATCH
+from rooms_api import recurrence
+from rooms_api.models import Recurrence, Room, Reservation
 
 
 class RoomSerializer(serializers.ModelSerializer):
@@ -13,9 +17,23 @@ class RoomSerializer(serializers.ModelSerializer):
         )]
                                  )
 
+    rating_histogram = serializers.ReadOnlyField()
+
     class Meta:
         model = Room
-        fields = ['name', 'pk', 'room_manager']
+        fields = ['name', 'pk', 'room_manager', 'rating_average', 'rating_count', 'rating_histogram']
+        read_only_fields = ['rating_average', 'rating_count']
+
+    # Read-only fast path, see ``from_values``.
+    value_fields = ('id', 'name', 'room_manager', 'rating_average', 'rating_count',
+                    'rated_1', 'rated_2', 'rated_3', 'rated_4', 'rated_5')
+
+    @staticmethod
+    def from_values(row):
+        """Output of the serializer for a ``.values(*value_fields)`` row, without building a Room."""
+        return {'name': row['name'], 'pk': row['id'], 'room_manager': row['room_manager'],
+                'rating_average': row['rating_average'], 'rating_count': row['rating_count'],
+                'rating_histogram': Room.histogram(row)}
 
 
 class ReservationSerializer(serializers.ModelSerializer):
@@ -28,6 +46,25 @@ class ReservationSerializer(serializers.ModelSerializer):
         fields = ['pk', 'room', 'owner', 'date_from', 'date_to', 'training', 'reservation_status', 'comment', 'rating']
         read_only_fields = ['reservation_status', 'owner', 'rating']
 
+    # Read-only fast path, see ``from_values``.
+    value_fields = ('id', 'room__name', 'room__room_manager__username', 'owner__username', 'date_from', 'date_to',
+                    'training', 'reservation_status', 'comment', 'rating')
+
+    @staticmethod
+    def from_values(row):
+        """Output of the serializer for a ``.values(*value_fields)`` row, joins included."""
+        return {
+            'pk': row['id'],
+            'room': Room.describe(row['room__name'], row['room__room_manager__username']),
+            'owner': row['owner__username'],
+            'date_from': row['date_from'].isoformat(),
+            'date_to': row['date_to'].isoformat(),
+            'training': row['training'],
+            'reservation_status': row['reservation_status'],
+            'comment': row['comment'],
+            'rating': row['rating'],
+        }
+
     def validate(self, data):
         """
         Check that start is before finish and there are no other reservation at this period.
@@ -38,8 +75,9 @@ class ReservationSerializer(serializers.ModelSerializer):
         if data['date_from'] < datetime.date.today():
             raise serializers.ValidationError('Enter dates from future')
         data
-        if len(Reservation.objects.filter(room=data['room'], reservation_status__in=[1, ])
-                       .filter(date_from__gte=data['date_from'], date_to__lte=data['date_to'])) > 0:
+        room = data.get('room') or getattr(self.instance, 'room', None)
+        exclude = [self.instance.pk] if self.instance is not None else None
+        if room is not None and has_conflict(room, data['date_from'], data['date_to'], exclude=exclude):
             raise serializers.ValidationError('Room is reserved at this term')
         return data
 
@@ -83,3 +121,69 @@ class CancelSerializer(serializers.ModelSerializer):
     class Meta:
         model = Reservation
         fields = ['reservation_status']
+
+
+class AvailabilityQuerySerializer(serializers.Serializer):
+    date_from = serializers.DateField()
+    date_to = serializers.DateField()
+
+    def validate(self, data):
+        if data['date_from'] > data['date_to']:
+            raise serializers.ValidationError('Finish must occur after start')
+        if (data['date_to'] - data['date_from']).days >= 3660:
+            raise serializers.ValidationError('Period can not be longer than 10 years')
+        return data
+
+
+class BulkReservationSerializer(serializers.Serializer):
+    reservations = serializers.ListField(child=serializers.DictField(), allow_empty=False, max_length=MAX_BATCH)
+
+
+class BulkIdsSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=MAX_BATCH)
+
+
+class RecurrenceSerializer(serializers.ModelSerializer):
+    owner = serializers.ReadOnlyField(source='owner.username')
+    room = serializers.StringRelatedField()
+    weekdays = serializers.ListField(child=serializers.ChoiceField(choices=Recurrence.WEEKDAYS), allow_empty=False,
+                                     source='weekday_names')
+    rule = serializers.ReadOnlyField()
+    skip_conflicts = serializers.BooleanField(default=False, write_only=True)
+
+    class Meta:
+        model = Recurrence
+        fields = ['pk', 'room', 'owner', 'training', 'comment', 'date_from', 'date_to', 'weekdays', 'interval',
+                  'until', 'rule', 'skip_conflicts']
+        extra_kwargs = {'interval': {'min_value': 1, 'max_value': 52}}
+
+    def validate(self, data):
+        """
+        Check the first occurrence like a reservation, and that the series is finite and does not overlap itself.
+        """
+        if data['date_from'] > data['date_to']:
+            raise serializers.ValidationError('Finish must occur after start')
+        if data['date_from'] < datetime.date.today():
+            raise serializers.ValidationError('Enter dates from future')
+        if data['until'] < data['date_from']:
+            raise serializers.ValidationError({'until': 'The series must end after its first occurrence.'})
+        data['weekdays'] = recurrence.weekday_mask(data.pop('weekday_names'))
+        if not data['weekdays'] & 1 << data['date_from'].weekday():
+            raise serializers.ValidationError({'weekdays': 'The first occurrence must fall on one of the weekdays.'})
+        series = Recurrence(**{'interval': 1, **{name: value for name, value in data.items()
+                                                 if name != 'skip_conflicts'}})
+        if (series.date_to - series.date_from).days >= recurrence.shortest_gap(series.weekdays, series.interval):
+            raise serializers.ValidationError('Occurrences of the series would overlap')
+        if next(itertools.islice(recurrence.occurrences(series), recurrence.MAX_OCCURRENCES, None), None):
+            raise serializers.ValidationError(
+                f'A series can have at most {recurrence.MAX_OCCURRENCES} occurrences')
+        return data
+
+
+class OccurrenceSerializer(serializers.Serializer):
+    date = serializers.DateField(required=False, help_text='Start of one occurrence; the whole series if left out.')
+
+
+class WindowQuerySerializer(serializers.Serializer):
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
@@ -0,0 +1,57 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from rooms_api import cache, occupancy, search
+from rooms_api.availability import CONFIRMED
+from rooms_api.conditional import touch_catalogue, touch_reservations
+from rooms_api.models import Reservation, Room
+
+
+@receiver(post_save, sender=Reservation)
+def update_occupancy_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_loaded_term', None)
+    occupancy.sync_reservation(instance, previous)
+    cache.invalidate_room(instance.room_id)
+    touch_reservations(instance.room_id)
+    if previous is not None and previous[1] != instance.room_id:
+        cache.invalidate_room(previous[1])
+        touch_reservations(previous[1])
+    instance._loaded_term = occupancy.term_of(instance)
+
+
+@receiver(post_delete, sender=Reservation)
+def update_occupancy_on_delete(sender, instance, **kwargs):
+    status, room_id, date_from, date_to = getattr(instance, '_loaded_term', None) or occupancy.term_of(instance)
+    if status == CONFIRMED:
+        occupancy.mark(room_id, date_from, date_to, booked=False)
+    cache.invalidate_room(room_id)
+    touch_reservations(room_id)
+
+
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+def invalidate_room_cache(sender, instance, **kwargs):
+    cache.invalidate_room(instance.pk, catalogue=True)
+
+
+@receiver(post_save, sender=Room)
+def touch_catalogue_on_create(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        touch_catalogue()
+
+
+@receiver(post_delete, sender=Room)
+def touch_catalogue_on_delete(sender, instance, **kwargs):
+    touch_catalogue()
+
+
+@receiver(post_save, sender=Room)
+def index_room_name(sender, instance, using, **kwargs):
+    search.index_room(instance.pk, instance.name, using)
+
+
+@receiver(post_delete, sender=Room)
+def unindex_room_name(sender, instance, using, **kwargs):
+    search.index_room(instance.pk, None, using)
@@ -0,0 +1,32 @@
+from django.http import StreamingHttpResponse
+
+from rooms_api.renderers import dumps
+
+STREAM_CHUNK_SIZE = 2000
+
+
+def iter_json_array(queryset, serializer_class, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    Yield a JSON array of serialized rows, one row at a time.
+
+    The queryset is read with ``.iterator()``, so memory use depends on
+    ``chunk_size`` and not on the number of rows. Rows are read as
+    ``.values(*serializer_class.value_fields)`` and turned into output by
+    ``serializer_class.from_values``.
+    """
+    queryset = queryset.values(*serializer_class.value_fields)
+    yield b'['
+    separator = b''
+    for row in queryset.iterator(chunk_size=chunk_size):
+        yield separator + dumps(serializer_class.from_values(row))
+        separator = b','
+    yield b']'
+
+
+def streaming_json_response(queryset, serializer_class, chunk_size=STREAM_CHUNK_SIZE):
+    return StreamingHttpResponse(iter_json_array(queryset, serializer_class, chunk_size),
+                                 content_type='application/json')
+
+
+def wants_stream(request):
+    return request.query_params.get('stream') in ('1', 'true')
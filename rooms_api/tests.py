@@ -1,12 +1,35 @@
+import csv
+import datetime
+import importlib
+import io
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.db.models import Count, Max, Min
+from django.db.utils import ConnectionHandler
 from django.core.exceptions import ValidationError
 from django.test import TestCase
 from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
 import pytest
 from freezegun import freeze_time
-from rest_framework import status
+from rest_framework import serializers, status
+from rest_framework.test import APIClient
 
-from rooms_api.models import Room, Reservation
+from rooms_api import archive, ical, jobs, metrics, occupancy, query_inspector, ratings, recurrence, search, transfer
+from rooms_api.availability import check_conflicts, has_conflict
+from rooms_api.cache import stats
+from rooms_api.handlers import STATUS_CHANGED
+from rooms_api.models import Job, Recurrence, Room, Reservation, ReservationArchive
+from rooms_api.pagination import RoomPagination
 from rooms_api.serializers import RoomSerializer, ReservationSerializer, ReservationWithPasswordSerializer
+from rooms_app.database import database_config
 
 
 @pytest.mark.django_db
@@ -105,7 +128,7 @@ def test_list_ReservationViewSet(client, user, room, reservation):
     client.force_login(user)
     response = client.get(f"/api/rooms/{room.id}/reservations/", {}, format='json')
     assert response.status_code == status.HTTP_200_OK
-    assert Reservation.objects.count() == len(response.data)
+    assert Reservation.objects.count() == len(response.data['results'])
 
 
 @pytest.mark.django_db
@@ -329,6 +352,19 @@ def test_finish_ReservationViewSet(client, user, room, reservation2):
     assert reservation2.rating == 2.0
 
 
+@freeze_time('2023-09-28 00:00:00')
+@pytest.mark.django_db
+def test_finish_after_evaluation_period_ReservationViewSet(client, user, room, reservation2, settings):
+    settings.ROOMS_API_ARCHIVE_AFTER_DAYS = 365
+    finish_url = f"/api/rooms/{room.id}/reservations/{reservation2.id}/finish/"
+    client.force_login(user)
+    response = client.post(finish_url, {'rating': 2.0}, format='json')
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.data == {'message': 'The evaluation period of this training is over.'}
+    settings.ROOMS_API_ARCHIVE_AFTER_DAYS = 400
+    assert client.post(finish_url, {'rating': 2.0}, format='json').status_code == status.HTTP_200_OK
+
+
 @pytest.mark.django_db
 def test_forbidden_confirm_ReservationViewSet(client, simple_user, room, reservation):
     confirm_url = f"/api/rooms/{room.id}/reservations/{reservation.id}/confirm/"
@@ -379,3 +415,1506 @@ def test_cancel_ReservationViewSet(client, user, room, reservation):
     assert response.status_code == status.HTTP_200_OK
     reservation.refresh_from_db()
     assert reservation.reservation_status == 2
+
+
+"""Testing availability"""
+
+@pytest.mark.django_db
+def test_check_conflicts_partial_overlap(room, reservation2):
+    """Confirmed reservation on 2022-09-24 blocks every range touching that day."""
+    ranges = [
+        (datetime.date(2022, 9, 20), datetime.date(2022, 9, 24)),
+        (datetime.date(2022, 9, 24), datetime.date(2022, 9, 30)),
+        (datetime.date(2022, 9, 1), datetime.date(2022, 9, 30)),
+        (datetime.date(2022, 9, 25), datetime.date(2022, 9, 26)),
+        (datetime.date(2022, 9, 20), datetime.date(2022, 9, 23)),
+    ]
+    assert check_conflicts(room, ranges) == [True, True, True, False, False]
+    assert [has_conflict(room, *term) for term in ranges] == [True, True, True, False, False]
+
+
+@pytest.mark.django_db
+def test_check_conflicts_ignores_not_confirmed_and_excluded(room, reservation, reservation2):
+    day = datetime.date(2022, 9, 25)
+    assert not has_conflict(room, day, day)
+    day = datetime.date(2022, 9, 24)
+    assert not has_conflict(room, day, day, exclude=[reservation2.pk])
+
+
+@pytest.mark.django_db
+def test_confirm_conflicting_ReservationViewSet(client, user, room, reservation2):
+    """ValidationError('Room is reserved at this term')"""
+    overlapping = Reservation.objects.create(date_from='2022-09-23', date_to='2022-09-24',
+                                             owner=user, room=room)
+    confirm_url = f"/api/rooms/{room.id}/reservations/{overlapping.id}/confirm/"
+    client.force_login(user)
+    response = client.post(confirm_url, {'reservation_status': 1}, format='json')
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    overlapping.refresh_from_db()
+    assert overlapping.reservation_status == 0
+
+
+"""Testing concurrent bookings"""
+
+def post_concurrently(user, requests):
+    """POST every (url, data) pair from a pool of threads, each with its own connection."""
+    def post(item):
+        url, data = item
+        client = APIClient()
+        client.force_authenticate(user)
+        try:
+            return client.post(url, data, format='json').status_code
+        finally:
+            connection.close()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        return list(pool.map(post, requests))
+
+
+@freeze_time('2022-10-06 00:00:00')
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_confirm_no_double_booking(user, room):
+    pending = [Reservation.objects.create(date_from='2022-10-20', date_to=f'2022-10-{20 + i % 5}',
+                                          owner=user, room=room) for i in range(40)]
+    codes = post_concurrently(user, [
+        (f"/api/rooms/{room.id}/reservations/{item.id}/confirm/", {'reservation_status': 1})
+        for item in pending
+    ])
+    assert codes.count(status.HTTP_200_OK) == 1
+    assert codes.count(status.HTTP_400_BAD_REQUEST) == len(pending) - 1
+    assert Reservation.objects.filter(reservation_status=1).count() == 1
+
+
+@freeze_time('2022-10-06 00:00:00')
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_create_ReservationViewSet(user):
+    rooms = [Room.objects.create(name=f'Room {i}', room_manager=user) for i in range(10)]
+    new_reservation = {'training': 'WCAG', 'date_from': '2022-10-25', 'date_to': '2022-10-26'}
+    codes = post_concurrently(user, [
+        (f"/api/rooms/{rooms[i % 10].id}/reservations/", new_reservation) for i in range(200)
+    ])
+    assert codes == [status.HTTP_201_CREATED] * 200
+    for room in rooms:
+        assert Reservation.objects.filter(room=room).count() == 20
+
+
+"""Testing query counts"""
+
+def count_queries(client, method, url, data=None):
+    with CaptureQueriesContext(connection) as context:
+        response = getattr(client, method)(url, data, format='json')
+    assert response.status_code < 400, response.data
+    return len(context.captured_queries)
+
+
+@pytest.mark.django_db
+def test_list_query_count_does_not_grow_ReservationViewSet(client, user, room, simple_user):
+    client.force_authenticate(user)
+    url = f"/api/rooms/{room.id}/reservations/"
+    Reservation.objects.create(date_from='2022-09-01', date_to='2022-09-01', owner=user, room=room)
+    single = count_queries(client, 'get', url)
+    for day in range(2, 12):
+        Reservation.objects.create(date_from=f'2022-09-{day:02}', date_to=f'2022-09-{day:02}',
+                                   owner=simple_user if day % 2 else user, room=room)
+    assert count_queries(client, 'get', url) == single == 2
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('action, data, expected', [
+    ('confirm', {'reservation_status': 1}, 9),
+    ('cancel', {'reservation_status': 2}, 3),
+])
+def test_status_actions_query_count_ReservationViewSet(client, user, room, reservation, action, data, expected):
+    client.force_authenticate(user)
+    url = f"/api/rooms/{room.id}/reservations/{reservation.id}/{action}/"
+    assert count_queries(client, 'post', url, data) == expected
+
+
+@freeze_time('2022-09-28 00:00:00')
+@pytest.mark.django_db
+def test_finish_query_count_ReservationViewSet(client, user, room, reservation2):
+    client.force_authenticate(user)
+    url = f"/api/rooms/{room.id}/reservations/{reservation2.id}/finish/"
+    # Lookup, reservation UPDATE, version bump and the room's rating UPDATE.
+    assert count_queries(client, 'post', url, {'rating': 4.0}) == 4
+
+
+@pytest.mark.django_db
+def test_retrieve_query_count_ReservationViewSet(client, user, room, reservation, reservation2):
+    client.force_authenticate(user)
+    for item in (reservation, reservation2):
+        assert count_queries(client, 'get', f"/api/rooms/{room.id}/reservations/{item.id}/") == 2
+
+
+"""Testing reservation listing"""
+
+@pytest.fixture
+def many_reservations(room, user):
+    """45 reservations, several starting on the same day, created out of date order."""
+    return [Reservation.objects.create(date_from=f'2022-10-{1 + (i * 7) % 15:02}',
+                                       date_to='2022-10-20', owner=user, room=room)
+            for i in range(45)]
+
+
+@pytest.mark.django_db
+def test_keyset_pagination_ReservationViewSet(client, user, room, many_reservations):
+    client.force_authenticate(user)
+    url = f"/api/rooms/{room.id}/reservations/"
+    seen = []
+    pages = []
+    while url:
+        response = client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        pages.append(response.data)
+        seen += [item['pk'] for item in response.data['results']]
+        url = response.data['next']
+    expected = Reservation.objects.order_by('date_from', 'id').values_list('pk', flat=True)
+    assert seen == list(expected)
+    assert [len(page['results']) for page in pages] == [20, 20, 5]
+    assert pages[0]['previous'] is None
+    back = client.get(pages[2]['previous'])
+    assert back.data['results'] == pages[1]['results']
+
+
+@pytest.mark.django_db
+def test_list_invalid_cursor_ReservationViewSet(client, user, room, reservation):
+    client.force_authenticate(user)
+    response = client.get(f"/api/rooms/{room.id}/reservations/", {'cursor': 'garbage'})
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_list_empty_and_missing_room_ReservationViewSet(client, user, room):
+    client.force_authenticate(user)
+    response = client.get(f"/api/rooms/{room.id}/reservations/")
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data['results'] == []
+    response = client.get(f"/api/rooms/{room.id + 1}/reservations/")
+    assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_stream_list_ReservationViewSet(client, user, room, many_reservations):
+    client.force_authenticate(user)
+    response = client.get(f"/api/rooms/{room.id}/reservations/", {'stream': 1})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.streaming
+    data = json.loads(b''.join(response.streaming_content))
+    queryset = Reservation.objects.order_by('date_from', 'id')
+    assert data == json.loads(json.dumps(ReservationSerializer(queryset, many=True).data))
+
+
+"""Testing availability calendar"""
+
+@pytest.mark.django_db
+def test_availability_RoomViewSet(client, user, room, reservation, reservation2):
+    client.force_authenticate(user)
+    url = f"/api/rooms/{room.id}/availability/"
+    response = client.get(url, {'from': '2022-09-22', 'to': '2022-09-26'})
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data['days'] == '00100'
+    assert response.data['booked'] == [[datetime.date(2022, 9, 24), datetime.date(2022, 9, 24)]]
+    assert response.data['free_days'] == 4
+
+    client.post(f"/api/rooms/{room.id}/reservations/{reservation.id}/confirm/", {'reservation_status': 1})
+    response = client.get(url, {'from': '2022-09-22', 'to': '2022-09-26'})
+    assert response.data['days'] == '00110'
+
+    client.post(f"/api/rooms/{room.id}/reservations/{reservation2.id}/cancel/", {'reservation_status': 2})
+    response = client.get(url, {'from': '2022-09-22', 'to': '2022-09-26'})
+    assert response.data['days'] == '00010'
+
+
+@pytest.mark.django_db
+def test_availability_moves_origin_and_dates(user, room, reservation2):
+    reservation = Reservation.objects.create(date_from='2022-09-01', date_to='2022-09-02', owner=user,
+                                             room=room, reservation_status=1)
+    days = occupancy.availability([room.id], datetime.date(2022, 8, 30), datetime.date(2022, 9, 3))
+    assert days[room.id]['days'] == '00110'
+    reservation.date_from = datetime.date(2022, 9, 10)
+    reservation.date_to = datetime.date(2022, 9, 11)
+    reservation.save()
+    days = occupancy.availability([room.id], datetime.date(2022, 9, 1), datetime.date(2022, 9, 30))
+    assert days[room.id]['days'] == '000000000110000000000001000000'
+    reservation.delete()
+    days = occupancy.availability([room.id], datetime.date(2022, 9, 1), datetime.date(2022, 9, 30))
+    assert days[room.id]['booked_days'] == 1
+
+
+@pytest.mark.django_db
+def test_availability_many_rooms_RoomViewSet(client, user, room, room_simple_user, reservation2):
+    client.force_authenticate(user)
+    response = client.get("/api/rooms/availability/", {'from': '2022-09-24', 'to': '2022-09-25'})
+    assert response.status_code == status.HTTP_200_OK
+    days = {item['room']: item['days'] for item in response.data['rooms']}
+    assert days == {room.id: '10', room_simple_user.id: '00'}
+    response = client.get("/api/rooms/availability/",
+                          {'from': '2022-09-24', 'to': '2022-09-25', 'rooms': room_simple_user.id})
+    assert [item['room'] for item in response.data['rooms']] == [room_simple_user.id]
+
+
+@pytest.mark.django_db
+def test_availability_invalid_period_RoomViewSet(client, user, room):
+    client.force_authenticate(user)
+    response = client.get(f"/api/rooms/{room.id}/availability/", {'from': '2022-09-24'})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    response = client.get(f"/api/rooms/{room.id}/availability/", {'from': '2022-09-24', 'to': '2022-09-20'})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+"""Testing free room search"""
+
+@pytest.mark.django_db
+def test_available_RoomViewSet(client, user, room, room_simple_user, reservation, reservation2):
+    client.force_authenticate(user)
+    response = client.get("/api/rooms/available/", {'date_from': '2022-09-20', 'date_to': '2022-09-24'})
+    assert response.status_code == status.HTTP_200_OK
+    assert [item['pk'] for item in response.data] == [room_simple_user.id]
+    response = client.get("/api/rooms/available/", {'date_from': '2022-09-25', 'date_to': '2022-09-30'})
+    assert sorted(item['pk'] for item in response.data) == [room.id, room_simple_user.id]
+    response = client.get("/api/rooms/available/", {'date_from': '2022-09-25', 'date_to': '2022-09-30',
+                                                    'search': 'Grey'})
+    assert [item['pk'] for item in response.data] == [room_simple_user.id]
+
+
+@pytest.mark.django_db
+def test_available_query_count_RoomViewSet(client, user, room, room_simple_user, reservation2):
+    client.force_authenticate(user)
+    url = "/api/rooms/available/?date_from=2022-09-01&date_to=2022-09-30"
+    assert count_queries(client, 'get', url) == 1
+
+
+@pytest.mark.django_db
+def test_available_invalid_period_RoomViewSet(client, user, room):
+    client.force_authenticate(user)
+    response = client.get("/api/rooms/available/", {'date_from': '2022-09-30', 'date_to': '2022-09-01'})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+
+"""Testing bulk actions"""
+
+@freeze_time('2022-09-01 00:00:00')
+@pytest.mark.django_db
+def test_bulk_create_ReservationViewSet(client, user, room, reservation2):
+    client.force_authenticate(user)
+    items = [
+        {'training': 'A', 'date_from': '2022-09-10', 'date_to': '2022-09-11'},
+        {'training': 'B', 'date_from': '2022-09-23', 'date_to': '2022-09-25'},
+        {'training': 'C', 'date_from': '2022-09-12', 'date_to': '2022-09-10'},
+        {'training': 'D', 'date_from': '2022-09-10', 'date_to': '2022-09-10'},
+    ]
+    response = client.post(f"/api/rooms/{room.id}/reservations/bulk-create/", {'reservations': items},
+                           format='json')
+    assert response.status_code == status.HTTP_200_OK
+    results = response.data['results']
+    assert [result.get('status') for result in results] == ['created', None, None, 'created']
+    assert results[1]['errors'] == {'non_field_errors': ['Room is reserved at this term']}
+    created = Reservation.objects.filter(pk__in=[results[0]['pk'], results[3]['pk']])
+    assert {(item.training, item.owner_id, item.room_id, item.reservation_status) for item in created} == \
+           {('A', user.id, room.id, 0), ('D', user.id, room.id, 0)}
+
+
+@pytest.mark.django_db
+def test_bulk_confirm_ReservationViewSet(client, user, simple_user, room, reservation2):
+    new = [Reservation.objects.create(date_from=date_from, date_to=date_to, owner=simple_user, room=room)
+           for date_from, date_to in [('2022-09-20', '2022-09-22'), ('2022-09-22', '2022-09-23'),
+                                      ('2022-09-23', '2022-09-24'), ('2022-09-25', '2022-09-26')]]
+    url = f"/api/rooms/{room.id}/reservations/bulk-confirm/"
+    client.force_authenticate(user)
+    ids = [item.pk for item in new] + [reservation2.pk, 9999]
+    with CaptureQueriesContext(connection) as context:
+        response = client.post(url, {'ids': ids}, format='json')
+    assert len(context.captured_queries) < 15
+    assert response.status_code == status.HTTP_200_OK
+    assert [result.get('status') for result in response.data['results']] == \
+           ['confirmed', None, None, 'confirmed', 'confirmed', None]
+    assert response.data['results'][5]['errors'] == ['Not found.']
+    assert set(Reservation.objects.filter(reservation_status=1).values_list('pk', flat=True)) == \
+           {new[0].pk, new[3].pk, reservation2.pk}
+    days = occupancy.availability([room.id], datetime.date(2022, 9, 20), datetime.date(2022, 9, 26))
+    assert days[room.id]['days'] == '1110111'
+
+
+@pytest.mark.django_db
+def test_bulk_confirm_forbidden_ReservationViewSet(client, simple_user, room, reservation):
+    client.force_authenticate(simple_user)
+    response = client.post(f"/api/rooms/{room.id}/reservations/bulk-confirm/", {'ids': [reservation.pk]},
+                           format='json')
+    assert response.status_code == status.HTTP_403_FORBIDDEN
+    reservation.refresh_from_db()
+    assert reservation.reservation_status == 0
+
+
+@pytest.mark.django_db
+def test_bulk_cancel_ReservationViewSet(client, user, simple_user, room, reservation, reservation2):
+    foreign = Reservation.objects.create(date_from='2022-09-26', date_to='2022-09-26', owner=simple_user, room=room)
+    client.force_authenticate(user)
+    response = client.post(f"/api/rooms/{room.id}/reservations/bulk-cancel/",
+                           {'ids': [reservation.pk, reservation2.pk, foreign.pk]}, format='json')
+    assert [result.get('status') for result in response.data['results']] == ['cancelled', 'cancelled', None]
+    assert list(Reservation.objects.order_by('pk').values_list('reservation_status', flat=True)) == [2, 2, 0]
+    days = occupancy.availability([room.id], datetime.date(2022, 9, 24), datetime.date(2022, 9, 24))
+    assert days[room.id]['days'] == '0'
+
+
+@pytest.mark.django_db
+def test_bulk_invalid_payload_ReservationViewSet(client, user, room):
+    client.force_authenticate(user)
+    url = f"/api/rooms/{room.id}/reservations/bulk-confirm/"
+    assert client.post(url, {'ids': []}, format='json').status_code == status.HTTP_400_BAD_REQUEST
+    assert client.post(url, {'ids': list(range(501))}, format='json').status_code == status.HTTP_400_BAD_REQUEST
+
+
+"""Testing read cache"""
+
+@pytest.mark.django_db
+def test_cached_retrieve_RoomViewSet(client, user, room):
+    client.force_authenticate(user)
+    url = f'/api/rooms/{room.id}/'
+    first = client.get(url).data
+    with CaptureQueriesContext(connection) as context:
+        assert client.get(url).data == first
+    assert len(context.captured_queries) == 1
+    room.name = 'Blue'
+    room.save()
+    assert client.get(url).data['name'] == 'Blue'
+    assert stats.snapshot()['hits'] == 1
+    assert stats.snapshot()['misses'] == 2
+
+
+@pytest.mark.django_db
+def test_cached_list_RoomViewSet(client, user, room):
+    client.force_authenticate(user)
+    assert client.get('/api/rooms/').data['count'] == 1
+    Room.objects.create(name='Blue', room_manager=user)
+    assert client.get('/api/rooms/').data['count'] == 2
+    assert client.get('/api/rooms/', {'search': 'Blue'}).data['count'] == 1
+
+
+@pytest.mark.django_db
+def test_cached_retrieve_ReservationViewSet(client, user, simple_user, room, reservation):
+    url = f"/api/rooms/{room.id}/reservations/{reservation.id}/"
+    client.force_authenticate(user)
+    assert client.get(url).data['reservation_status'] == 0
+    client.post(f"{url}confirm/", {'reservation_status': 1})
+    response = client.get(url)
+    assert response.data['reservation_status'] == 1
+    assert 'room_password' in response.data
+    client.force_authenticate(simple_user)
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url)
+    assert len(context.captured_queries) == 1
+    assert 'room_password' not in response.data
+
+
+@pytest.mark.django_db
+def test_cache_stats_view(client, user, superuser, room):
+    client.force_authenticate(user)
+    client.get(f'/api/rooms/{room.id}/')
+    client.get(f'/api/rooms/{room.id}/')
+    assert client.get('/api/cache/stats/').status_code == status.HTTP_403_FORBIDDEN
+    client.force_authenticate(superuser)
+    assert client.get('/api/cache/stats/').data == {'hits': 1, 'misses': 1, 'hit_ratio': 0.5}
+
+
+"""Testing conditional requests"""
+
+@pytest.mark.django_db
+def test_conditional_retrieve_RoomViewSet(client, user, room):
+    client.force_authenticate(user)
+    url = f'/api/rooms/{room.id}/'
+    response = client.get(url)
+    etag = response['ETag']
+    assert response.has_header('Last-Modified')
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert response.content == b''
+    response = client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    room.name = 'Blue'
+    room.save()
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_200_OK
+    assert response['ETag'] != etag
+
+
+@pytest.mark.django_db
+def test_conditional_list_RoomViewSet(client, user, room):
+    client.force_authenticate(user)
+    etag = client.get('/api/rooms/')['ETag']
+    assert client.get('/api/rooms/', HTTP_IF_NONE_MATCH=etag).status_code == status.HTTP_304_NOT_MODIFIED
+    assert client.get('/api/rooms/?page=1', HTTP_IF_NONE_MATCH=etag).status_code == status.HTTP_200_OK
+    blue = Room.objects.create(name='Blue', room_manager=user)
+    assert client.get('/api/rooms/', HTTP_IF_NONE_MATCH=etag).status_code == status.HTTP_200_OK
+    # Deleting a room that is not the latest changed one leaves MAX(updated_at) as it was.
+    room.save()
+    etag = client.get('/api/rooms/')['ETag']
+    blue.delete()
+    assert client.get('/api/rooms/', HTTP_IF_NONE_MATCH=etag).status_code == status.HTTP_200_OK
+
+
+@pytest.mark.django_db
+def test_conditional_list_ReservationViewSet(client, user, room, reservation, reservation2):
+    client.force_authenticate(user)
+    url = f"/api/rooms/{room.id}/reservations/"
+    etag = client.get(url)['ETag']
+    with CaptureQueriesContext(connection) as context:
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_304_NOT_MODIFIED
+    assert len(context.captured_queries) == 1
+    client.post(f"{url}{reservation.id}/cancel/", {'reservation_status': 2})
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == status.HTTP_200_OK
+    etag = client.get(url)['ETag']
+    client.post(f"{url}bulk-cancel/", {'ids': [reservation2.id]}, format='json')
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == status.HTTP_200_OK
+
+
+@pytest.mark.django_db
+def test_conditional_retrieve_per_user_ReservationViewSet(client, user, simple_user, room, reservation2):
+    url = f"/api/rooms/{room.id}/reservations/{reservation2.id}/"
+    client.force_authenticate(user)
+    etag = client.get(url)['ETag']
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == status.HTTP_304_NOT_MODIFIED
+    client.force_authenticate(simple_user)
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == status.HTTP_200_OK
+
+
+"""Testing database profiles"""
+
+def test_database_config_profiles(tmp_path):
+    assert database_config(tmp_path, {}) == {'ENGINE': 'django.db.backends.sqlite3',
+                                             'NAME': tmp_path / 'db.sqlite3'}
+    config = database_config(tmp_path, {'ROOMS_DB_PROFILE': 'sqlite-prod', 'ROOMS_DB_TIMEOUT': '5'})
+    assert config['OPTIONS'] == {'timeout': 5.0}
+    assert config['PRAGMAS']['journal_mode'] == 'WAL'
+    assert config['PRAGMAS']['busy_timeout'] == 5000
+    config = database_config(tmp_path, {'ROOMS_DB_PROFILE': 'postgres', 'ROOMS_DB_HOST': 'db'})
+    assert config['ENGINE'] == 'django.db.backends.postgresql'
+    assert config['HOST'] == 'db'
+    assert config['CONN_MAX_AGE'] == 600
+    with pytest.raises(ImproperlyConfigured):
+        database_config(tmp_path, {'ROOMS_DB_PROFILE': 'oracle'})
+
+
+@pytest.mark.django_db
+def test_sqlite_prod_pragmas_applied(tmp_path):
+    config = database_config(tmp_path, {'ROOMS_DB_PROFILE': 'sqlite-prod'})
+    handler = ConnectionHandler({'default': config})
+    try:
+        with handler['default'].cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            assert cursor.fetchone()[0] == 'wal'
+            cursor.execute('PRAGMA synchronous')
+            assert cursor.fetchone()[0] == 1
+            cursor.execute('PRAGMA busy_timeout')
+            assert cursor.fetchone()[0] == 20000
+    finally:
+        handler.close_all()
+
+
+"""Testing settings profiles"""
+
+def test_prod_settings_without_debug_tools(monkeypatch):
+    monkeypatch.setenv('DJANGO_SECRET_KEY', 'secret')
+    monkeypatch.setenv('DJANGO_ALLOWED_HOSTS', 'rooms.example.com, api.example.com')
+    monkeypatch.delenv('ROOMS_DB_PROFILE', raising=False)
+    monkeypatch.delenv('ROOMS_METRICS_ALLOWED_IPS', raising=False)
+    prod = importlib.reload(importlib.import_module('rooms_app.settings.prod'))
+    assert prod.DEBUG is False
+    # A proxy on the same host makes every client 127.0.0.1.
+    assert prod.ROOMS_METRICS_ALLOWED_IPS == []
+    assert prod.SECRET_KEY == 'secret'
+    assert prod.ALLOWED_HOSTS == ['rooms.example.com', 'api.example.com']
+    assert 'debug_toolbar' not in prod.INSTALLED_APPS
+    assert not [name for name in prod.MIDDLEWARE if name.startswith('debug_toolbar')]
+    assert prod.REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'] == ['rooms_api.renderers.FastJSONRenderer']
+    assert prod.TEMPLATES[0]['OPTIONS']['loaders'][0][0] == 'django.template.loaders.cached.Loader'
+    assert prod.DATABASES['default']['PRAGMAS']['journal_mode'] == 'WAL'
+
+
+def test_prod_settings_require_secret_key(monkeypatch):
+    monkeypatch.delenv('DJANGO_SECRET_KEY', raising=False)
+    with pytest.raises(ImproperlyConfigured):
+        importlib.reload(importlib.import_module('rooms_app.settings.prod'))
+
+
+"""Testing JSON renderer"""
+
+def test_fast_json_renderer_matches_JSONRenderer():
+    from decimal import Decimal
+    from rest_framework.renderers import JSONRenderer
+    from rooms_api.renderers import FastJSONRenderer
+    data = {'from': datetime.date(2030, 1, 2), 'price': Decimal('1.50'), 'text': 'zażółć\u2028\u2029',
+            'items': [1, 2.5, None, True], 1: 'key'}
+    assert FastJSONRenderer().render(data) == JSONRenderer().render(data)
+    assert FastJSONRenderer().render(data, 'application/json; indent=4') == \
+        JSONRenderer().render(data, 'application/json; indent=4')
+    assert FastJSONRenderer().render(None) == b''
+
+
+def test_fast_json_parser():
+    from io import BytesIO
+    from rest_framework.exceptions import ParseError
+    from rooms_api.renderers import FastJSONParser
+    assert FastJSONParser().parse(BytesIO('{"training": "Jóga", "ids": [1, 2]}'.encode())) == \
+        {'training': 'Jóga', 'ids': [1, 2]}
+    assert FastJSONParser().parse(BytesIO('{"a": "é"}'.encode('latin-1')), parser_context={'encoding': 'latin-1'}) \
+        == {'a': 'é'}
+    with pytest.raises(ParseError):
+        FastJSONParser().parse(BytesIO(b'{"a": '))
+
+
+"""Testing values() read path"""
+
+@pytest.mark.django_db
+def test_from_values_matches_serializers(room, room_simple_user, reservation, reservation_with_rating):
+    Reservation.objects.filter(pk=reservation.pk).update(comment='Komentarz ąę')
+    rooms = Room.objects.order_by('id')
+    assert [RoomSerializer.from_values(row) for row in rooms.values(*RoomSerializer.value_fields)] == \
+        [RoomSerializer(item).data for item in rooms]
+    reservations = Reservation.objects.order_by('id')
+    rows = [ReservationSerializer.from_values(row) for row in reservations.values(*ReservationSerializer.value_fields)]
+    assert rows == [ReservationSerializer(item).data for item in reservations]
+    assert [list(row) for row in rows] == [list(ReservationSerializer(item).data) for item in reservations]
+    assert json.dumps(RoomSerializer.from_values(rooms.values(*RoomSerializer.value_fields)[0])) == \
+        json.dumps(RoomSerializer(rooms[0]).data)
+
+
+"""Testing room search"""
+
+@pytest.mark.django_db
+def test_search_RoomViewSet(client, user):
+    client.force_authenticate(user)
+    names = ['Conference Room', 'Conference Hall', 'Small conference room 2', 'Kitchen', 'Łódź Office']
+    rooms = {name: Room.objects.create(name=name, room_manager=user) for name in names}
+
+    def search(query):
+        names, url = [], f'/api/rooms/?search={query}&page_size=2'
+        while url:
+            response = client.get(url)
+            assert response.status_code == status.HTTP_200_OK
+            names += [item['name'] for item in response.data['results']]
+            url = response.data['next']
+        return names
+
+    assert search('Conf') == ['Conference Room', 'Conference Hall', 'Small conference room 2']
+    assert search('conference room 2') == ['Small conference room 2']
+    assert search('confrence') == ['Conference Room', 'Conference Hall', 'Small conference room 2']
+    assert search('lodz') == ['Łódź Office']
+    assert search('Ki') == ['Kitchen']
+    assert search('xyz') == []
+
+    rooms['Kitchen'].name = 'Kitchenette'
+    rooms['Kitchen'].save()
+    assert search('kitchenette') == ['Kitchenette']
+    rooms['Łódź Office'].delete()
+    assert search('office') == []
+    # An exact match outside the queryset does not hide the fuzzy matches inside it.
+    from rooms_api.search import search_rooms
+    hall = Room.objects.filter(pk=rooms['Conference Hall'].pk)
+    assert list(search_rooms(hall, 'conference room')) == [rooms['Conference Hall']]
+
+
+"""Testing room pagination"""
+
+@pytest.mark.django_db
+def test_cursor_pagination_RoomViewSet(client, user, monkeypatch):
+    client.force_authenticate(user)
+    monkeypatch.setattr(RoomPagination, 'max_page_size', 10)
+    Room.objects.bulk_create([Room(name=f'Room {i}', room_manager=user) for i in range(25)])
+    response = client.get('/api/rooms/')
+    assert response.data['count'] == 25
+    assert len(response.data['results']) == 20
+    seen, url = [], '/api/rooms/?page_size=7&count=0'
+    while url:
+        response = client.get(url)
+        assert 'count' not in response.data
+        seen += [item['pk'] for item in response.data['results']]
+        url = response.data['next']
+    assert seen == list(Room.objects.order_by('id').values_list('pk', flat=True))
+    assert client.get(response.data['previous']).data['results'][0]['pk'] == seen[14]
+    assert len(client.get('/api/rooms/', {'page_size': 1000}).data['results']) == 10
+    assert len(client.get('/api/rooms/', {'page_size': 'x'}).data['results']) == 20
+    assert client.get('/api/rooms/', {'cursor': 'eyJvIjogLTF9'}).status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_list_query_count_RoomViewSet(client, user, room):
+    client.force_authenticate(user)
+    # MAX(updated_at) and the catalogue version for the validators, the page, then the count.
+    assert count_queries(client, 'get', '/api/rooms/') == 4
+    with CaptureQueriesContext(connection) as context:
+        assert 'count' not in client.get('/api/rooms/', {'count': 0, 'page_size': 5}).data
+    assert len(context.captured_queries) == 3
+    assert not any('COUNT(' in query['sql'] for query in context.captured_queries)
+    # The search probe, and the fuzzy lookup after a typo, run once for both the validators and the page.
+    assert count_queries(client, 'get', '/api/rooms/?search=Yellow&count=0') == 4
+    assert count_queries(client, 'get', '/api/rooms/?search=Yelow&count=0') == 5
+
+
+"""Testing async read endpoints"""
+
+@pytest.mark.django_db
+def test_async_reads_match_viewsets(client, user, simple_user, room, room_simple_user, reservation, reservation2):
+    Room.objects.bulk_create([Room(name=f'Room {i}', room_manager=user) for i in range(25)])
+    paths = [
+        '/rooms/',
+        '/rooms/?page_size=5&count=0',
+        '/rooms/?search=grey',
+        f'/rooms/{room.id}/',
+        f'/rooms/{room.id}/availability/?from=2022-09-20&to=2022-09-30',
+        f'/rooms/{room.id}/reservations/',
+        f'/rooms/{room.id}/reservations/{reservation.id}/',
+        f'/rooms/{room.id}/reservations/{reservation2.id}/',
+    ]
+    for owner in (user, simple_user):
+        client.force_login(owner)
+        for path in paths:
+            expected = client.get(f'/api{path}')
+            response = client.get(f'/api/async{path}')
+            assert response.status_code == expected.status_code == status.HTTP_200_OK
+            assert json.loads(response.content) == json.loads(expected.content.decode().replace('/api/', '/api/async/'))
+    next_page = client.get('/api/async/rooms/?page_size=5').json()['next']
+    assert client.get(next_page).json()['results'][0]['pk'] == Room.objects.order_by('id')[5].pk
+
+
+@pytest.mark.django_db
+def test_async_reads_errors(client, user, room):
+    assert client.get('/api/async/rooms/').status_code == status.HTTP_403_FORBIDDEN
+    client.force_login(user)
+    assert client.get(f'/api/async/rooms/{room.id + 1}/').status_code == status.HTTP_404_NOT_FOUND
+    assert client.get(f'/api/async/rooms/{room.id + 1}/reservations/').status_code == status.HTTP_404_NOT_FOUND
+    assert client.get('/api/async/rooms/', {'cursor': 'garbage'}).status_code == status.HTTP_404_NOT_FOUND
+    response = client.get(f'/api/async/rooms/{room.id}/availability/', {'from': '2022-09-30', 'to': '2022-09-01'})
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert client.post('/api/async/rooms/').status_code == status.HTTP_405_METHOD_NOT_ALLOWED
+
+
+"""Testing background jobs"""
+
+@pytest.fixture
+def job_subscribers(monkeypatch):
+    """Subscribers registered in a test are dropped after it."""
+    monkeypatch.setattr(jobs, 'subscribers', {event: dict(handlers) for event, handlers in jobs.subscribers.items()})
+    return jobs.subscribers
+
+
+def run_due_jobs():
+    for job in jobs.claim('test', 100):
+        jobs.execute(job)
+
+
+@pytest.mark.django_db
+def test_status_change_queues_jobs(client, user, room, reservation, django_capture_on_commit_callbacks):
+    user.email = 'gosia@example.com'
+    user.save()
+    client.force_login(user)
+    with django_capture_on_commit_callbacks(execute=True):
+        response = client.post(f"/api/rooms/{room.id}/reservations/{reservation.id}/confirm/",
+                               {'reservation_status': 1}, format='json')
+    assert response.status_code == status.HTTP_200_OK
+    assert mail.outbox == []
+    assert set(Job.objects.values_list('handler', flat=True)) == \
+        {'rooms_api.handlers.audit_status_change', 'rooms_api.handlers.notify_owner'}
+    run_due_jobs()
+    assert set(Job.objects.values_list('status', flat=True)) == {Job.DONE}
+    assert [message.to for message in mail.outbox] == [['gosia@example.com']]
+
+
+@pytest.mark.django_db
+def test_status_change_latency_flat(client, user, room, reservation, job_subscribers,
+                                    django_capture_on_commit_callbacks):
+    """Request cost does not grow with the number or the speed of the subscribers."""
+    client.force_login(user)
+    url = f"/api/rooms/{room.id}/reservations/{reservation.id}/cancel/"
+
+    def cancel():
+        Reservation.objects.filter(pk=reservation.pk).update(reservation_status=0)
+        with CaptureQueriesContext(connection) as queries, django_capture_on_commit_callbacks(execute=True):
+            start = time.perf_counter()
+            response = client.post(url, {'reservation_status': 2}, format='json')
+            elapsed = time.perf_counter() - start
+        assert response.status_code == status.HTTP_200_OK
+        return len(queries), elapsed
+
+    baseline, _ = cancel()
+    for number in range(10):
+        jobs.subscriber(STATUS_CHANGED, name=f'slow-{number}')(lambda **payload: time.sleep(0.5))
+    queries, elapsed = cancel()
+    assert queries == baseline
+    assert elapsed < 0.5
+    assert Job.objects.filter(handler__startswith='slow-').count() == 10
+
+
+@pytest.mark.django_db
+def test_job_retries_with_backoff(settings, job_subscribers, django_capture_on_commit_callbacks):
+    settings.ROOMS_API_JOB_BACKOFF = 10
+    calls = []
+
+    @jobs.subscriber('test.event', name='flaky', max_attempts=2)
+    def flaky(value):
+        calls.append(value)
+        raise RuntimeError('down')
+
+    with freeze_time('2030-01-01 12:00:00'):
+        with django_capture_on_commit_callbacks(execute=True):
+            jobs.publish('test.event', {'value': 1})
+        run_due_jobs()
+        job = Job.objects.get()
+        assert (job.status, job.attempts, job.last_error) == (Job.QUEUED, 1, 'RuntimeError: down')
+        assert job.run_at == timezone.now() + datetime.timedelta(seconds=10)
+        run_due_jobs()
+        assert calls == [1]
+    with freeze_time('2030-01-01 12:00:10'):
+        run_due_jobs()
+    job.refresh_from_db()
+    assert (job.status, job.attempts, calls) == (Job.FAILED, 2, [1, 1])
+
+
+@pytest.mark.django_db
+def test_job_idempotency_key(job_subscribers, django_capture_on_commit_callbacks):
+    calls = []
+    jobs.subscriber('test.event', name='once')(lambda value: calls.append(value))
+    with django_capture_on_commit_callbacks(execute=True):
+        jobs.publish('test.event', {'value': 1}, key='k')
+        jobs.publish('test.event', {'value': 1}, key='k')
+        jobs.publish('test.event', {'value': 2})
+    run_due_jobs()
+    assert sorted(calls) == [1, 2]
+    assert Job.objects.get(idempotency_key='k:once').status == Job.DONE
+
+
+@pytest.mark.django_db(transaction=True)
+def test_runworker_burst(job_subscribers):
+    calls = []
+    jobs.subscriber('test.event', name='collect')(lambda value: calls.append(value))
+    jobs.publish_many('test.event', [({'value': value}, None) for value in range(20)])
+    call_command('runworker', '--burst', '--threads', '4', '--batch', '5', stdout=io.StringIO())
+    assert sorted(calls) == list(range(20))
+    assert set(Job.objects.values_list('status', flat=True)) == {Job.DONE}
+
+
+@pytest.mark.django_db
+def test_worker_requeues_stale_jobs_periodically():
+    now = timezone.now()
+    worker = jobs.Worker(maintenance_interval=60)
+    worker.maintain()
+    job = Job.objects.create(event='test.event', handler='lost', run_at=now, status=Job.RUNNING, locked_by='dead',
+                             locked_at=now - jobs.STALE_AFTER - datetime.timedelta(seconds=1))
+    worker.maintain()
+    job.refresh_from_db()
+    assert job.status == Job.RUNNING
+    worker.maintained_at -= 60
+    worker.maintain()
+    job.refresh_from_db()
+    assert (job.status, job.locked_by) == (Job.QUEUED, '')
+
+
+@pytest.mark.django_db
+def test_runworker_purges_done_jobs(settings):
+    now = timezone.now()
+    created = Job.objects.bulk_create([Job(event='test.event', handler='done', run_at=now, status=state)
+                                       for state in (Job.DONE, Job.DONE, Job.DONE, Job.FAILED)])
+    Job.objects.filter(pk__in=[job.pk for job in created[1:]]).update(updated_at=now - datetime.timedelta(days=3))
+    settings.ROOMS_API_JOB_KEEP_DONE_DAYS = None
+    call_command('runworker', '--burst', stdout=io.StringIO())
+    assert Job.objects.count() == 4
+    call_command('runworker', '--burst', '--keep-done-days', '4', stdout=io.StringIO())
+    assert Job.objects.count() == 4
+    settings.ROOMS_API_JOB_KEEP_DONE_DAYS = 2
+    with CaptureQueriesContext(connection) as context:
+        assert jobs.purge_done(jobs.keep_done(), batch_size=1) == 2
+    assert len(context.captured_queries) == 5
+    assert set(Job.objects.values_list('pk', flat=True)) == {created[0].pk, created[3].pk}
+    call_command('runworker', '--burst', '--keep-done-days', '0', stdout=io.StringIO())
+    assert list(Job.objects.values_list('status', flat=True)) == [Job.FAILED]
+
+
+"""Testing room rating statistics"""
+
+@freeze_time('2022-09-28 00:00:00')
+@pytest.mark.django_db
+def test_finish_updates_room_ratings(client, user, room, reservation2):
+    Reservation.objects.create(training='Old', date_from='2022-09-01', date_to='2022-09-01', owner=user, room=room,
+                               reservation_status=1)
+    client.force_authenticate(user)
+    for item, rating in zip(Reservation.objects.order_by('id'), [4.0, 2.0]):
+        response = client.post(f"/api/rooms/{room.id}/reservations/{item.id}/finish/", {'rating': rating},
+                               format='json')
+        assert response.status_code == status.HTTP_200_OK
+    response = client.get(f"/api/rooms/{room.id}/")
+    assert response.data['rating_count'] == 2
+    assert response.data['rating_average'] == 3.0
+    assert response.data['rating_histogram'] == {'1': 0, '2': 1, '3': 0, '4': 1, '5': 0}
+    assert ratings.reconcile() == []
+
+
+@pytest.mark.django_db
+def test_ordering_by_rating_RoomViewSet(client, user):
+    rooms = Room.objects.bulk_create([Room(name=f'Room {i}', room_manager=user) for i in range(7)])
+    for room, average in zip(rooms, [3.0, 5.0, 1.0, 3.0, 0.0, 5.0, 2.0]):
+        Room.objects.filter(pk=room.pk).update(rating_average=average)
+    client.force_authenticate(user)
+    names, url = [], '/api/rooms/?ordering=-rating_average&page_size=2'
+    while url:
+        response = client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        names += [item['name'] for item in response.data['results']]
+        url = response.data['next']
+    assert names == ['Room 5', 'Room 1', 'Room 3', 'Room 0', 'Room 6', 'Room 2', 'Room 4']
+    response = client.get('/api/rooms/?ordering=rating_average,name&page_size=3')
+    assert [item['name'] for item in response.data['results']] == ['Room 4', 'Room 2', 'Room 6']
+    response = client.get(response.data['next'])
+    assert [item['name'] for item in response.data['results']] == ['Room 0', 'Room 3', 'Room 1']
+
+
+@pytest.mark.django_db
+def test_reconcile_ratings_command(room, room_simple_user, reservation_with_rating, user):
+    Reservation.objects.create(training='Rated', date_from='2022-09-01', date_to='2022-09-01', owner=user,
+                               room=room, reservation_status=1, rating=5.0)
+    Room.objects.filter(pk=room_simple_user.pk).update(rating_count=3, rating_sum=9, rating_average=3, rated_3=3)
+    out = io.StringIO()
+    call_command('reconcile_ratings', '--dry-run', stdout=out)
+    assert out.getvalue().startswith('2 rooms would be fixed')
+    call_command('reconcile_ratings', stdout=io.StringIO())
+    room.refresh_from_db()
+    room_simple_user.refresh_from_db()
+    assert (room.rating_count, room.rating_average, room.rating_histogram) == \
+        (2, 3.0, {'1': 1, '2': 0, '3': 0, '4': 0, '5': 1})
+    assert (room_simple_user.rating_count, room_simple_user.rating_average, room_simple_user.rated_3) == (0, 0, 0)
+    assert ratings.reconcile() == []
+
+
+"""Testing request metrics"""
+
+@pytest.fixture
+def fresh_metrics():
+    metrics.registry.reset()
+    yield metrics.registry
+    metrics.registry.reset()
+
+
+@pytest.mark.django_db
+def test_metrics_endpoint(client, user, room, reservation, settings, fresh_metrics):
+    settings.ROOMS_METRICS_SAMPLE_RATE = 1
+    client.force_login(user)
+    queries = count_queries(client, 'get', f'/api/rooms/{room.id}/reservations/')
+    client.post(f'/api/rooms/{room.id}/reservations/{reservation.id}/confirm/', {'reservation_status': 1},
+                format='json')
+    response = client.get('/metrics')
+    assert response.status_code == status.HTTP_200_OK
+    assert response['Content-Type'].startswith('text/plain; version=0.0.4')
+    text = response.content.decode()
+    assert '# TYPE rooms_http_request_duration_seconds histogram' in text
+    assert 'rooms_http_requests_total{route="reservations-list",method="GET",status="200"} 1' in text
+    assert 'rooms_http_requests_total{route="reservations-confirm",method="POST",status="200"} 1' in text
+    assert 'rooms_http_request_duration_seconds_count{route="reservations-confirm",method="POST"} 1' in text
+    assert f'rooms_db_queries_sum{{route="reservations-list"}} {queries}' in text
+    assert 'rooms_serializer_duration_seconds_count{route="reservations-list"} 1' in text
+
+
+@pytest.mark.django_db
+def test_metrics_serializer_time_of_detail_views(client, user, room, reservation, settings, fresh_metrics):
+    settings.ROOMS_METRICS_SAMPLE_RATE = 1
+    client.force_login(user)
+    client.get(f'/api/rooms/{room.id}/')
+    client.get(f'/api/rooms/{room.id}/reservations/{reservation.id}/')
+    samples = dict(line.rsplit(' ', 1) for line in client.get('/metrics').content.decode().splitlines()
+                   if line.startswith('rooms_serializer_duration_seconds_sum'))
+    assert float(samples['rooms_serializer_duration_seconds_sum{route="rooms-detail"}']) > 0
+    assert float(samples['rooms_serializer_duration_seconds_sum{route="reservations-detail"}']) > 0
+
+
+@pytest.mark.django_db
+def test_metrics_sampling(client, user, room, settings, fresh_metrics):
+    settings.ROOMS_METRICS_SAMPLE_RATE = 0
+    client.force_login(user)
+    for _ in range(3):
+        client.get(f'/api/rooms/{room.id}/')
+    text = client.get('/metrics').content.decode()
+    assert 'rooms_http_request_duration_seconds_count{route="rooms-detail",method="GET"} 3' in text
+    assert 'rooms_db_queries_count' not in text
+
+
+@pytest.mark.django_db
+def test_metrics_local_only(client, settings):
+    assert client.get('/metrics', REMOTE_ADDR='10.0.0.1').status_code == status.HTTP_404_NOT_FOUND
+    settings.ROOMS_METRICS_ALLOWED_IPS = ['10.0.0.1']
+    assert client.get('/metrics', REMOTE_ADDR='10.0.0.1').status_code == status.HTTP_200_OK
+
+
+@pytest.mark.django_db
+def test_metrics_token(client, settings):
+    settings.ROOMS_METRICS_ALLOWED_IPS = []
+    assert client.get('/metrics').status_code == status.HTTP_404_NOT_FOUND
+    assert client.get('/metrics', HTTP_AUTHORIZATION='Bearer ').status_code == status.HTTP_404_NOT_FOUND
+    settings.ROOMS_METRICS_TOKEN = 's3cret'
+    assert client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code == status.HTTP_404_NOT_FOUND
+    assert client.get('/metrics', HTTP_AUTHORIZATION='Bearer s3cret').status_code == status.HTTP_200_OK
+
+
+def test_metrics_histogram_exposition():
+    histogram = metrics.Histogram('latency', 'Latency.', ('route',), (0.1, 1))
+    for value in (0.05, 0.1, 0.5, 3):
+        histogram.observe(('a"b',), value)
+    assert list(histogram.samples()) == [
+        'latency_bucket{route="a\\"b",le="0.1"} 2',
+        'latency_bucket{route="a\\"b",le="1"} 3',
+        'latency_bucket{route="a\\"b",le="+Inf"} 4',
+        'latency_sum{route="a\\"b"} 3.65',
+        'latency_count{route="a\\"b"} 4',
+    ]
+
+
+"""Testing the query inspector"""
+
+def test_query_template():
+    assert query_inspector.template_of(
+        'SELECT "a"."id" FROM "a"  WHERE ("a"."id" IN (%s, %s, %s) AND "a"."name" = \'x\' AND "a"."n" > 10)') == \
+        'SELECT "a"."id" FROM "a" WHERE ("a"."id" IN (...) AND "a"."name" = ? AND "a"."n" > ?)'
+
+
+@pytest.mark.allow_repeated_queries
+@pytest.mark.django_db
+def test_query_inspector_reports_serializer_field(client, user, monkeypatch, caplog):
+    managers = User.objects.bulk_create([User(username=f'manager{i}') for i in range(7)])
+    Room.objects.bulk_create([Room(name=f'Room {i}', room_manager=manager) for i, manager in enumerate(managers)])
+    monkeypatch.setitem(RoomSerializer._declared_fields, 'manager_name',
+                        serializers.ReadOnlyField(source='room_manager.username'))
+    monkeypatch.setattr(RoomSerializer.Meta, 'fields', [*RoomSerializer.Meta.fields, 'manager_name'])
+    client.force_authenticate(user)
+    reports = []
+    with query_inspector.listening(reports.append):
+        response = client.get('/api/rooms/available/?date_from=2030-01-01&date_to=2030-01-02')
+    assert response.status_code == status.HTTP_200_OK
+    assert [(report['view'], report['route'], report['field'], report['count']) for report in reports] == \
+        [('RoomViewSet.available', 'rooms-available', 'RoomSerializer.manager_name', 7)]
+    assert 'FROM "auth_user" WHERE "auth_user"."id" = ? LIMIT ?' in reports[0]['template']
+    assert 'RoomViewSet.available runs 7 times in rooms-available' in caplog.text
+
+
+@pytest.mark.django_db
+def test_query_inspector_slow_query_log(settings, caplog):
+    settings.ROOMS_API_SLOW_QUERY_MS = 10_000
+    with query_inspector.inspect(view='test', slow_query_ms=0):
+        Room.objects.filter(name='x').exists()
+    record = json.loads(next(r.message for r in caplog.records if r.name == 'rooms_api.slow_queries'))
+    assert record['view'] == 'test'
+    assert record['params'] == ['1', 'x']
+    assert record['duration_ms'] >= 0
+
+
+@pytest.mark.allow_repeated_queries
+@pytest.mark.django_db
+def test_query_inspector_zero_repeat_limit():
+    with query_inspector.inspect(repeat_limit=0) as inspector:
+        Room.objects.exists()
+    assert [item['count'] for item in inspector.repeated()] == [1]
+
+
+def test_query_inspector_passes_async_requests_through(settings):
+    settings.ROOMS_API_QUERY_INSPECTOR = True
+
+    async def view(request):
+        return 'response'
+
+    assert query_inspector.query_inspector_middleware(view) is view
+    assert query_inspector.query_inspector_middleware.async_capable
+
+
+"""Testing benchmark datasets"""
+
+@pytest.mark.django_db
+def test_seed_bench_command():
+    out = io.StringIO()
+    call_command('seed_bench', '--users', '20', '--rooms', '30', '--reservations', '3000', '--batch-size', '500',
+                 stdout=out)
+    assert out.getvalue().startswith('Created 20 users, 30 rooms and 3,000 reservations')
+    assert Reservation.objects.count() == 3000
+    statuses = dict(Reservation.objects.values_list('reservation_status').annotate(Count('id')))
+    assert set(statuses) == {0, 1, 2, 3} and statuses[1] > 1500
+    today = datetime.date.today()
+    assert not Reservation.objects.filter(date_to__gte=today, rating__isnull=False).exists()
+    assert ratings.reconcile() == []
+    window = Reservation.objects.aggregate(first=Min('date_from'), last=Max('date_to'))
+    for room in Room.objects.all():
+        confirmed = sorted(Reservation.objects.filter(room=room, reservation_status=1)
+                           .values_list('date_from', 'date_to'))
+        assert all(previous[1] < following[0] for previous, following in zip(confirmed, confirmed[1:]))
+        seeded = occupancy.availability([room.pk], window['first'], window['last'])[room.pk]
+        occupancy.rebuild(room.pk)
+        assert occupancy.availability([room.pk], window['first'], window['last'])[room.pk] == seeded
+    assert set(Room.objects.values_list('name', flat=True)) == set(
+        name for name, in Room.objects.extra(tables=[search.SEARCH_TABLE], where=[
+            f'{search.SEARCH_TABLE}.rowid = rooms_api_room.id']).values_list('name'))
+
+
+"""Testing reservation import and export"""
+
+def transfer_rows(user, simple_user, room, room_simple_user):
+    day = datetime.date(2022, 3, 1)
+    Reservation.objects.bulk_create([
+        Reservation(room=room, owner=user, date_from=day, date_to=day + datetime.timedelta(days=2),
+                    reservation_status=1, rating=4.0, training='Sales, "advanced"', comment='Line one\nline two'),
+        Reservation(room=room, owner=simple_user, date_from=day, date_to=day, reservation_status=2),
+        Reservation(room=room_simple_user, owner=user, date_from=day + datetime.timedelta(days=5),
+                    date_to=day + datetime.timedelta(days=6), reservation_status=1, rating=2.0),
+        Reservation(room=room_simple_user, owner=simple_user, date_from=day + datetime.timedelta(days=9),
+                    date_to=day + datetime.timedelta(days=9)),
+    ])
+    return [{key: value for key, value in row.items() if key != 'id'} for row in transfer.export_rows()]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('file_format', ['csv', 'jsonl'])
+def test_export_import_round_trip(file_format, tmp_path, user, simple_user, room, room_simple_user):
+    exported = transfer_rows(user, simple_user, room, room_simple_user)
+    path = tmp_path / f'reservations.{file_format}'
+    call_command('export_reservations', str(path), '--chunk-size', '3', stdout=io.StringIO())
+    Reservation.objects.all().delete()
+    ratings.reconcile()
+
+    out = io.StringIO()
+    call_command('import_reservations', str(path), '--chunk-size', '3', stdout=out, stderr=io.StringIO())
+    assert out.getvalue().startswith('Imported 4 reservations, 0 rows failed')
+    assert [{key: value for key, value in row.items() if key != 'id'} for row in transfer.export_rows()] == exported
+    assert ratings.reconcile() == []
+    room.refresh_from_db()
+    assert (room.rating_count, room.rating_average) == (1, 4.0)
+    period = (datetime.date(2022, 3, 1), datetime.date(2022, 3, 10))
+    imported = occupancy.availability([room.pk, room_simple_user.pk], *period)
+    for pk in (room.pk, room_simple_user.pk):
+        occupancy.rebuild(pk)
+    assert occupancy.availability([room.pk, room_simple_user.pk], *period) == imported
+
+
+@pytest.mark.django_db
+def test_import_reports_invalid_and_conflicting_rows(user, room, reservation):
+    Reservation.objects.filter(pk=reservation.pk).update(reservation_status=1)
+    row = {'room': room.name, 'owner': user.username, 'date_from': '2022-10-01', 'date_to': '2022-10-01',
+           'reservation_status': 1}
+    lines = [
+        json.dumps(row),
+        'not json',
+        json.dumps({**row, 'room': 'Nowhere'}),
+        json.dumps({**row, 'owner': 'nobody', 'date_from': '2022-10-02', 'date_to': '2022-10-02'}),
+        json.dumps({**row, 'date_from': '2022-10-05', 'date_to': '2022-10-04'}),
+        json.dumps({**row, 'reservation_status': 7, 'rating': 'good'}),
+        json.dumps({**row, 'date_from': '2022-09-24', 'date_to': '2022-09-26'}),
+        '',
+        json.dumps({**row, 'date_from': '2022-09-30', 'date_to': '2022-10-02'}),
+        json.dumps({**row, 'reservation_status': 2}),
+    ]
+    result = transfer.import_rows(transfer.decode('jsonl', lines), chunk_size=4)
+    assert result['created'] == 2 and result['failed'] == 7
+    errors = {error['line']: error['errors'] for error in result['errors']}
+    assert errors[2] == {'non_field_errors': ['Expected a JSON object.']}
+    assert errors[3] == {'room': ['Room "Nowhere" does not exist.']}
+    assert errors[4] == {'owner': ['User "nobody" does not exist.']}
+    assert errors[5] == {'non_field_errors': ['Finish must occur after start']}
+    assert set(errors[6]) == {'reservation_status', 'rating'}
+    # Against the calendar, and against a row imported by an earlier chunk.
+    assert errors[7] == errors[9] == {'non_field_errors': ['Room is reserved at this term']}
+    assert set(Reservation.objects.filter(room=room).values_list('date_from', 'reservation_status')) == {
+        (datetime.date(2022, 9, 25), 1), (datetime.date(2022, 10, 1), 1), (datetime.date(2022, 10, 1), 2)}
+    assert occupancy.availability([room.pk], datetime.date(2022, 10, 1), datetime.date(2022, 10, 1))[room.pk][
+        'free_days'] == 0
+
+
+@pytest.mark.django_db
+def test_transfer_endpoints(client, superuser, user, simple_user, room, room_simple_user):
+    exported = transfer_rows(user, simple_user, room, room_simple_user)
+    client.force_authenticate(user)
+    assert client.get('/api/reservations.csv').status_code == status.HTTP_403_FORBIDDEN
+    client.force_authenticate(superuser)
+    response = client.get('/api/reservations.jsonl', {'room': room.pk}, HTTP_ACCEPT='application/x-ndjson')
+    assert response.status_code == status.HTTP_200_OK
+    assert response.streaming and response['Content-Type'] == 'application/x-ndjson'
+    body = b''.join(response.streaming_content)
+    assert [json.loads(line)['room'] for line in body.splitlines()] == ['Yellow', 'Yellow']
+
+    response = client.get('/api/reservations.csv')
+    body = b''.join(response.streaming_content)
+    Reservation.objects.all().delete()
+    response = client.generic('POST', '/api/reservations.csv', body, content_type='text/csv')
+    assert response.status_code == status.HTTP_200_OK
+    assert response.json() == {'created': 4, 'failed': 0, 'errors': []}
+    assert [{key: value for key, value in row.items() if key != 'id'} for row in transfer.export_rows()] == exported
+
+
+"""Testing calendar feeds"""
+
+def feed_events(body):
+    events, current = [], None
+    for line in body.decode().replace('\r\n ', '').split('\r\n'):
+        if line == 'BEGIN:VEVENT':
+            current = {}
+        elif line == 'END:VEVENT':
+            events.append(current)
+            current = None
+        elif current is not None:
+            name, value = line.split(':', 1)
+            current[name] = value
+    return events
+
+
+def test_ical_fold_and_escape():
+    line = 'SUMMARY:' + ical.escape('Zażółć gęślą jaźń; ' * 10 + 'a,b\nc')
+    folded = ical.fold(line)
+    assert all(len(part.encode()) <= 75 for part in folded.split('\r\n'))
+    assert folded.replace('\r\n ', '') == line
+    assert line.endswith('a\\,b\\nc') and '\\;' in line
+
+
+@pytest.mark.django_db
+def test_room_calendar_feed(client, user, simple_user, room, reservation):
+    Reservation.objects.filter(pk=reservation.pk).update(reservation_status=1, training='First aid, basics')
+    waiting = Reservation.objects.create(room=room, owner=user, date_from='2022-09-26', date_to='2022-09-26')
+    url = f'/api/rooms/{room.pk}/calendar.ics'
+    assert client.get(url).status_code == status.HTTP_403_FORBIDDEN
+    client.force_authenticate(simple_user)
+    response = client.get(url, HTTP_ACCEPT='text/calendar')
+    assert response.status_code == status.HTTP_200_OK
+    assert response['Content-Type'] == 'text/calendar; charset=utf-8'
+    assert response.content.startswith(b'BEGIN:VCALENDAR\r\nVERSION:2.0\r\n')
+    events = feed_events(response.content)
+    assert datetime.datetime.strptime(events[0].pop('DTSTAMP'), '%Y%m%dT%H%M%SZ')
+    assert events == [{
+        'UID': f'reservation-{reservation.pk}@rooms-app',
+        'DTSTART;VALUE=DATE': '20220925',
+        'DTEND;VALUE=DATE': '20220926',
+        'SUMMARY': 'First aid\\, basics',
+        'LOCATION': 'Yellow',
+    }]
+    etag = response['ETag']
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == status.HTTP_304_NOT_MODIFIED
+    stats.reset()
+    assert client.get(url).content == response.content
+    assert stats.snapshot()['hits'] == 1
+
+    waiting.reservation_status = 1
+    waiting.save()
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_200_OK
+    assert [event['DTSTART;VALUE=DATE'] for event in feed_events(response.content)] == ['20220925', '20220926']
+    assert client.get('/api/rooms/999/calendar.ics').status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_owner_calendar_feed(client, superuser, user, simple_user, room, room_simple_user, reservation):
+    other = Reservation.objects.create(room=room_simple_user, owner=user, date_from='2022-10-01',
+                                       date_to='2022-10-03', reservation_status=1)
+    Reservation.objects.create(room=room, owner=simple_user, date_from='2022-10-05', date_to='2022-10-05',
+                               reservation_status=1)
+    url = f'/api/owners/{user.pk}/calendar.ics'
+    client.force_authenticate(simple_user)
+    assert client.get(url).status_code == status.HTTP_403_FORBIDDEN
+    client.force_authenticate(superuser)
+    assert client.get(url).status_code == status.HTTP_200_OK
+    client.force_authenticate(user)
+    response = client.get(url)
+    assert b'X-WR-CALNAME:Reservations of gosia\r\n' in response.content
+    assert [(event['UID'], event['LOCATION']) for event in feed_events(response.content)] == [
+        (f'reservation-{other.pk}@rooms-app', 'Grey')]
+    etag = response['ETag']
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == status.HTTP_304_NOT_MODIFIED
+    with CaptureQueriesContext(connection) as context:
+        assert client.get(url).status_code == status.HTTP_200_OK
+    # The two validator queries, shared by the ETag and the cached feed.
+    assert len(context.captured_queries) == 2
+
+    room_simple_user.name = 'Blue'
+    room_simple_user.save()
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_200_OK
+    assert feed_events(response.content)[0]['LOCATION'] == 'Blue'
+    etag = response['ETag']
+    client.post(f'/api/rooms/{room_simple_user.pk}/reservations/{other.pk}/cancel/', {'reservation_status': 2},
+                format='json')
+    response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert response.status_code == status.HTTP_200_OK and feed_events(response.content) == []
+
+
+"""Testing recurring reservations"""
+
+SERIES = {'training': 'Yoga', 'date_from': '2022-09-05', 'date_to': '2022-09-05', 'until': '2022-09-30',
+          'weekdays': ['MO', 'WE']}
+SERIES_DAYS = ['2022-09-05', '2022-09-07', '2022-09-12', '2022-09-14', '2022-09-19', '2022-09-21', '2022-09-26',
+               '2022-09-28']
+
+
+def test_recurrence_occurrences():
+    series = Recurrence(date_from=datetime.date(2022, 9, 7), date_to=datetime.date(2022, 9, 8),
+                        until=datetime.date(2022, 12, 31), weekdays=recurrence.weekday_mask(['WE', 'FR']),
+                        interval=2)
+    days = [date_from.isoformat() for date_from, _ in recurrence.occurrences(series)]
+    assert days[:5] == ['2022-09-07', '2022-09-09', '2022-09-21', '2022-09-23', '2022-10-05']
+    assert days[-1] == '2022-12-30'
+    window = list(recurrence.occurrences(series, datetime.date(2022, 10, 6), datetime.date(2022, 10, 21)))
+    assert window == [(datetime.date(2022, 10, 7), datetime.date(2022, 10, 8)),
+                      (datetime.date(2022, 10, 19), datetime.date(2022, 10, 20)),
+                      (datetime.date(2022, 10, 21), datetime.date(2022, 10, 22))]
+    assert series.rule == 'FREQ=WEEKLY;INTERVAL=2;BYDAY=WE,FR;UNTIL=20221231'
+
+
+@freeze_time('2022-09-01 00:00:00')
+@pytest.mark.django_db
+def test_create_series_RecurrenceViewSet(client, user, simple_user, room):
+    Reservation.objects.create(room=room, owner=user, date_from='2022-09-14', date_to='2022-09-14',
+                               reservation_status=1)
+    client.force_authenticate(simple_user)
+    url = f'/api/rooms/{room.pk}/series/'
+    response = client.post(url, SERIES, format='json')
+    assert response.status_code == status.HTTP_400_BAD_REQUEST
+    assert response.data['conflicts'] == [datetime.date(2022, 9, 14)]
+    assert not Recurrence.objects.exists()
+
+    with CaptureQueriesContext(connection) as context:
+        response = client.post(url, {**SERIES, 'skip_conflicts': True}, format='json')
+    assert len(context.captured_queries) < 15
+    assert response.status_code == status.HTTP_201_CREATED
+    assert response.data['skipped'] == [datetime.date(2022, 9, 14)]
+    assert response.data['weekdays'] == ['MO', 'WE'] and response.data['owner'] == 'ktos'
+    series = Recurrence.objects.get(pk=response.data['pk'])
+    occurrences = series.occurrences.order_by('date_from')
+    assert [item.date_from.isoformat() for item in occurrences] == [day for day in SERIES_DAYS if day != '2022-09-14']
+    assert {(item.owner_id, item.training, item.reservation_status) for item in occurrences} == \
+           {(simple_user.pk, 'Yoga', 0)}
+    assert len({item.room_password for item in occurrences}) == 7
+    assert client.get(url).data['results'][0]['rule'] == 'FREQ=WEEKLY;INTERVAL=1;BYDAY=MO,WE;UNTIL=20220930'
+
+
+@freeze_time('2022-09-01 00:00:00')
+@pytest.mark.django_db
+def test_create_series_invalid_RecurrenceViewSet(client, user, room):
+    client.force_authenticate(user)
+    url = f'/api/rooms/{room.pk}/series/'
+    for data, field in [({'weekdays': ['TU']}, 'weekdays'),
+                        ({'weekdays': ['XX']}, 'weekdays'),
+                        ({'until': '2022-09-01'}, 'until'),
+                        ({'date_to': '2022-09-08'}, 'non_field_errors'),
+                        ({'interval': 0}, 'interval'),
+                        ({'until': '2040-12-31'}, 'non_field_errors')]:
+        response = client.post(url, {**SERIES, **data}, format='json')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST, data
+        assert field in response.data, data
+    assert client.post('/api/rooms/999/series/', SERIES, format='json').status_code == status.HTTP_404_NOT_FOUND
+
+
+@freeze_time('2022-09-15 00:00:00')
+@pytest.mark.django_db
+def test_confirm_and_cancel_series_RecurrenceViewSet(client, user, simple_user, room):
+    series = Recurrence(room=room, owner=simple_user, date_from=datetime.date(2022, 9, 5),
+                        date_to=datetime.date(2022, 9, 5), until=datetime.date(2022, 9, 30),
+                        weekdays=recurrence.weekday_mask(['MO', 'WE']))
+    recurrence.create_series(series)
+    Reservation.objects.create(room=room, owner=user, date_from='2022-09-21', date_to='2022-09-21',
+                               reservation_status=1)
+    url = f'/api/rooms/{room.pk}/series/{series.pk}/'
+    client.force_authenticate(simple_user)
+    assert client.post(url + 'confirm/', {}, format='json').status_code == status.HTTP_403_FORBIDDEN
+
+    client.force_authenticate(user)
+    response = client.post(url + 'confirm/', {'date': '2022-09-12'}, format='json')
+    assert [result['status'] for result in response.data['results']] == ['confirmed']
+    assert client.post(url + 'confirm/', {'date': '2022-09-13'}, format='json').status_code == \
+           status.HTTP_404_NOT_FOUND
+    with CaptureQueriesContext(connection) as context:
+        response = client.post(url + 'confirm/', {}, format='json')
+    assert len(context.captured_queries) < 15
+    assert [result.get('status') for result in response.data['results']] == \
+           ['confirmed', 'confirmed', 'confirmed', 'confirmed', None, 'confirmed', 'confirmed']
+    days = occupancy.availability([room.id], datetime.date(2022, 9, 5), datetime.date(2022, 9, 14))
+    assert days[room.id]['days'] == '1010000101'
+
+    client.force_authenticate(simple_user)
+    response = client.post(url + 'cancel/', {'date': '2022-09-26'}, format='json')
+    assert [result['status'] for result in response.data['results']] == ['cancelled']
+    response = client.post(url + 'cancel/', {}, format='json')
+    # Occurrences that started before today stay as they are.
+    assert [result['status'] for result in response.data['results']] == ['cancelled', 'cancelled', 'cancelled']
+    assert dict(series.occurrences.values_list('date_from', 'reservation_status')) == {
+        datetime.date(2022, 9, 5): 1, datetime.date(2022, 9, 7): 1, datetime.date(2022, 9, 12): 1,
+        datetime.date(2022, 9, 14): 1, datetime.date(2022, 9, 19): 2, datetime.date(2022, 9, 21): 2,
+        datetime.date(2022, 9, 26): 2, datetime.date(2022, 9, 28): 2}
+
+
+@pytest.mark.django_db
+def test_retrieve_series_window_RecurrenceViewSet(client, user, simple_user, room):
+    series = Recurrence(room=room, owner=user, date_from=datetime.date(2022, 9, 5),
+                        date_to=datetime.date(2022, 9, 5), until=datetime.date(2023, 9, 30),
+                        weekdays=recurrence.weekday_mask(['MO', 'WE']))
+    recurrence.create_series(series)
+    series.occurrences.filter(date_from='2022-09-14').delete()
+    url = f'/api/rooms/{room.pk}/series/{series.pk}/'
+    client.force_authenticate(simple_user)
+    response = client.get(url, {'from': '2022-09-12', 'to': '2022-09-19'})
+    assert response.status_code == status.HTTP_200_OK
+    assert [(item['date_from'], item['pk'] is None) for item in response.data['occurrences']] == \
+           [(datetime.date(2022, 9, 12), False), (datetime.date(2022, 9, 14), True),
+            (datetime.date(2022, 9, 19), False)]
+    assert len(client.get(url).data['occurrences']) == series.occurrences.count() + 1
+    assert client.get(url, {'from': 'soon'}).status_code == status.HTTP_400_BAD_REQUEST
+    assert client.get(f'/api/rooms/{room.pk}/series/999/').status_code == status.HTTP_404_NOT_FOUND
+
+
+"""Testing the reservation archive"""
+
+def days_ago(days):
+    return datetime.date.today() - datetime.timedelta(days=days)
+
+
+@pytest.fixture
+def history(room, user, simple_user):
+    """Reservations of ``room`` that ended 400 to 397 days ago, and two recent ones."""
+    old = [Reservation.objects.create(room=room, owner=owner, date_from=days_ago(days), date_to=days_ago(days),
+                                      reservation_status=status, rating=rating, training=f'Old {days}')
+           for days, status, owner, rating in [(400, 1, user, 4.0), (399, 2, simple_user, None),
+                                               (398, 3, simple_user, None), (397, 1, simple_user, None)]]
+    recent = [Reservation.objects.create(room=room, owner=user, date_from=days_ago(days), date_to=days_ago(days),
+                                         reservation_status=1, training=f'Recent {days}') for days in (10, -5)]
+    ratings.reconcile()
+    return old, recent
+
+
+@pytest.mark.django_db
+def test_archive_reservations_command(room, user, history):
+    old, recent = history
+    room.refresh_from_db()
+    version, days = room.reservations_version, occupancy.availability([room.pk], days_ago(400), days_ago(397))
+    out = io.StringIO()
+    call_command('archive_reservations', '--older-than', '30', '--dry-run', stdout=out)
+    assert out.getvalue().startswith('4 reservations ended before')
+    assert Reservation.objects.count() == 6
+
+    with CaptureQueriesContext(connection) as context:
+        call_command('archive_reservations', '--older-than', '30', '--batch-size', '3', stdout=out)
+    assert 'Archived 4 reservations' in out.getvalue()
+    # Two batches of one read, one copy, one delete and the room touches, then the read that finds nothing.
+    assert len(context.captured_queries) < 20
+    assert set(Reservation.objects.values_list('pk', flat=True)) == {item.pk for item in recent}
+    archived = {item.pk: item for item in ReservationArchive.objects.all()}
+    assert set(archived) == {item.pk for item in old}
+    for item in old:
+        copy = archived[item.pk]
+        assert (copy.room_id, copy.owner_id, copy.date_from, copy.date_to, copy.training, copy.reservation_status,
+                copy.rating, copy.room_password, copy.updated_at) == \
+               (item.room_id, item.owner_id, item.date_from, item.date_to, item.training, item.reservation_status,
+                item.rating, item.room_password, item.updated_at)
+        assert copy.archived_at is not None
+    room.refresh_from_db()
+    assert room.reservations_version > version
+    # Archived confirmed days stay booked, also after a rebuild, and archived ratings still count.
+    assert occupancy.availability([room.pk], days_ago(400), days_ago(397)) == days
+    occupancy.rebuild(room.pk)
+    assert occupancy.availability([room.pk], days_ago(400), days_ago(397)) == days
+    assert ratings.reconcile() == []
+    assert room.rating_count == 1
+
+    # Unrated confirmed reservations stay live while they can be rated.
+    call_command('archive_reservations', '--older-than', '5', stdout=out)
+    assert set(Reservation.objects.values_list('pk', flat=True)) == {item.pk for item in recent}
+    Reservation.objects.filter(pk=recent[0].pk).update(rating=5.0)
+    call_command('archive_reservations', '--older-than', '5', stdout=out)
+    assert Reservation.objects.get().pk == recent[1].pk
+    with pytest.raises(CommandError):
+        call_command('archive_reservations', '--older-than', '0', stdout=out)
+
+
+
+@pytest.mark.django_db
+def test_archive_keeps_big_ids(room, user):
+    reservation = Reservation.objects.create(pk=2 ** 31 + 1, room=room, owner=user, date_from=days_ago(400),
+                                             date_to=days_ago(400), reservation_status=2)
+    archive.archive(archive.cutoff(30))
+    assert ReservationArchive.objects.get().pk == reservation.pk
+    # Ids are copied verbatim, so the column must hold every Reservation id.
+    assert ReservationArchive._meta.pk.db_type(connection) == Reservation._meta.pk.rel_db_type(connection)
+
+@pytest.mark.django_db
+def test_list_and_retrieve_archived_ReservationViewSet(client, user, simple_user, room, history):
+    old, recent = history
+    archive.archive(archive.cutoff(30))
+    client.force_authenticate(user)
+    url = f'/api/rooms/{room.pk}/reservations/'
+    assert [item['pk'] for item in client.get(url).data['results']] == [item.pk for item in recent]
+
+    pks, page = [], client.get(url, {'archived': 1, 'page_size': 4, 'count': 1})
+    assert page.data['count'] == 6
+    while True:
+        pks.extend(item['pk'] for item in page.data['results'])
+        if not page.data['next']:
+            break
+        page = client.get(page.data['next'])
+    assert pks == [item.pk for item in old + recent]
+    previous = client.get(page.data['previous'])
+    assert [item['pk'] for item in previous.data['results']] == [item.pk for item in old]
+    assert previous.data['results'][0]['training'] == 'Old 400' and previous.data['results'][0]['owner'] == 'gosia'
+    streamed = json.loads(b''.join(client.get(url, {'archived': 1, 'stream': 1}).streaming_content))
+    assert [item['pk'] for item in streamed] == pks
+
+    response = client.get(f'{url}{old[0].pk}/')
+    assert response.status_code == status.HTTP_200_OK
+    assert response.data['room_password'] == old[0].room_password and response.data['rating'] == 4.0
+    assert client.get(f'{url}{old[0].pk}/', HTTP_IF_NONE_MATCH=response['ETag']).status_code == \
+           status.HTTP_304_NOT_MODIFIED
+    # Archived reservations are read-only.
+    assert client.post(f'{url}{old[0].pk}/finish/', {'rating': 5.0}, format='json').status_code == \
+           status.HTTP_404_NOT_FOUND
+    assert client.get(f'{url}9999/').status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_async_reads_archived(client, user, room, history):
+    old, recent = history
+    archive.archive(archive.cutoff(30))
+    client.force_login(user)
+    for path in [f'/rooms/{room.pk}/reservations/{old[0].pk}/', f'/rooms/{room.pk}/reservations/{old[1].pk}/',
+                 f'/rooms/{room.pk}/reservations/?archived=1&page_size=4&count=1']:
+        expected = client.get(f'/api{path}')
+        response = client.get(f'/api/async{path}')
+        assert response.status_code == expected.status_code == status.HTTP_200_OK
+        assert json.loads(response.content) == json.loads(expected.content.decode().replace('/api/', '/api/async/'))
+    page = client.get(f'/api/async/rooms/{room.pk}/reservations/', {'archived': 1, 'page_size': 4}).json()
+    assert [item['pk'] for item in client.get(page['next']).json()['results']] == [item.pk for item in recent]
+    assert client.get(f'/api/async/rooms/{room.pk}/reservations/9999/').status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.django_db
+def test_history_reads_union_archive(client, user, simple_user, room, history):
+    old, recent = history
+    series = Recurrence.objects.create(room=room, owner=user, date_from=days_ago(400), date_to=days_ago(400),
+                                       until=days_ago(300), weekdays=1 << days_ago(400).weekday())
+    Reservation.objects.filter(pk=old[0].pk).update(recurrence=series)
+    client.force_authenticate(user)
+    feed = client.get(f'/api/rooms/{room.pk}/calendar.ics')
+    owner_feed = client.get(f'/api/owners/{user.pk}/calendar.ics')
+    archive.archive(archive.cutoff(30))
+
+    response = client.get(f'/api/rooms/{room.pk}/calendar.ics', HTTP_IF_NONE_MATCH=feed['ETag'])
+    assert response.status_code == status.HTTP_200_OK
+    assert [event['UID'] for event in feed_events(response.content)] == \
+           [f'reservation-{item.pk}@rooms-app' for item in (old[0], old[3], *recent)]
+    response = client.get(f'/api/owners/{user.pk}/calendar.ics', HTTP_IF_NONE_MATCH=owner_feed['ETag'])
+    assert [event['UID'] for event in feed_events(response.content)] == \
+           [event['UID'] for event in feed_events(owner_feed.content)]
+    window = recurrence.window(series, days_ago(400), days_ago(390))
+    assert [(item['pk'], item['reservation_status']) for item in window] == [(old[0].pk, 1), (None, None)]
+
+
+@pytest.mark.django_db
+def test_export_archived(client, tmp_path, superuser, room, history):
+    old, recent = history
+    exported = list(transfer.export_rows())
+    archive.archive(archive.cutoff(30))
+    assert [row['id'] for row in transfer.export_rows()] == [item.pk for item in recent]
+    assert list(transfer.export_rows(history=ReservationArchive.objects.all(), chunk_size=2)) == exported
+
+    path = tmp_path / 'reservations.jsonl'
+    call_command('export_reservations', str(path), '--archived', '--room', str(room.pk), stdout=io.StringIO())
+    assert [json.loads(line) for line in path.read_text().splitlines()] == exported
+    client.force_authenticate(superuser)
+    response = client.get('/api/reservations.csv', {'archived': 1, 'room': room.pk})
+    rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+    assert [int(row['id']) for row in rows] == [item.pk for item in old + recent]
+    assert rows[0]['training'] == 'Old 400' and rows[0]['rating'] == '4.0'
@@ -0,0 +1,244 @@
+"""
+CSV and JSON Lines import and export of reservations.
+
+Both directions are generator pipelines, so memory use depends on the chunk
+size and not on the size of the file:
+
+    export   queryset.iterator() -> row dicts -> encoded lines -> byte chunks
+    import   text lines -> decoded rows -> chunks -> parsed, checked, bulk_create
+
+Rooms are named by ``Room.name`` and owners by username. Every import chunk
+resolves its names with one query per model, checks the confirmed terms
+against the calendar (``check_conflicts``) and against each other, and inserts
+the valid rows with one ``bulk_create`` in its own transaction. ``bulk_create``
+sends no signals, so the chunk updates what they maintain itself: occupancy
+bitsets, rating statistics, reservation versions and the read cache.
+
+``room_password`` is neither exported nor imported; imported reservations get
+a new one.
+"""
+import csv
+import itertools
+import json
+from collections import defaultdict
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from rooms_api import archive, cache, occupancy, ratings
+from rooms_api.availability import CONFIRMED, check_conflicts
+from rooms_api.booking import lock_room
+from rooms_api.bulk import RESERVED_MESSAGE, TermSet
+from rooms_api.conditional import touch_reservations
+from rooms_api.models import Reservation, Room, generate_passwords
+from rooms_api.renderers import dumps
+
+CHUNK_SIZE = 2000
+MAX_ERRORS = 100
+COLUMNS = ('id', 'room', 'owner', 'date_from', 'date_to', 'training', 'reservation_status', 'rating', 'comment')
+VALUE_FIELDS = ('date_from', 'date_to', 'training', 'reservation_status', 'rating', 'comment')
+CONTENT_TYPES = {'csv': 'text/csv; charset=utf-8', 'jsonl': 'application/x-ndjson'}
+FORMATS = tuple(CONTENT_TYPES)
+REQUIRED = 'This field is required.'
+
+
+def chunked(iterable, size):
+    """Yield lists of ``size`` items of ``iterable``; the last one may be shorter."""
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+def guess_format(path, default='csv'):
+    return 'jsonl' if str(path).endswith(('.jsonl', '.ndjson')) else default
+
+
+def export_rows(queryset=None, chunk_size=CHUNK_SIZE, history=None):
+    """
+    Yield a dict with ``COLUMNS`` per reservation, ordered by room and start.
+
+    ``history``, a ReservationArchive queryset, is exported together with the live rows.
+    """
+    queryset = Reservation.objects.all() if queryset is None else queryset
+    fields = ('id', 'room__name', 'owner__username', *VALUE_FIELDS, 'room_id')
+    if history is None:
+        rows = queryset.order_by().values_list(*fields)
+    else:
+        rows = archive.with_archive(queryset, history, *fields)
+    for row in rows.order_by('room_id', 'date_from', 'id').iterator(chunk_size=chunk_size):
+        pk, room, owner, date_from, date_to, training, reservation_status, rating, comment, _ = row
+        yield {
+            'id': pk,
+            'room': room,
+            'owner': owner,
+            'date_from': date_from.isoformat(),
+            'date_to': date_to.isoformat(),
+            'training': training,
+            'reservation_status': reservation_status,
+            'rating': rating,
+            'comment': comment,
+        }
+
+
+class Echo:
+    """``csv.writer`` target returning what is written instead of buffering it."""
+
+    def write(self, value):
+        return value
+
+
+def encode_csv(rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(COLUMNS).encode()
+    for row in rows:
+        yield writer.writerow([row[column] for column in COLUMNS]).encode()
+
+
+def encode_jsonl(rows):
+    for row in rows:
+        yield dumps(row) + b'\n'
+
+
+def decode_csv(lines):
+    """Yield ``(line number, row)`` of CSV text lines with a header row."""
+    reader = csv.DictReader(lines)
+    for row in reader:
+        yield reader.line_num, row
+
+
+def decode_jsonl(lines):
+    """Yield ``(line number, row)`` of JSON Lines; rows that are not valid JSON are None."""
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            yield number, json.loads(line)
+        except ValueError:
+            yield number, None
+
+
+ENCODERS = {'csv': encode_csv, 'jsonl': encode_jsonl}
+DECODERS = {'csv': decode_csv, 'jsonl': decode_jsonl}
+
+
+def export(file_format, queryset=None, chunk_size=CHUNK_SIZE, history=None):
+    """Yield the exported file as byte strings of ``chunk_size`` rows each."""
+    lines = ENCODERS[file_format](export_rows(queryset, chunk_size, history))
+    for chunk in chunked(lines, chunk_size):
+        yield b''.join(chunk)
+
+
+def decode(file_format, lines):
+    return DECODERS[file_format](lines)
+
+
+FIELDS = {name: Reservation._meta.get_field(name) for name in VALUE_FIELDS}
+
+
+def parse_row(row):
+    """
+    Return ``(room name, owner username, field values)`` of a decoded row.
+
+    Empty values take the model default or None. Raises ValidationError with
+    the messages by field.
+    """
+    if not isinstance(row, dict):
+        raise ValidationError({'non_field_errors': ['Expected a JSON object.']})
+    values, errors = {}, {}
+    for name in ('room', 'owner'):
+        if row.get(name) in (None, ''):
+            errors[name] = [REQUIRED]
+    for name, field in FIELDS.items():
+        value = row.get(name)
+        if value is None or value == '':
+            if field.has_default():
+                values[name] = field.get_default()
+            elif field.null:
+                values[name] = None
+            else:
+                errors[name] = [REQUIRED]
+            continue
+        try:
+            values[name] = field.clean(value, None)
+        except ValidationError as exc:
+            errors[name] = exc.messages
+    if not errors and values['date_from'] > values['date_to']:
+        errors['non_field_errors'] = ['Finish must occur after start']
+    if errors:
+        raise ValidationError(errors)
+    return str(row['room']), str(row['owner']), values
+
+
+def import_chunk(chunk):
+    """
+    Create the valid reservations of one chunk of ``(line, row)`` pairs in a transaction.
+
+    Returns the number created and the errors by line.
+    """
+    errors, parsed = [], []
+    for line, row in chunk:
+        try:
+            parsed.append((line, *parse_row(row)))
+        except ValidationError as exc:
+            errors.append({'line': line, 'errors': exc.message_dict})
+    rooms = dict(Room.objects.filter(name__in={room for _, room, _, _ in parsed}).values_list('name', 'id'))
+    owners = dict(User.objects.filter(username__in={owner for _, _, owner, _ in parsed})
+                  .values_list('username', 'id'))
+    by_room = defaultdict(list)
+    for line, room, owner, values in parsed:
+        missing = {}
+        if room not in rooms:
+            missing['room'] = [f'Room "{room}" does not exist.']
+        if owner not in owners:
+            missing['owner'] = [f'User "{owner}" does not exist.']
+        if missing:
+            errors.append({'line': line, 'errors': missing})
+        else:
+            by_room[rooms[room]].append((line, owners[owner], values))
+
+    new, confirmed, rated = [], defaultdict(list), defaultdict(list)
+    # The model default would read the system random source once per character.
+    passwords = iter(generate_passwords(len(parsed)))
+    with transaction.atomic():
+        # In id order, so two imports lock shared rooms in the same order.
+        for room_id in sorted(by_room):
+            lock_room(room_id)
+        for room_id, items in by_room.items():
+            terms = [(values['date_from'], values['date_to']) for _, _, values in items
+                     if values['reservation_status'] == CONFIRMED]
+            conflicts = iter(check_conflicts(room_id, terms))
+            claimed = TermSet()
+            for line, owner_id, values in items:
+                if values['reservation_status'] == CONFIRMED:
+                    if next(conflicts) or not claimed.claim(values['date_from'], values['date_to']):
+                        errors.append({'line': line, 'errors': {'non_field_errors': [RESERVED_MESSAGE]}})
+                        continue
+                    confirmed[room_id].append((values['date_from'], values['date_to']))
+                if values['rating'] is not None:
+                    rated[room_id].append(values['rating'])
+                new.append(Reservation(room_id=room_id, owner_id=owner_id, room_password=next(passwords),
+                                       **values))
+        Reservation.objects.bulk_create(new)
+        for room_id in by_room:
+            occupancy.mark_many(room_id, confirmed[room_id])
+            ratings.record_many(room_id, rated[room_id])
+            cache.invalidate_room(room_id)
+            touch_reservations(room_id)
+    errors.sort(key=lambda error: error['line'])
+    return len(new), errors
+
+
+def import_rows(rows, chunk_size=CHUNK_SIZE):
+    """
+    Create reservations from decoded ``(line, row)`` pairs, ``chunk_size`` rows at a time.
+
+    Invalid and conflicting rows are skipped. Returns the number of rows
+    created and failed and the first ``MAX_ERRORS`` errors.
+    """
+    result = {'created': 0, 'failed': 0, 'errors': []}
+    for chunk in chunked(rows, chunk_size):
+        created, errors = import_chunk(chunk)
+        result['created'] += created
+        result['failed'] += len(errors)
+        result['errors'].extend(errors[:MAX_ERRORS - len(result['errors'])])
+    return result
@@ -1,7 +1,7 @@
-from django.urls import path, include
+from django.urls import path, include, re_path
 from rest_framework.routers import SimpleRouter
 from rest_framework_nested import routers
-from rooms_api import views
+from rooms_api import async_views, views
 
 
 router = SimpleRouter()
@@ -16,9 +16,25 @@ rooms_router.register(
     views.ReservationViewSet,
     basename='reservations'
 )
+rooms_router.register(r'series', views.RecurrenceViewSet, basename='series')
+async_urlpatterns = [
+    path('rooms/', async_views.room_list, name='async-rooms-list'),
+    path('rooms/<int:pk>/', async_views.room_detail, name='async-rooms-detail'),
+    path('rooms/<int:pk>/availability/', async_views.room_availability, name='async-rooms-availability'),
+    path('rooms/<int:room_pk>/reservations/', async_views.reservation_list, name='async-reservations-list'),
+    path('rooms/<int:room_pk>/reservations/<int:pk>/', async_views.reservation_detail,
+         name='async-reservations-detail'),
+]
+
 app_name = 'rooms_api'
 
 urlpatterns = [
     path('', include(router.urls)),
     path('', include(rooms_router.urls)),
+    path('cache/stats/', views.CacheStatsView.as_view(), name='cache-stats'),
+    re_path(r'^reservations\.(?P<file_format>csv|jsonl)$', views.ReservationTransferView.as_view(),
+            name='reservations-transfer'),
+    path('rooms/<int:pk>/calendar.ics', views.RoomCalendarView.as_view(), name='rooms-calendar'),
+    path('owners/<int:pk>/calendar.ics', views.OwnerCalendarView.as_view(), name='owners-calendar'),
+    path('async/', include(async_urlpatterns)),
 ]
@@ -1,34 +1,118 @@
+import codecs
 import datetime
-from django.http import Http404
-from django.shortcuts import get_list_or_404
-from rest_framework import viewsets, status
+from django.db import transaction
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from rest_framework import mixins, viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.generics import get_object_or_404
-from rest_framework.permissions import IsAuthenticated
-from rest_framework.filters import SearchFilter
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
-from rooms_api.models import Reservation, Room
-from rooms_api.pagination import SmallSetPagination
-from rooms_api.permissions import IsOwnerOrReadOnly, RoomManagerPermission
-from rooms_api.serializers import ReservationSerializer, RoomSerializer, ConfirmationSerializer, \
-    FinishReservationSerializer, CancelSerializer, ReservationWithPasswordSerializer
+from rest_framework.serializers import ValidationError
+from rest_framework.views import APIView
+from rooms_api import archive, cache, ical, metrics, occupancy, ratings, recurrence, transfer
+from rooms_api.availability import available_rooms, has_conflict
+from rooms_api.booking import run_locked
+from rooms_api.bulk import RESERVED_MESSAGE, cancel_reservations, confirm_reservations, create_reservations
+from rooms_api.conditional import conditional, owner_calendar_state, reservation_list_state, reservation_state, \
+    room_calendar_state, room_list_state, room_state
+from rooms_api.filters import RoomOrderingFilter, RoomSearchFilter
+from rooms_api.handlers import publish_status_change
+from rooms_api.models import Recurrence, Reservation, ReservationArchive, Room
+from rooms_api.pagination import ReservationPagination, RoomPagination
+from rooms_api.permissions import IsOwnerOrReadOnly, IsSelfOrAdmin, RoomManagerPermission
+from rooms_api.serializers import AvailabilityQuerySerializer, BulkIdsSerializer, BulkReservationSerializer, \
+    ReservationSerializer, RoomSerializer, ConfirmationSerializer, \
+    FinishReservationSerializer, CancelSerializer, ReservationWithPasswordSerializer, OccurrenceSerializer, \
+    RecurrenceSerializer, WindowQuerySerializer
+from rooms_api.streaming import streaming_json_response, wants_stream
 
 
 class RoomViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
     queryset = Room.objects.all().order_by('id')
     serializer_class = RoomSerializer
-    pagination_class = SmallSetPagination
-    filter_backends = [SearchFilter]
+    pagination_class = RoomPagination
+    filter_backends = [RoomSearchFilter, RoomOrderingFilter]
     search_fields = ['name']
+    ordering_fields = ['name', 'rating_average', 'rating_count']
+
+    @conditional(room_list_state)
+    def list(self, request, *args, **kwargs):
+        def load():
+            queryset = self.filter_queryset(self.get_queryset())
+            rows = self.paginate_queryset(queryset.values(*RoomSerializer.value_fields))
+            with metrics.serializing():
+                results = [RoomSerializer.from_values(row) for row in rows]
+            return self.get_paginated_response(results).data
+
+        data = cache.cached(cache.request_parts(request), [cache.CATALOGUE], load)
+        return Response(data)
+
+    @conditional(room_state)
+    def retrieve(self, request, *args, **kwargs):
+        def load():
+            room = self.get_object()
+            with metrics.serializing():
+                return self.get_serializer(room).data
+
+        data = cache.cached(cache.request_parts(request), [cache.room_scope(kwargs.get('pk'))], load)
+        return Response(data)
+
+    def get_period(self, request, date_from='from', date_to='to'):
+        query = AvailabilityQuerySerializer(data={'date_from': request.query_params.get(date_from),
+                                                  'date_to': request.query_params.get(date_to)})
+        query.is_valid(raise_exception=True)
+        return query.validated_data['date_from'], query.validated_data['date_to']
+
+    @action(detail=False, methods=['get'])
+    def available(self, request):
+        """All rooms free between ``?date_from=`` and ``?date_to=``."""
+        date_from, date_to = self.get_period(request, 'date_from', 'date_to')
+        rooms = list(available_rooms(self.filter_queryset(self.get_queryset()), date_from, date_to))
+        with metrics.serializing():
+            data = self.get_serializer(rooms, many=True).data
+        return Response(data)
+
+    @action(detail=True, methods=['get'])
+    def availability(self, request, pk=None):
+        """Free and booked days of one room, read from its occupancy bitset."""
+        date_from, date_to = self.get_period(request)
+        room = self.get_object()
+        data = occupancy.availability([room.pk], date_from, date_to)[room.pk]
+        return Response({'room': room.pk, 'from': date_from, 'to': date_to, **data})
+
+    @action(detail=False, methods=['get'], url_path='availability')
+    def availability_list(self, request):
+        """
+        Availability of many rooms, optionally limited with ``?rooms=1,2,3``.
+
+        ``?ranges=0`` leaves out the booked ranges and returns only the day strings.
+        """
+        date_from, date_to = self.get_period(request)
+        queryset = self.filter_queryset(self.get_queryset())
+        if request.query_params.get('rooms'):
+            try:
+                room_ids = [int(pk) for pk in request.query_params['rooms'].split(',')]
+            except ValueError:
+                raise ValidationError({'rooms': 'Enter a comma separated list of room ids.'})
+            queryset = queryset.filter(pk__in=room_ids)
+        room_ids = list(queryset.values_list('pk', flat=True))
+        ranges = request.query_params.get('ranges') != '0'
+        rooms = occupancy.availability(room_ids, date_from, date_to, ranges=ranges)
+        return Response({
+            'from': date_from,
+            'to': date_to,
+            'rooms': [{'room': room_id, **data} for room_id, data in rooms.items()],
+        })
 
 
 
 class ReservationViewSet(viewsets.ModelViewSet):
-    queryset = Reservation.objects.all().order_by('id')
+    queryset = Reservation.objects.select_related('room__room_manager', 'owner').order_by('id')
     serializer_class = ReservationSerializer
     permission_classes = (IsOwnerOrReadOnly, IsAuthenticated)
-    pagination_class = SmallSetPagination
+    pagination_class = ReservationPagination
 
     def get_serializer_class(self):
         """Return appropriate serializer class"""
@@ -44,34 +128,123 @@ class ReservationViewSet(viewsets.ModelViewSet):
         response = {'message': 'Delete function is not offered in this path.'}
         return Response(response, status=status.HTTP_403_FORBIDDEN)
 
+    def save_if_available(self, serializer, room_id, **kwargs):
+        """Re-check the term and save while holding the room lock."""
+        exclude = [serializer.instance.pk] if serializer.instance is not None else None
+
+        def book():
+            data = serializer.validated_data
+            if has_conflict(room_id, data['date_from'], data['date_to'], exclude=exclude):
+                raise ValidationError('Room is reserved at this term')
+            serializer.save(**kwargs)
+
+        run_locked(room_id, book)
+
     def perform_create(self, serializer):
-        serializer.save(owner=self.request.user)
+        room = self.get_room()
+        self.save_if_available(serializer, room.pk, owner=self.request.user, room=room)
 
+    def perform_update(self, serializer):
+        self.save_if_available(serializer, serializer.instance.room_id)
+
+    @conditional(reservation_state)
     def retrieve(self, request, pk=None, room_pk=None):
-        item = get_object_or_404(self.queryset, pk=pk, room__pk=room_pk)
-        # breakpoint()
-        if item.owner == self.request.user and item.reservation_status == 1:
-            serializer = ReservationWithPasswordSerializer(item)
-            return Response(serializer.data)
-        serializer = self.get_serializer(item)
-        return Response(serializer.data)
+        def load():
+            try:
+                item = get_object_or_404(self.queryset, pk=pk, room__pk=room_pk)
+            except Http404:
+                item = get_object_or_404(archive.archived(), pk=pk, room__pk=room_pk)
+            with metrics.serializing():
+                return {
+                    'owner': item.owner_id,
+                    'data': self.get_serializer(item).data,
+                    'private_data': ReservationWithPasswordSerializer(item).data
+                    if item.reservation_status == 1 else None,
+                }
+
+        entry = cache.cached(['reservation', room_pk, pk], [cache.room_scope(room_pk)], load)
+        if entry['owner'] == self.request.user.pk and entry['private_data'] is not None:
+            return Response(entry['private_data'])
+        return Response(entry['data'])
 
+    @conditional(reservation_list_state)
     def list(self, request, room_pk=None):
         try:
-            items = get_list_or_404(self.queryset, room__pk=room_pk)
+            room_pk = int(room_pk)
         except (TypeError, ValueError):
             raise Http404
+        queryset = self.filter_queryset(self.get_queryset()).filter(room__pk=room_pk)
+        # With ?archived=1 the list also has the reservations moved to the archive.
+        history = archive.archived().filter(room__pk=room_pk) if archive.wants_archive(request) else None
+        if wants_stream(request):
+            get_object_or_404(Room, pk=room_pk)
+            if history is not None:
+                queryset = archive.with_archive(queryset, history, *ReservationSerializer.value_fields)
+            return streaming_json_response(queryset.order_by(*self.paginator.ordering), ReservationSerializer)
+        rows = queryset.values(*ReservationSerializer.value_fields)
+        if history is None:
+            page = self.paginate_queryset(rows)
         else:
-            serializer = self.get_serializer(items, many=True)
-            return Response(serializer.data)
+            page = self.paginator.paginate_querysets([rows, history.values(*ReservationSerializer.value_fields)],
+                                                     request, view=self)
+        if not page and not Room.objects.filter(pk=room_pk).exists():
+            raise Http404
+        with metrics.serializing():
+            results = [ReservationSerializer.from_values(row) for row in page]
+        return self.get_paginated_response(results)
+
+    def get_room(self):
+        return get_object_or_404(Room, pk=self.kwargs.get('room_pk'))
+
+    @action(detail=False, methods=['post'], url_path='bulk-create')
+    def bulk_create(self, request, room_pk=None):
+        """Create up to ``MAX_BATCH`` reservations, reporting errors per item."""
+        room = self.get_room()
+        batch = BulkReservationSerializer(data=request.data)
+        batch.is_valid(raise_exception=True)
+        serializers = [ReservationSerializer(data=item, context=self.get_serializer_context())
+                       for item in batch.validated_data['reservations']]
+        results = create_reservations(room, request.user, serializers)
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'], url_path='bulk-confirm')
+    def bulk_confirm(self, request, room_pk=None):
+        """Confirm many reservations of the room; only its manager may do this."""
+        room = self.get_room()
+        if room.room_manager_id != request.user.pk:
+            raise PermissionDenied
+        batch = BulkIdsSerializer(data=request.data)
+        batch.is_valid(raise_exception=True)
+        results = confirm_reservations(room, request.user, batch.validated_data['ids'])
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['post'], url_path='bulk-cancel')
+    def bulk_cancel(self, request, room_pk=None):
+        """Cancel many of the user's reservations in the room."""
+        room = self.get_room()
+        batch = BulkIdsSerializer(data=request.data)
+        batch.is_valid(raise_exception=True)
+        results = cancel_reservations(room, request.user, batch.validated_data['ids'])
+        return Response({'results': results}, status=status.HTTP_200_OK)
 
     @action(detail=True, methods=['post'], permission_classes=[RoomManagerPermission])
     def confirm(self, request, pk=None, room_pk=None):
         reservation = self.get_object()
         serializer = self.get_serializer(reservation, data=request.data)
         if serializer.is_valid():
-            reservation.reservation_status = serializer.validated_data['reservation_status']
-            reservation.save()
+
+            def book():
+                if has_conflict(reservation.room_id, reservation.date_from, reservation.date_to,
+                                exclude=[reservation.pk]):
+                    return False
+                reservation.reservation_status = serializer.validated_data['reservation_status']
+                reservation.save()
+                publish_status_change([reservation], 'confirm', request.user)
+                return True
+
+            if not run_locked(reservation.room_id, book):
+                return Response({'message': 'Room is reserved at this term'},
+                                status=status.HTTP_400_BAD_REQUEST)
             return Response({'message': 'Status is changed'}, status=status.HTTP_200_OK)
         else:
             return Response(serializer.errors,
@@ -83,9 +256,15 @@ class ReservationViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(reservation, data=request.data)
         if serializer.is_valid():
             if reservation.reservation_status == 1 and reservation.date_to < datetime.date.today():
+                if not archive.can_rate(reservation.date_to):
+                    return Response({'message': 'The evaluation period of this training is over.'},
+                                    status=status.HTTP_400_BAD_REQUEST)
                 if not reservation.rating:
                     reservation.rating = serializer.validated_data['rating']
-                    serializer.save()
+                    with transaction.atomic(savepoint=False):
+                        serializer.save()
+                        ratings.record(reservation.room_id, reservation.rating)
+                    publish_status_change([reservation], 'finish', request.user)
                     return Response({'message': 'The training has been assessed'}, status=status.HTTP_200_OK)
                 else:
                     return Response({'message': 'You can add evaluation only once.'},
@@ -104,6 +283,7 @@ class ReservationViewSet(viewsets.ModelViewSet):
             if serializer.validated_data['reservation_status'] == 2:
                 reservation.reservation_status = serializer.validated_data['reservation_status']
                 reservation.save()
+                publish_status_change([reservation], 'cancel', request.user)
                 return Response({'message': 'Reservation is canceled'}, status=status.HTTP_200_OK)
             else:
                 return Response(serializer.errors,
@@ -111,3 +291,141 @@ class ReservationViewSet(viewsets.ModelViewSet):
         else:
             return Response(serializer.errors,
                             status=status.HTTP_400_BAD_REQUEST)
+
+
+class RecurrenceViewSet(mixins.CreateModelMixin, mixins.ListModelMixin, mixins.RetrieveModelMixin,
+                        viewsets.GenericViewSet):
+    """Weekly series of reservations in a room, see rooms_api/recurrence.py."""
+    serializer_class = RecurrenceSerializer
+    permission_classes = (IsOwnerOrReadOnly, IsAuthenticated)
+    pagination_class = ReservationPagination
+
+    def get_queryset(self):
+        try:
+            room_pk = int(self.kwargs.get('room_pk'))
+        except (TypeError, ValueError):
+            raise Http404
+        return Recurrence.objects.select_related('room__room_manager', 'owner').filter(room_id=room_pk).order_by('id')
+
+    def create(self, request, room_pk=None):
+        """Create the series and all its occurrences, waiting for confirmation."""
+        room = get_object_or_404(Room, pk=room_pk)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = dict(serializer.validated_data)
+        skip_conflicts = data.pop('skip_conflicts')
+        series = Recurrence(room=room, owner=request.user, **data)
+        taken = recurrence.create_series(series, skip_conflicts=skip_conflicts)
+        if series.pk is None:
+            return Response({'non_field_errors': [RESERVED_MESSAGE], 'conflicts': taken},
+                            status=status.HTTP_400_BAD_REQUEST)
+        with metrics.serializing():
+            data = self.get_serializer(series).data
+        return Response({**data, 'skipped': taken}, status=status.HTTP_201_CREATED)
+
+    def retrieve(self, request, pk=None, room_pk=None):
+        """The series with its occurrences starting between ``?from=`` and ``?to=`` (the whole series by default)."""
+        series = self.get_object()
+        query = WindowQuerySerializer(data={name: request.query_params[param]
+                                            for name, param in (('date_from', 'from'), ('date_to', 'to'))
+                                            if request.query_params.get(param)})
+        query.is_valid(raise_exception=True)
+        occurrences = recurrence.window(series, query.validated_data.get('date_from'),
+                                        query.validated_data.get('date_to'))
+        with metrics.serializing():
+            data = self.get_serializer(series).data
+        return Response({**data, 'occurrences': occurrences})
+
+    def get_occurrence(self, request):
+        query = OccurrenceSerializer(data=request.data)
+        query.is_valid(raise_exception=True)
+        return query.validated_data.get('date')
+
+    def respond(self, results):
+        if results is None:
+            return Response({'message': 'The series has no occurrence on this date.'},
+                            status=status.HTTP_404_NOT_FOUND)
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['post'], permission_classes=[RoomManagerPermission])
+    def confirm(self, request, pk=None, room_pk=None):
+        """Confirm the waiting occurrences, or with ``{"date": ...}`` the one starting that day."""
+        series = self.get_object()
+        return self.respond(recurrence.confirm_series(series, request.user, self.get_occurrence(request)))
+
+    @action(detail=True, methods=['post'], permission_classes=[IsOwnerOrReadOnly])
+    def cancel(self, request, pk=None, room_pk=None):
+        """Cancel the upcoming occurrences, or with ``{"date": ...}`` the one starting that day."""
+        series = self.get_object()
+        return self.respond(recurrence.cancel_series(series, request.user, self.get_occurrence(request)))
+
+
+class CacheStatsView(APIView):
+    """Hit and miss counters of the read cache."""
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        return Response(cache.stats.snapshot())
+
+
+class FileView(APIView):
+    """Base of views answering with files (CSV, iCalendar, ...) instead of rendered data."""
+
+    def perform_content_negotiation(self, request, force=False):
+        # Files are sent as they are; only errors go through the JSON renderer.
+        return super().perform_content_negotiation(request, force=True)
+
+
+class ReservationTransferView(FileView):
+    """
+    Export reservations as ``/reservations.csv`` or ``.jsonl``, or import such a file by POSTing it.
+
+    Both directions stream, see rooms_api/transfer.py. ``?room=`` limits the export to one room,
+    ``?archived=1`` adds the archived reservations.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, file_format):
+        queryset = Reservation.objects.all()
+        history = ReservationArchive.objects.all() if archive.wants_archive(request) else None
+        if request.query_params.get('room'):
+            try:
+                room_id = int(request.query_params['room'])
+            except ValueError:
+                raise ValidationError({'room': 'Enter a room id.'})
+            queryset = queryset.filter(room_id=room_id)
+            if history is not None:
+                history = history.filter(room_id=room_id)
+        response = StreamingHttpResponse(transfer.export(file_format, queryset, history=history),
+                                         content_type=transfer.CONTENT_TYPES[file_format])
+        response['Content-Disposition'] = f'attachment; filename="reservations.{file_format}"'
+        return response
+
+    def post(self, request, file_format):
+        lines = codecs.iterdecode(request.stream or (), 'utf-8', errors='replace')
+        result = transfer.import_rows(transfer.decode(file_format, lines))
+        return Response(result, status=status.HTTP_200_OK)
+
+
+class RoomCalendarView(FileView):
+    """Confirmed reservations of a room as an iCalendar feed, see rooms_api/ical.py."""
+    permission_classes = [IsAuthenticated]
+
+    @conditional(room_calendar_state)
+    def get(self, request, pk):
+        feed = ical.room_feed(pk)
+        if feed is None:
+            raise Http404
+        return HttpResponse(feed, content_type=ical.CONTENT_TYPE)
+
+
+class OwnerCalendarView(FileView):
+    """Confirmed reservations of one user as an iCalendar feed, for that user and staff."""
+    permission_classes = [IsAuthenticated, IsSelfOrAdmin]
+
+    @conditional(owner_calendar_state)
+    def get(self, request, pk):
+        feed = ical.owner_feed(pk, self.owner_version)
+        if feed is None:
+            raise Http404
+        return HttpResponse(feed, content_type=ical.CONTENT_TYPE)
@@ -0,0 +1,76 @@
+"""
+Environment driven database configuration.
+
+ROOMS_DB_PROFILE selects the profile:
+
+    sqlite         development default, ``db.sqlite3`` next to ``manage.py``
+    sqlite-prod    SQLite tuned for concurrent writes: WAL journal,
+                   ``synchronous=NORMAL``, busy timeout and memory mapped I/O
+    postgres       PostgreSQL with persistent, health-checked connections
+                   (needs psycopg2)
+
+Other variables: ROOMS_DB_NAME, ROOMS_DB_USER, ROOMS_DB_PASSWORD, ROOMS_DB_HOST,
+ROOMS_DB_PORT, ROOMS_DB_CONN_MAX_AGE, ROOMS_DB_TIMEOUT (seconds) and
+ROOMS_DB_MMAP_SIZE (bytes).
+"""
+import os
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.signals import connection_created
+
+PROFILES = ('sqlite', 'sqlite-prod', 'postgres')
+
+
+def sqlite_pragmas(timeout, mmap_size):
+    return {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'busy_timeout': int(timeout * 1000),
+        'mmap_size': mmap_size,
+        'temp_store': 'MEMORY',
+    }
+
+
+def database_config(base_dir, environ=os.environ):
+    """Return the ``DATABASES['default']`` dict for the selected profile."""
+    profile = environ.get('ROOMS_DB_PROFILE', 'sqlite')
+    if profile not in PROFILES:
+        raise ImproperlyConfigured(f'ROOMS_DB_PROFILE must be one of {", ".join(PROFILES)}, not {profile!r}.')
+    timeout = float(environ.get('ROOMS_DB_TIMEOUT', 20))
+
+    if profile == 'postgres':
+        return {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': environ.get('ROOMS_DB_NAME', 'rooms_app'),
+            'USER': environ.get('ROOMS_DB_USER', ''),
+            'PASSWORD': environ.get('ROOMS_DB_PASSWORD', ''),
+            'HOST': environ.get('ROOMS_DB_HOST', ''),
+            'PORT': environ.get('ROOMS_DB_PORT', ''),
+            'CONN_MAX_AGE': int(environ.get('ROOMS_DB_CONN_MAX_AGE', 600)),
+            'CONN_HEALTH_CHECKS': True,
+            'OPTIONS': {'connect_timeout': int(timeout)},
+        }
+
+    config = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': environ.get('ROOMS_DB_NAME', base_dir / 'db.sqlite3'),
+    }
+    if profile == 'sqlite-prod':
+        config.update({
+            'CONN_MAX_AGE': int(environ.get('ROOMS_DB_CONN_MAX_AGE', 600)),
+            'OPTIONS': {'timeout': timeout},
+            'PRAGMAS': sqlite_pragmas(timeout, int(environ.get('ROOMS_DB_MMAP_SIZE', 256 * 1024 * 1024))),
+        })
+    return config
+
+
+def apply_pragmas(sender, connection, **kwargs):
+    """Run the ``PRAGMAS`` of a SQLite connection when it is opened."""
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = connection.settings_dict.get('PRAGMAS') or {}
+    with connection.cursor() as cursor:
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name} = {value}')
+
+
+connection_created.connect(apply_pragmas, dispatch_uid='rooms_app.database.apply_pragmas')
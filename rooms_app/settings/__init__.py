@@ -0,0 +1 @@
+"""Settings profiles of rooms_app, see ``base.py``."""
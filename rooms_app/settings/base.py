@@ -1,5 +1,11 @@
 """
-Django settings for rooms_app project.
+Django settings for rooms_app project, shared by every profile.
+
+Pick a profile with DJANGO_SETTINGS_MODULE:
+
+    rooms_app.settings.dev      local development, debug_toolbar and browsable API
+    rooms_app.settings.prod     deployment, secrets and hosts from the environment
+    rooms_app.settings.bench    benchmarks, production stack with a fixed key
 
 Generated by 'django-admin startproject' using Django 4.1.2.
 
@@ -12,8 +18,10 @@ https://docs.djangoproject.com/en/4.1/ref/settings/
 
 from pathlib import Path
 
+from rooms_app.database import database_config
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
-BASE_DIR = Path(__file__).resolve().parent.parent
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
 
 
 # Quick-start development settings - unsuitable for production
@@ -23,7 +31,7 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 SECRET_KEY = 'django-insecure-&c1&b$o$d#j9v#+h2(ln74ae6f*w2vx^9e+iesfsf63_yab=3#'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = False
 
 ALLOWED_HOSTS = []
 
@@ -38,11 +46,11 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'rest_framework',
-    'debug_toolbar',
     'rooms_api'
 ]
 
 MIDDLEWARE = [
+    'rooms_api.metrics.metrics_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -50,7 +58,6 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
 ROOT_URLCONF = 'rooms_app.urls'
@@ -58,10 +65,14 @@ ROOT_URLCONF = 'rooms_app.urls'
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [BASE_DIR / 'templates']
-        ,
-        'APP_DIRS': True,
+        'DIRS': [BASE_DIR / 'templates'],
         'OPTIONS': {
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -75,16 +86,48 @@ TEMPLATES = [
 WSGI_APPLICATION = 'rooms_app.wsgi.application'
 
 
+# Django REST framework
+# https://www.django-rest-framework.org/api-guide/settings/
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'rooms_api.renderers.FastJSONRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'rooms_api.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+}
+
+
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
+# Selected with ROOMS_DB_PROFILE, see rooms_app/database.py.
 DATABASES = {
+    'default': database_config(BASE_DIR),
+}
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'rooms_app',
     }
 }
 
+# Cache alias for room and reservation reads, None turns the read cache off.
+ROOMS_API_CACHE = 'default'
+ROOMS_API_CACHE_TIMEOUT = 300
+
+# Share of requests traced for /metrics, see rooms_api/metrics.py.
+ROOMS_METRICS_SAMPLE_RATE = 0.1
+ROOMS_METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -126,9 +169,3 @@ STATIC_URL = 'static/'
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
-
-INTERNAL_IPS = [
-   # ...
-   '127.0.0.1',
-   # ...
-]
@@ -0,0 +1,6 @@
+"""Benchmark settings: the production stack with the development key and database profile."""
+from rooms_app.settings.base import *  # noqa: F401,F403
+
+DEBUG = False
+
+ALLOWED_HOSTS = ['*']
@@ -0,0 +1,34 @@
+"""Development settings: debug mode, debug_toolbar and the browsable API."""
+from rooms_app.settings.base import *  # noqa: F401,F403
+from rooms_app.settings.base import INSTALLED_APPS, MIDDLEWARE, REST_FRAMEWORK
+
+DEBUG = True
+
+ALLOWED_HOSTS = []
+
+INSTALLED_APPS = [*INSTALLED_APPS, 'debug_toolbar']
+
+MIDDLEWARE = [
+    *MIDDLEWARE,
+    'rooms_api.query_inspector.query_inspector_middleware',
+    'debug_toolbar.middleware.DebugToolbarMiddleware',
+]
+
+# N+1 and slow query reports, see rooms_api/query_inspector.py.
+ROOMS_API_QUERY_INSPECTOR = True
+ROOMS_API_QUERY_REPEAT_LIMIT = 5
+ROOMS_API_SLOW_QUERY_MS = 100
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_RENDERER_CLASSES': [
+        *REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'],
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+
+INTERNAL_IPS = [
+    '127.0.0.1',
+]
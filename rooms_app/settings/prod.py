@@ -0,0 +1,35 @@
+"""
+Production settings.
+
+DJANGO_SECRET_KEY is required, DJANGO_ALLOWED_HOSTS is a comma separated list.
+The database defaults to the ``sqlite-prod`` profile, see rooms_app/database.py.
+"""
+import os
+from django.core.exceptions import ImproperlyConfigured
+
+from rooms_app.database import database_config
+from rooms_app.settings.base import *  # noqa: F401,F403
+from rooms_app.settings.base import BASE_DIR
+
+try:
+    SECRET_KEY = os.environ['DJANGO_SECRET_KEY']
+except KeyError:
+    raise ImproperlyConfigured('Set DJANGO_SECRET_KEY to run with rooms_app.settings.prod.')
+
+DEBUG = False
+
+ALLOWED_HOSTS = [host.strip() for host in os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',') if host.strip()]
+
+DATABASES = {
+    'default': database_config(BASE_DIR, {'ROOMS_DB_PROFILE': 'sqlite-prod', **os.environ}),
+}
+
+SESSION_COOKIE_SECURE = True
+CSRF_COOKIE_SECURE = True
+
+# Behind a proxy on the same host every client is 127.0.0.1, so /metrics allows
+# no address unless ROOMS_METRICS_ALLOWED_IPS lists some; scrapers can send
+# ROOMS_METRICS_TOKEN as a bearer token instead, see rooms_api/metrics.py.
+ROOMS_METRICS_ALLOWED_IPS = [address.strip() for address in os.environ.get('ROOMS_METRICS_ALLOWED_IPS', '').split(',')
+                             if address.strip()]
+ROOMS_METRICS_TOKEN = os.environ.get('ROOMS_METRICS_TOKEN') or None
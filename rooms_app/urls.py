@@ -13,14 +13,20 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-import debug_toolbar
+from django.conf import settings
 from django.contrib import admin
 
 from django.urls import path, include
+from rooms_api.metrics import metrics_view
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('api-auth/',include("rest_framework.urls")),
-    path('__debug__/', include(debug_toolbar.urls)),
     path('api/', include('rooms_api.urls')),
+    path('metrics', metrics_view, name='metrics'),
 ]
+
+if 'debug_toolbar' in settings.INSTALLED_APPS:
+    import debug_toolbar
+
+    urlpatterns.append(path('__debug__/', include(debug_toolbar.urls)))